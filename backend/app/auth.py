@@ -2,6 +2,7 @@ import os
 from passlib.context import CryptContext
 from jose import jwt, JWTError
 from datetime import datetime, timedelta
+from .metrics import PASSWORD_HASH_LATENCY
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.getenv("SECRET_KEY", "CHANGE_ME")
@@ -9,11 +10,13 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60*24
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    with PASSWORD_HASH_LATENCY.time(operation="hash"):
+        return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        with PASSWORD_HASH_LATENCY.time(operation="verify"):
+            return pwd_context.verify(plain_password, hashed_password)
     except Exception:
         return False
 
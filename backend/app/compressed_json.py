@@ -0,0 +1,99 @@
+import base64
+import json
+import os
+import zlib
+
+import orjson
+from sqlalchemy import JSON, text
+from sqlalchemy.types import TypeDecorator
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional, zlib is always available
+    zstandard = None
+
+# ------------------ Compressed JSON Columns ------------------
+# CompressedJSON stores values whose JSON is at least JSON_COMPRESS_MIN_BYTES
+# compressed, inside a small JSON envelope in the same JSON column:
+#
+#     {"__compressed__": "zstd", "data": "<base64>"}
+#
+# so the column type in the database does not change. Rows written before
+# (or below the threshold) are plain JSON and are read as they are; rows are
+# compressed the next time they are written. Values written with zstd need
+# the zstandard package to be read back; without it new values use zlib.
+#
+# On Postgres the column is switched to STORAGE EXTERNAL: values are still
+# moved out of line (TOAST) but Postgres no longer tries to compress what is
+# already compressed.
+
+JSON_COMPRESS_MIN_BYTES = int(os.getenv("JSON_COMPRESS_MIN_BYTES", "4096"))
+JSON_COMPRESS_LEVEL = int(os.getenv("JSON_COMPRESS_LEVEL", "3"))
+ENVELOPE_KEYS = {"__compressed__", "data"}
+
+if zstandard is not None:
+    _zstd_compressor = zstandard.ZstdCompressor(level=JSON_COMPRESS_LEVEL)
+    _zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+def compress(raw: bytes):
+    """(codec, compressed bytes) with the best codec available."""
+    if zstandard is not None:
+        return "zstd", _zstd_compressor.compress(raw)
+    return "zlib", zlib.compress(raw, JSON_COMPRESS_LEVEL)
+
+
+def decompress(codec: str, data: bytes):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Value is zstd-compressed but the zstandard package is not installed")
+        return _zstd_decompressor.decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown JSON compression codec {codec!r}")
+
+
+def is_envelope(value):
+    return isinstance(value, dict) and value.keys() == ENVELOPE_KEYS
+
+
+class CompressedJSON(TypeDecorator):
+    """JSON column that stores large values compressed; see the module comment."""
+
+    impl = JSON
+    cache_ok = True
+
+    def __init__(self, min_bytes: int = None, **kwargs):
+        super().__init__(**kwargs)
+        self.min_bytes = JSON_COMPRESS_MIN_BYTES if min_bytes is None else min_bytes
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        raw = orjson.dumps(value)
+        if len(raw) < self.min_bytes:
+            return value
+        codec, data = compress(raw)
+        return {"__compressed__": codec, "data": base64.b64encode(data).decode("ascii")}
+
+    def process_result_value(self, value, dialect):
+        if is_envelope(value):
+            return json.loads(decompress(value["__compressed__"], base64.b64decode(value["data"])))
+        return value
+
+
+def tune_storage(engine, metadata):
+    """On Postgres, set STORAGE EXTERNAL on every CompressedJSON column that doesn't have it yet."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            for column in table.columns:
+                if not isinstance(column.type, CompressedJSON):
+                    continue
+                storage = conn.execute(
+                    text("SELECT attstorage FROM pg_attribute WHERE attrelid = CAST(:table AS regclass) AND attname = :column"),
+                    {"table": table.name, "column": column.name},
+                ).scalar()
+                if storage not in (None, "e"):
+                    conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {column.name} SET STORAGE EXTERNAL"))
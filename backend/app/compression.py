@@ -0,0 +1,29 @@
+from starlette.middleware.gzip import GZipMiddleware
+
+try:
+    from brotli_asgi import BrotliMiddleware
+except ImportError:  # brotli is optional, gzip is always available
+    BrotliMiddleware = None
+
+# ------------------ Response Compression ------------------
+# Compresses responses above minimum_size bytes, negotiated on Accept-Encoding:
+# Brotli ("br") when brotli-asgi is installed, gzip otherwise or for clients
+# that don't accept br. Streaming routes (Server-Sent Events) are passed
+# through untouched, since the compressors would hold back events until
+# enough bytes were buffered.
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = 1024, exclude_suffixes: tuple = ("/events",)):
+        self.app = app
+        self.exclude_suffixes = tuple(exclude_suffixes)
+        if BrotliMiddleware is not None:
+            self.compressed = BrotliMiddleware(app, minimum_size=minimum_size, gzip_fallback=True)
+        else:
+            self.compressed = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=6)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and not scope["path"].endswith(self.exclude_suffixes):
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
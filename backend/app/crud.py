@@ -1,13 +1,11 @@
 from sqlalchemy.orm import Session
-from . import models, schemas
-from passlib.context import CryptContext
-from sqlalchemy import text
+from . import models, schemas, events, auth
+from sqlalchemy import text, delete, insert, select, update, any_, bindparam, literal, func, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from .db import get_db
 from datetime import datetime
 import json
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 # ------------------ User CRUD ------------------
 def get_user_by_username(db: Session, username: str):
@@ -15,7 +13,7 @@ def get_user_by_username(db: Session, username: str):
 
 
 def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = pwd_context.hash(user.password)
+    hashed_password = auth.get_password_hash(user.password)
     db_user = models.User(username=user.username, password_hash=hashed_password, role=user.role)
     db.add(db_user)
     db.commit()
@@ -48,13 +46,75 @@ def get_projects(db: Session, skip: int = 0, limit: int = 100):
     return db.query(models.Project).offset(skip).limit(limit).all()
 
 
+PROJECT_OUT_COLUMNS = (
+    models.Project.id, models.Project.name, models.Project.organization, models.Project.pat,
+    models.Project.iteration_path, models.Project.area_path, models.Project.api_version,
+    models.Project.description, models.Project.chat_history,
+)
+
+
+def get_project_rows(db: Session, skip: int = 0, limit: int = 100):
+    """Projects as plain dicts in the ProjectOut shape."""
+    query = select(*PROJECT_OUT_COLUMNS).order_by(models.Project.id).offset(skip).limit(limit)
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
+def get_project_row(db: Session, project_id: int):
+    """One project with its files, as a plain dict in the ProjectWithFiles shape (None if missing)."""
+    row = db.execute(select(*PROJECT_OUT_COLUMNS).where(models.Project.id == project_id)).mappings().first()
+    if row is None:
+        return None
+    f = models.ProjectFile
+    files = db.execute(
+        select(f.filename, f.filepath, f.id, f.uploaded_at).where(f.project_id == project_id).order_by(f.id)
+    ).mappings()
+    return {**row, "files": [dict(file) for file in files]}
+
+
+def get_user_project_rows(db: Session, user_id: int):
+    """The projects a user is assigned to, as plain dicts in the ProjectOut shape."""
+    query = (
+        select(*PROJECT_OUT_COLUMNS)
+        .join(models.ProjectUser, models.ProjectUser.project_id == models.Project.id)
+        .where(models.ProjectUser.user_id == user_id)
+        .order_by(models.Project.id)
+    )
+    return [dict(row) for row in db.execute(query).mappings()]
+
+
 def delete_project(db: Session, project_id: int):
-    project = db.query(models.Project).filter(models.Project.id == project_id).first()
-    if project:
-        db.delete(project)
-        db.commit()
-        return True
-    return False
+    """
+    Delete a project in one DELETE; its test cases, files and memberships go
+    with it through ON DELETE CASCADE. Returns the removed row counts, or
+    None if the project doesn't exist.
+    """
+    counts = db.execute(
+        text(
+            "SELECT (SELECT count(*) FROM testcases WHERE project_id=:pid), "
+            "(SELECT count(*) FROM project_files WHERE project_id=:pid), "
+            "(SELECT count(*) FROM project_users WHERE project_id=:pid)"
+        ),
+        {"pid": project_id}
+    ).fetchone()
+    deleted = db.execute(
+        delete(models.Project).where(models.Project.id == project_id).returning(models.Project.id)
+    ).scalar()
+    if deleted is None:
+        db.rollback()
+        return None
+    db.commit()
+    events.publish(project_id, "reset", {"project_id": project_id})
+    return {"testcases": counts[0], "files": counts[1], "memberships": counts[2]}
+
+
+def update_chat_history(db: Session, project_id: int, history):
+    """Replace a project's chat history in one UPDATE. Returns False if the project doesn't exist."""
+    updated = db.execute(
+        update(models.Project).where(models.Project.id == project_id)
+        .values(chat_history=history).returning(models.Project.id)
+    ).scalar()
+    db.commit()
+    return updated is not None
 
 
 def assign_user_to_project(db: Session, project_user: schemas.ProjectUserCreate):
@@ -72,27 +132,62 @@ def assign_user_to_project(db: Session, project_user: schemas.ProjectUserCreate)
     return db_project_user
 
 
+def _in_ids(column, ids, dialect):
+    """column IN ids, as a single array parameter (= ANY(:ids)) on Postgres."""
+    if dialect == "postgresql":
+        return column == any_(bindparam(None, ids, type_=ARRAY(Integer)))
+    return column.in_(ids)
+
+
+def _upsert(dialect):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    return upsert
+
+
 def update_project_users(db: Session, project_id: int, user_ids: list[int]):
-    conflicts = []
-    for uid in user_ids:
-        q = db.query(models.ProjectUser).filter(models.ProjectUser.user_id == uid).first()
-        if q and q.project_id != project_id:
-            conflicts.append(uid)
-    if conflicts:
-        raise ValueError(f"Users already assigned to other projects: {conflicts}")
-
-    existing = db.query(models.ProjectUser).filter(models.ProjectUser.project_id == project_id).all()
-    existing_ids = [e.user_id for e in existing]
-
-    for e in existing:
-        if e.user_id not in user_ids:
-            db.delete(e)
-    for uid in user_ids:
-        if uid not in existing_ids:
-            db_project_user = models.ProjectUser(project_id=project_id, user_id=uid)
-            db.add(db_project_user)
+    """
+    Make user_ids exactly the members of project_id, set-based:
+    one conflict check, one bulk delete and one INSERT ... ON CONFLICT whose
+    RETURNING rows are the resulting membership.
+    """
+    dialect = db.get_bind().dialect.name
+    ids = sorted(set(user_ids))
+    pu = models.ProjectUser
+
+    if ids:
+        conflicts = db.execute(
+            select(pu.user_id).where(_in_ids(pu.user_id, ids, dialect), pu.project_id != project_id)
+            .order_by(pu.user_id)
+        ).scalars().all()
+        if conflicts:
+            raise ValueError(f"Users already assigned to other projects: {conflicts}")
+
+    removed = delete(pu).where(pu.project_id == project_id)
+    if ids:
+        removed = removed.where(~_in_ids(pu.user_id, ids, dialect))
+    db.execute(removed)
+
+    members = []
+    if ids:
+        stmt = _upsert(dialect)(pu)
+        # Existing members are "updated" to themselves so RETURNING includes them too;
+        # rows of other projects don't match the WHERE and are not returned.
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[pu.user_id],
+            set_={"project_id": stmt.excluded.project_id},
+            where=pu.project_id == stmt.excluded.project_id,
+        ).returning(pu.id, pu.project_id, pu.user_id)
+        members = db.execute(stmt, [{"project_id": project_id, "user_id": uid} for uid in ids]).all()
+        if len(members) < len(ids):
+            # Someone assigned one of these users to another project since the check
+            db.rollback()
+            taken = sorted(set(ids) - {m.user_id for m in members})
+            raise ValueError(f"Users already assigned to other projects: {taken}")
     db.commit()
-    return db.query(models.ProjectUser).filter(models.ProjectUser.project_id == project_id).all()
+    return sorted(members, key=lambda m: m.user_id)
 
 
 def get_project_users(db: Session, project_id: int):
@@ -164,6 +259,20 @@ def get_testcases_by_project(db: Session, project_id: int):
     return db.query(models.TestCase).filter(models.TestCase.project_id == project_id).all()
 
 
+def get_testcase_rows(db: Session, project_id: int):
+    """
+    Same as get_testcases_by_project, but as plain dicts in the TestCaseOut
+    shape, read straight from the columns without building ORM objects.
+    """
+    return [
+        dict(row) for row in db.execute(
+            select(*testcase_out_columns())
+            .where(models.TestCase.project_id == project_id)
+            .order_by(models.TestCase.id)
+        ).mappings()
+    ]
+
+
 def get_testcase(db: Session, testcase_id: int):
     """
     Get a single test case by its ID.
@@ -182,29 +291,244 @@ def create_testcase(db: Session, project_id: int, test_case_json: dict):
     db.add(db_testcase)
     db.commit()
     db.refresh(db_testcase)
+    events.publish(project_id, "create", events.testcase_payload(db_testcase))
     return db_testcase
 
 
-def update_testcase(db: Session, testcase_id: int, test_case_json: dict):
+def testcase_out_columns():
+    t = models.TestCase
+    return (t.id, t.project_id, t.test_case, t.created_at, t.updated_at, t.version)
+
+
+def _member_of(project_id: int, user_id: int):
+    pu = models.ProjectUser
+    return select(pu.id).where(pu.project_id == project_id, pu.user_id == user_id).exists()
+
+
+def update_testcase(db: Session, project_id: int, testcase_id: int, user_id: int, test_case_json: dict,
+                    expected_version: int = None):
     """
-    Update an existing test case.
+    Replace a test case in one UPDATE ... RETURNING, guarded by the project
+    membership of user_id and, if given, the expected version. Returns the
+    updated row as a dict, or None when nothing matched (see testcase_write_error).
     """
-    db_testcase = get_testcase(db, testcase_id)
-    if db_testcase:
-        db_testcase.test_case = test_case_json
-        db_testcase.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(db_testcase)
-    return db_testcase
+    t = models.TestCase
+    stmt = update(t).where(t.id == testcase_id, t.project_id == project_id, _member_of(project_id, user_id))
+    if expected_version is not None:
+        stmt = stmt.where(t.version == expected_version)
+    row = db.execute(
+        stmt.values(test_case=test_case_json, updated_at=datetime.utcnow(), version=t.version + 1)
+        .returning(*testcase_out_columns())
+        .execution_options(synchronize_session=False)
+    ).mappings().first()
+    if row is None:
+        return None     # nothing changed; no rollback, it would expire the session's objects
+    db.commit()
+    row = dict(row)
+    events.publish(project_id, "update", row)
+    return row
 
 
-def delete_testcase(db: Session, testcase_id: int):
+def delete_testcase(db: Session, project_id: int, testcase_id: int, user_id: int, expected_version: int = None):
     """
-    Delete a test case.
+    Delete a test case in one DELETE ... RETURNING, with the same guards as
+    update_testcase. Returns True if a row was deleted.
     """
-    db_testcase = get_testcase(db, testcase_id)
-    if db_testcase:
-        db.delete(db_testcase)
-        db.commit()
-        return True
-    return False
\ No newline at end of file
+    t = models.TestCase
+    stmt = delete(t).where(t.id == testcase_id, t.project_id == project_id, _member_of(project_id, user_id))
+    if expected_version is not None:
+        stmt = stmt.where(t.version == expected_version)
+    deleted = db.execute(
+        stmt.returning(t.id).execution_options(synchronize_session=False)
+    ).scalar()
+    if deleted is None:
+        return False
+    db.commit()
+    events.publish(project_id, "delete", {"id": testcase_id, "project_id": project_id})
+    return True
+
+
+def testcase_write_error(db: Session, project_id: int, testcase_id: int, user_id: int, expected_version: int = None):
+    """
+    Why a guarded update/delete matched no row, as (status_code, detail).
+    Only runs on the failure path, so successful writes stay one statement.
+    """
+    t = models.TestCase
+    assigned, tc_project, version = db.execute(
+        select(
+            _member_of(project_id, user_id),
+            select(t.project_id).where(t.id == testcase_id).scalar_subquery(),
+            select(t.version).where(t.id == testcase_id).scalar_subquery(),
+        )
+    ).one()
+    if not assigned:
+        return 403, "You are not assigned to this project"
+    if tc_project is None:
+        return 404, "Test case not found"
+    if tc_project != project_id:
+        return 403, "Test case does not belong to this project"
+    if expected_version is not None and version != expected_version:
+        return 412, f"Test case was modified (current version {version})"
+    return 409, "Test case changed concurrently, retry"
+
+
+def apply_testcase_batch(db: Session, project_id: int, delete_ids: list[int], updates: list[dict], creates: list[dict] = ()):
+    """
+    Apply many deletes, field updates and inserts to a project's test cases in one transaction.
+    Each update is {"id": ..., "fields": {...}} and is merged into the stored test case.
+    """
+    now = datetime.utcnow()
+    changed = []
+    if creates:
+        # One multi-row INSERT ... RETURNING instead of a flush per object
+        t = models.TestCase
+        changed = [
+            dict(row) for row in db.execute(
+                insert(t).returning(*testcase_out_columns()),
+                [{"project_id": project_id, "test_case": tc, "created_at": now, "updated_at": now} for tc in creates],
+            ).mappings()
+        ]
+    created = sorted(row["id"] for row in changed)
+
+    deleted = []
+    if delete_ids:
+        deleted = db.execute(
+            delete(models.TestCase)
+            .where(models.TestCase.project_id == project_id, models.TestCase.id.in_(delete_ids))
+            .returning(models.TestCase.id)
+        ).scalars().all()
+
+    merged = {}
+    for u in updates:
+        merged.setdefault(u["id"], {}).update(u["fields"])
+
+    updated = []
+    if merged:
+        # One SELECT and one executemany UPDATE, however many rows change
+        t = models.TestCase
+        rows = db.execute(
+            select(*testcase_out_columns())
+            .where(t.project_id == project_id, t.id.in_(list(merged)))
+            .with_for_update()
+        ).mappings().all()
+        changes = []
+        for row in rows:
+            payload = {**row, "test_case": {**(row["test_case"] or {}), **merged[row["id"]]},
+                       "updated_at": now, "version": (row["version"] or 1) + 1}
+            changes.append({"b_id": row["id"], "b_test_case": payload["test_case"]})
+            updated.append(row["id"])
+            changed.append(payload)
+        if changes:
+            db.execute(
+                update(t.__table__)
+                .where(t.__table__.c.id == bindparam("b_id"))
+                .values(test_case=bindparam("b_test_case"), updated_at=now, version=t.__table__.c.version + 1),
+                changes,
+            )
+
+    db.commit()
+    for tc_id in deleted:
+        events.publish(project_id, "delete", {"id": tc_id, "project_id": project_id})
+    created_ids = set(created)
+    for payload in changed:
+        events.publish(project_id, "create" if payload["id"] in created_ids else "update", payload)
+    requested = set(delete_ids) | set(merged)
+    return {
+        "created": created,
+        "deleted": sorted(deleted),
+        "updated": sorted(updated),
+        "not_found": sorted(requested - set(deleted) - set(updated)),
+    }
+
+# ------------------ Cloning ------------------
+def _clone_source(project_id: int, priorities: list[str] = None):
+    t = models.TestCase
+    conditions = [t.project_id == project_id]
+    if priorities:
+        conditions.append(t.test_case["Priority"].as_string().in_(priorities))
+    return conditions
+
+
+def count_clone_source(db: Session, project_id: int, priorities: list[str] = None):
+    return db.execute(select(func.count()).select_from(models.TestCase).where(*_clone_source(project_id, priorities))).scalar()
+
+
+def clone_testcases(db: Session, source_id: int, target_id: int, priorities: list[str] = None, include_files: bool = False):
+    """
+    Copy a project's test cases (optionally only some priorities) into another
+    project with one INSERT ... SELECT, and its file records if include_files.
+    Files are copied by reference: the new rows point at the same file on disk.
+    Returns {"testcases": n, "files": m}.
+    """
+    t, f = models.TestCase, models.ProjectFile
+    now = datetime.utcnow()
+    copied = db.execute(
+        insert(t).from_select(
+            ["project_id", "test_case", "created_at", "updated_at"],
+            select(literal(target_id), t.test_case, literal(now), literal(now))
+            .where(*_clone_source(source_id, priorities))
+            .order_by(t.id),
+        )
+    ).rowcount
+    files = 0
+    if include_files:
+        target_file = f.__table__.alias("target_file")
+        files = db.execute(
+            insert(f).from_select(
+                ["project_id", "filename", "filepath", "uploaded_at"],
+                select(literal(target_id), f.filename, f.filepath, f.uploaded_at)
+                .where(f.project_id == source_id)
+                .where(~select(target_file.c.id).where(
+                    target_file.c.project_id == target_id, target_file.c.filepath == f.filepath
+                ).exists()),
+            )
+        ).rowcount
+    db.commit()
+    if copied:
+        # Subscribers and in-process indexes reload the target rather than get one event per row
+        events.publish(target_id, "reset", {"project_id": target_id})
+    return {"testcases": copied, "files": files}
+
+
+def get_project_file_paths(db: Session, project_id: int):
+    return db.execute(select(models.ProjectFile.filepath).where(models.ProjectFile.project_id == project_id)).scalars().all()
+
+
+def get_referenced_paths(db: Session, paths):
+    """The subset of paths still stored on some project file (cloned projects share files)."""
+    f = models.ProjectFile
+    return set(db.execute(select(f.filepath).where(f.filepath.in_(list(paths)))).scalars().all()) if paths else set()
+
+
+# ------------------ Versions (for ETags) ------------------
+def get_testcases_version(db: Session, project_id: int):
+    """
+    Cheap fingerprint of a project's test cases: changes on every insert,
+    update or delete without reading the rows themselves.
+    """
+    return db.execute(
+        text("SELECT count(*), max(updated_at), coalesce(sum(id), 0) FROM testcases WHERE project_id=:pid"),
+        {"pid": project_id}
+    ).fetchone()
+
+
+def get_project_version(db: Session, project_id: int):
+    return db.execute(
+        text(
+            "SELECT p.updated_at, count(f.id), coalesce(sum(f.id), 0) "
+            "FROM projects p LEFT JOIN project_files f ON f.project_id = p.id "
+            "WHERE p.id=:pid GROUP BY p.id, p.updated_at"
+        ),
+        {"pid": project_id}
+    ).fetchone()
+
+
+def get_user_projects_version(db: Session, user_id: int):
+    return db.execute(
+        text(
+            "SELECT p.id, p.updated_at FROM projects p "
+            "JOIN project_users pu ON pu.project_id = p.id "
+            "WHERE pu.user_id=:uid ORDER BY p.id"
+        ),
+        {"uid": user_id}
+    ).fetchall()
@@ -1,16 +1,63 @@
 import os
+import re
+import tempfile
 import time
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from contextlib import contextmanager
+from fastapi import Request
+from sqlalchemy import TextClause, create_engine, event, text
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+try:
+    import fcntl
+except ImportError:  # not on Windows: no cross-process startup lock for SQLite there
+    fcntl = None
 
 # Database URL
 DATABASE_URL = os.getenv("DATABASE_URL", "postgresql://postgres:postgres@db:5432/authdb")
+# Optional read replica for @read_only routes (see Read Replica Routing below)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+# Worker processes; uvicorn reads the same variable as its --workers default
+WORKERS = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+# Database connections all workers together may open for requests
+DB_POOL_BUDGET = int(os.getenv("DB_POOL_BUDGET", "15"))
+STARTUP_LOCK_KEY = 7_305_101  # pg_advisory_lock key shared by every worker
+
+
+def pool_options(url=DATABASE_URL, workers=WORKERS, budget=DB_POOL_BUDGET):
+    """
+    Per-process pool size: the budget split evenly over the workers, a third
+    kept open and the rest as overflow (1 worker, budget 15 = SQLAlchemy's
+    default 5 + 10).
+    """
+    if url.startswith("sqlite"):
+        return {}
+    per_worker = max(2, budget // workers)
+    pool_size = max(1, per_worker // 3)
+    return {"pool_size": pool_size, "max_overflow": per_worker - pool_size, "pool_pre_ping": True}
+
+
+def driver_options(url=DATABASE_URL):
+    """psycopg2 sends executemany UPDATE / DELETE in pages (execute_batch), not a round trip per row."""
+    if url.startswith(("postgresql://", "postgresql+psycopg2://")):
+        return {"executemany_mode": "values_plus_batch"}
+    return {}
+
+
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite only honours ON DELETE CASCADE with foreign keys switched on, per connection
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.close()
+
 
 # Connect to DB with retries
 engine = None
 for i in range(15):
     try:
-        engine = create_engine(DATABASE_URL, echo=False, future=True)
+        engine = create_engine(DATABASE_URL, echo=False, future=True, **pool_options(), **driver_options())
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", _sqlite_foreign_keys)
         with engine.connect() as conn:
             pass
         print("✅ Database connected")
@@ -22,15 +69,125 @@ for i in range(15):
 if engine is None:
     raise Exception("Could not connect to the database after retries.")
 
+@contextmanager
+def startup_lock():
+    """
+    Run startup work (DDL, admin user) in one worker at a time: a Postgres
+    advisory lock, or a lock file next to a SQLite database.
+    """
+    if engine.dialect.name == "postgresql":
+        with engine.connect() as conn:
+            # Waiting for the lock can be slow: keep it out of the slow-query log,
+            # whose background EXPLAIN must never take this lock a second time
+            conn.info["slowlog_skip"] = True
+            try:
+                conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": STARTUP_LOCK_KEY})
+                try:
+                    yield
+                finally:
+                    conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": STARTUP_LOCK_KEY})
+            finally:
+                conn.info.pop("slowlog_skip", None)   # info stays with the pooled connection
+        return
+    if fcntl is None:
+        yield
+        return
+    database = engine.url.database
+    path = f"{database}.startup.lock" if database and database != ":memory:" else os.path.join(
+        tempfile.gettempdir(), "testops-startup.lock")
+    with open(path, "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+# ------------------ Read Replica Routing ------------------
+# With DATABASE_REPLICA_URL set, requests to routes marked @read_only read
+# from the replica; everything else (and background work) uses the primary.
+# The session switches to the primary for good at its first write or flush,
+# or a SELECT ... FOR UPDATE, so a request always reads what it wrote.
+# Across requests the replica may lag: ensure_fresh_reads() is for reads
+# that must include every commit made so far (the change-feed snapshot).
+#
+# Locally the replica can be a second Postgres, or the same SQLite file
+# opened read-only: sqlite:///file:/path/to/app.db?mode=ro&uri=true
+
+replica_engine = None
+if DATABASE_REPLICA_URL:
+    replica_engine = create_engine(
+        DATABASE_REPLICA_URL, echo=False, future=True,
+        **pool_options(DATABASE_REPLICA_URL), **driver_options(DATABASE_REPLICA_URL),
+    )
+
+
+def read_only(fn):
+    """
+    Let a route read from the replica:
+
+        @app.get("/projects/")
+        @read_only
+        def list_projects(...): ...
+    """
+    fn.read_only = True
+    return fn
+
+
+_READ_TEXT = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+# Data-modifying CTEs and row locks; a false positive only sends a read to the primary
+_WRITE_WORDS = re.compile(r"\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+SHARE)\b", re.IGNORECASE)
+
+
+def _is_read(clause):
+    if isinstance(clause, TextClause):
+        return bool(_READ_TEXT.match(clause.text)) and not _WRITE_WORDS.search(clause.text)
+    return getattr(clause, "is_select", False) and getattr(clause, "_for_update_arg", None) is None
+
+
+class RoutingSession(Session):
+    """Sends reads to the replica while info["replica"] is set and nothing has been written."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kw):
+        if bind is not None:
+            return bind
+        if self.info.get("replica") and not self.info.get("primary"):
+            if clause is None and not self._flushing:
+                return engine   # e.g. db.get_bind().dialect: no statement to route
+            if not self._flushing and _is_read(clause):
+                return replica_engine
+            self.info["primary"] = True
+        return engine
+
+
+def ensure_fresh_reads(db: Session):
+    """
+    Make the session's further reads include every commit made on the
+    primary so far: keep the replica if it has replayed that far, else switch
+    to the primary. Only Postgres standbys can tell; other replicas count as
+    up to date.
+    """
+    if not db.info.get("replica") or db.info.get("primary") or replica_engine.dialect.name != "postgresql":
+        return
+    lsn = db.execute(text("SELECT pg_current_wal_lsn()"), bind_arguments={"bind": engine}).scalar()
+    caught_up = db.execute(
+        text("SELECT coalesce(pg_last_wal_replay_lsn() >= CAST(:lsn AS pg_lsn), true)"), {"lsn": str(lsn)}
+    ).scalar()
+    if not caught_up:
+        db.info["primary"] = True
+
+
 # Session factory
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
+SessionLocal = sessionmaker(bind=engine, class_=RoutingSession, autoflush=False, autocommit=False)
 
 # Declarative base for models
 Base = declarative_base()
 
 # Dependency
-def get_db():
+def get_db(request: Request):
     db = SessionLocal()
+    if replica_engine is not None and getattr(request.scope.get("endpoint"), "read_only", False):
+        db.info["replica"] = True
     try:
         yield db
     finally:
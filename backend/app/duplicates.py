@@ -0,0 +1,197 @@
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from . import events, models
+from .db import ensure_fresh_reads
+from .search import document_text, tokenize
+
+# ------------------ Near-Duplicate Test Cases ------------------
+# MinHash signatures of word 3-gram shingles (Description, Steps, Expected
+# Result) with LSH banding, one in-process index per project. It is built on
+# first use and kept up to date from the change feed like the search index.
+#
+# Two test cases are duplicates when their estimated Jaccard similarity is at
+# least DUPLICATE_THRESHOLD. 16 bands of 4 rows put pairs above ~0.5 in a
+# common bucket, and only those candidates are compared. The duplicate pairs
+# (edges) are kept as test cases are added, so listing the clusters only
+# touches test cases that have duplicates instead of comparing all pairs.
+
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.8"))
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MAX_INDEXED_PROJECTS = 50
+
+_PRIME = np.uint64(4294967311)     # smallest prime above 2**32
+_rng = np.random.RandomState(20240601)
+_A = _rng.randint(1, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.randint(0, 2**32 - 1, size=NUM_PERM, dtype=np.uint64)[:, None]
+
+
+def signature(test_case):
+    """MinHash signature (NUM_PERM uint64) of a test case, or None if it has no text."""
+    tokens = tokenize(document_text(test_case))
+    if not tokens:
+        return None
+    n = max(1, len(tokens) - SHINGLE_SIZE + 1)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(n)}
+    hashes = np.fromiter((zlib.crc32(s.encode()) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A * hashes + _B) % _PRIME).min(axis=1)
+
+
+def similarity(sig_a, sig_b):
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class ProjectIndex:
+    def __init__(self, threshold=DUPLICATE_THRESHOLD):
+        self.threshold = threshold
+        self.signatures = {}                    # id -> signature
+        self.buckets = [{} for _ in range(BANDS)]  # band -> {band bytes: set of ids}
+        self.edges = {}                         # id -> set of ids it duplicates
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _bands(sig):
+        return [sig[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+    def _matches(self, sig, exclude=None):
+        candidates = set()
+        for bucket, key in zip(self.buckets, self._bands(sig)):
+            candidates.update(bucket.get(key, ()))
+        candidates.discard(exclude)
+        scored = ((other, similarity(sig, self.signatures[other])) for other in candidates)
+        return {other: score for other, score in scored if score >= self.threshold}
+
+    def matches(self, sig):
+        """{id: similarity} of indexed test cases that sig duplicates."""
+        with self.lock:
+            return self._matches(sig)
+
+    def add(self, tc_id, test_case):
+        with self.lock:
+            self._remove(tc_id)
+            self._add(tc_id, signature(test_case))
+
+    def _add(self, tc_id, sig):
+        if sig is None:
+            return
+        for other in self._matches(sig):
+            self.edges.setdefault(tc_id, set()).add(other)
+            self.edges.setdefault(other, set()).add(tc_id)
+        self.signatures[tc_id] = sig
+        for bucket, key in zip(self.buckets, self._bands(sig)):
+            bucket.setdefault(key, set()).add(tc_id)
+
+    def remove(self, tc_id):
+        with self.lock:
+            self._remove(tc_id)
+
+    def _remove(self, tc_id):
+        sig = self.signatures.pop(tc_id, None)
+        if sig is None:
+            return
+        for bucket, key in zip(self.buckets, self._bands(sig)):
+            members = bucket[key]
+            members.discard(tc_id)
+            if not members:
+                del bucket[key]
+        for other in self.edges.pop(tc_id, ()):
+            self.edges[other].discard(tc_id)
+            if not self.edges[other]:
+                del self.edges[other]
+
+    def clusters(self):
+        """Connected groups of duplicates, largest first, each sorted by id."""
+        with self.lock:
+            seen, clusters = set(), []
+            for start in self.edges:
+                if start in seen:
+                    continue
+                seen.add(start)
+                cluster, stack = [], [start]
+                while stack:
+                    node = stack.pop()
+                    cluster.append(node)
+                    for other in self.edges.get(node, ()):
+                        if other not in seen:
+                            seen.add(other)
+                            stack.append(other)
+                clusters.append(sorted(cluster))
+        return sorted(clusters, key=lambda c: (-len(c), c[0]))
+
+
+_indexes = OrderedDict()    # project_id -> ProjectIndex, least recently used first
+_indexes_lock = threading.Lock()
+
+
+def project_index(db: Session, project_id: int):
+    """The project's duplicate index, loaded from the database on first use."""
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+        if index is not None:
+            _indexes.move_to_end(project_id)
+            return index
+        # Registered (and locked) before loading, as in search._fallback_index
+        index = _indexes[project_id] = ProjectIndex()
+        index.lock.acquire()
+        while len(_indexes) > MAX_INDEXED_PROJECTS:
+            _indexes.popitem(last=False)
+    try:
+        ensure_fresh_reads(db)  # events from before registering are not replayed
+        t = models.TestCase
+        for tc_id, test_case in db.execute(select(t.id, t.test_case).where(t.project_id == project_id)):
+            index._add(tc_id, signature(test_case))
+    except Exception:
+        with _indexes_lock:
+            _indexes.pop(project_id, None)
+        raise
+    finally:
+        index.lock.release()
+    return index
+
+
+def split_duplicates(db: Session, project_id: int, test_cases: list):
+    """
+    Split new test cases into (unique, duplicates). duplicates lists
+    {"index", "duplicate_of"} where duplicate_of is an existing test case id,
+    or None when it repeats an earlier entry of the same list.
+    """
+    index = project_index(db, project_id)
+    unique, duplicates, accepted = [], [], []
+    for i, tc in enumerate(test_cases):
+        sig = signature(tc)
+        if sig is not None:
+            existing = index.matches(sig)
+            if existing:
+                duplicates.append({"index": i, "duplicate_of": max(existing, key=existing.get)})
+                continue
+            if any(similarity(sig, other) >= index.threshold for other in accepted):
+                duplicates.append({"index": i, "duplicate_of": None})
+                continue
+            accepted.append(sig)
+        unique.append(tc)
+    return unique, duplicates
+
+
+def _on_event(project_id, event_type, data):
+    index = _indexes.get(project_id)
+    if index is None:
+        return
+    if event_type in ("create", "update"):
+        index.add(data["id"], data["test_case"])
+    elif event_type == "delete":
+        index.remove(data["id"])
+    elif event_type == "reset":
+        with _indexes_lock:
+            _indexes.pop(project_id, None)
+
+
+events.add_listener(_on_event)
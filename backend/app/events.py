@@ -0,0 +1,285 @@
+import asyncio
+import itertools
+import json
+import logging
+import secrets
+import select
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+# ------------------ Test Case Change Feed ------------------
+# In-process publish/subscribe of test case changes per project.
+# Every event gets an increasing id and the last BUFFER_SIZE events of each
+# project are kept, so a client that reconnects with Last-Event-ID only gets
+# what it missed. If it is too far behind it gets a "reset" event and should
+# refetch the full list. Ids are "<token>-<n>" with a per-process token: an
+# event relayed from another worker keeps the id its worker gave it, so a
+# client can resume on any worker that has the event. Unknown ids (e.g. from
+# before a restart) lead to a reset.
+
+BUFFER_SIZE = 1000
+KEEPALIVE_SECONDS = 15
+
+_ids = itertools.count(1)
+_token = secrets.token_hex(4)
+_lock = threading.Lock()
+_last_id = 0
+_last_eid = "0"
+_buffers = {}       # project_id -> deque of (local seq, type, data, id)
+_evicted = {}       # project_id -> id of the newest event dropped from the buffer
+_subscribers = {}   # project_id -> set of (loop, asyncio.Queue)
+_listeners = []     # in-process callbacks (search / duplicate indexes)
+logger = logging.getLogger(__name__)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def testcase_payload(tc):
+    return {
+        "id": tc.id,
+        "project_id": tc.project_id,
+        "test_case": tc.test_case,
+        "created_at": tc.created_at,
+        "updated_at": tc.updated_at,
+        "version": tc.version,
+    }
+
+
+def add_listener(fn):
+    """Call fn(project_id, event_type, data) synchronously on every published event."""
+    _listeners.append(fn)
+
+
+def current_event_id():
+    """Id of the last published event. Sent with snapshots so clients can resume."""
+    with _lock:
+        return _last_eid
+
+
+def resolve_event_id(project_id: int, value):
+    """
+    Local sequence number of a Last-Event-ID: 0 for none, -1 (forces a
+    reset) for ids this process doesn't know.
+    """
+    if not value or value == "0":
+        return 0
+    token, _, number = value.rpartition("-")
+    if token == _token and number.isdigit():
+        return int(number)
+    with _lock:
+        for event in _buffers.get(project_id, ()):
+            if event[3] == value:
+                return event[0]
+    return -1
+
+
+def publish(project_id: int, event_type: str, data: dict):
+    """Record an event, wake up the project's subscribers and relay it to other workers. Safe from any thread."""
+    event_id = _publish_local(project_id, event_type, data)
+    if _relay is not None:
+        broadcast("event", {"project_id": project_id, "type": event_type, "data": data, "id": event_id})
+
+
+def _publish_local(project_id: int, event_type: str, data: dict, event_id: str = None):
+    global _last_id, _last_eid
+    with _lock:
+        seq = next(_ids)
+        event = (seq, event_type, data, event_id or f"{_token}-{seq}")
+        _last_id, _last_eid = seq, event[3]
+        buffer = _buffers.setdefault(project_id, deque(maxlen=BUFFER_SIZE))
+        if len(buffer) == BUFFER_SIZE:
+            _evicted[project_id] = buffer[0][0]
+        buffer.append(event)
+        subscribers = list(_subscribers.get(project_id, ()))
+    for fn in _listeners:
+        try:
+            fn(project_id, event_type, data)
+        except Exception:
+            logger.exception("Event listener %r failed", fn)
+    for loop, queue in subscribers:
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+        except RuntimeError:
+            pass  # subscriber's loop is closed, it unsubscribes itself
+    return event[3]
+
+
+def _replay(project_id: int, last_event_id: int):
+    if last_event_id < _evicted.get(project_id, 0) or last_event_id > _last_id:
+        # We no longer have everything the client missed (or we restarted)
+        return None
+    return [e for e in _buffers.get(project_id, ()) if e[0] > last_event_id]
+
+
+def format_sse(event):
+    _, event_type, data, event_id = event
+    return f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=_json_default)}\n\n"
+
+
+async def stream(project_id: int, last_event_id: int = 0):
+    """Async generator of SSE frames for a project, starting after last_event_id."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    subscriber = (loop, queue)
+    with _lock:
+        _subscribers.setdefault(project_id, set()).add(subscriber)
+        backlog = _replay(project_id, last_event_id)
+    try:
+        if backlog is None:
+            with _lock:
+                last_event_id, event_id = _last_id, _last_eid
+            yield format_sse((last_event_id, "reset", {"project_id": project_id}, event_id))
+        else:
+            for event in backlog:
+                last_event_id = event[0]
+                yield format_sse(event)
+
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event[0] <= last_event_id:
+                continue  # already sent as part of the backlog
+            last_event_id = event[0]
+            yield format_sse(event)
+    finally:
+        with _lock:
+            subs = _subscribers.get(project_id)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del _subscribers[project_id]
+
+
+# ------------------ Cross-Process Relay ------------------
+# With several workers (or containers) on Postgres, every process forwards
+# what it publishes with NOTIFY and applies what the others publish, so
+# change-feed subscribers and the in-process indexes see every write, whichever
+# worker made it. Other per-process state (clone jobs, profiling settings)
+# uses the same channel through broadcast() / on_broadcast().
+# Needs psycopg2 (LISTEN is read with poll() / notifies).
+
+RELAY_CHANNEL = "testops_events"
+NOTIFY_MAX_BYTES = 7900     # Postgres refuses payloads of 8000 bytes and more
+
+_relay = None
+_handlers = {"event": lambda m: _publish_local(m["project_id"], m["type"], m["data"], m.get("id"))}
+
+
+def on_broadcast(kind: str, fn):
+    """Call fn(data) when another process broadcasts a message of this kind."""
+    _handlers[kind] = fn
+
+
+def broadcast(kind: str, data):
+    """Send data to the other processes (no-op unless the relay is running)."""
+    if _relay is None:
+        return
+    body = json.dumps({"origin": _token, "kind": kind, "data": data}, default=_json_default)
+    if len(body.encode()) > NOTIFY_MAX_BYTES:
+        if kind != "event":
+            logger.warning("Not relaying %s message of %d bytes", kind, len(body))
+            return
+        # Too large for NOTIFY: the other workers' clients refetch instead
+        pid = data["project_id"]
+        body = json.dumps({"origin": _token, "kind": "event",
+                           "data": {"project_id": pid, "type": "reset", "data": {"project_id": pid}, "id": data["id"]}})
+    _relay.send(body)
+
+
+def start_relay(engine):
+    """
+    Start relaying through Postgres LISTEN / NOTIFY. Returns False on other
+    databases, raises if the LISTEN connection can't be opened.
+    """
+    global _relay
+    if engine.dialect.name != "postgresql":
+        return False
+    if _relay is None:
+        relay = _Relay(engine)
+        relay.start()
+        _relay = relay
+    return True
+
+
+class _Relay:
+    def __init__(self, engine):
+        cargs, cparams = engine.dialect.create_connect_args(engine.url)
+        # Own connections, outside the request pool: one LISTENs, one sends
+        self.connect = lambda: engine.dialect.dbapi.connect(*cargs, **cparams)
+        self.send_lock = threading.Lock()
+        self.send_conn = None
+        self.listen_conn = None
+        self.thread = threading.Thread(target=self._listen, name="event-relay", daemon=True)
+
+    def start(self):
+        self.listen_conn = self._open_listener()    # fail here rather than in the thread
+        self.thread.start()
+
+    def _open_listener(self):
+        conn = self.connect()
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {RELAY_CHANNEL}")
+        return conn
+
+    def send(self, body):
+        with self.send_lock:
+            for attempt in (1, 2):
+                try:
+                    if self.send_conn is None:
+                        self.send_conn = self.connect()
+                        self.send_conn.autocommit = True
+                    with self.send_conn.cursor() as cur:
+                        cur.execute("SELECT pg_notify(%s, %s)", (RELAY_CHANNEL, body))
+                    return
+                except Exception:
+                    self.send_conn = None
+                    if attempt == 2:
+                        logger.exception("Could not relay event to other workers")
+
+    def _listen(self):
+        reconnecting = False
+        while True:
+            try:
+                conn, self.listen_conn = self.listen_conn or self._open_listener(), None
+                if reconnecting:
+                    _reset_all()    # we may have missed messages while disconnected
+                reconnecting = False
+                while True:
+                    if select.select([conn], [], [], 5) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        self._receive(conn.notifies.pop(0).payload)
+            except Exception:
+                logger.exception("Event relay connection lost, reconnecting")
+                reconnecting = True
+                time.sleep(2)
+
+    @staticmethod
+    def _receive(payload):
+        try:
+            message = json.loads(payload)
+            if message["origin"] == _token:
+                return
+            handler = _handlers.get(message["kind"])
+            if handler is not None:
+                handler(message["data"])
+        except Exception:
+            logger.exception("Could not apply relayed message")
+
+
+def _reset_all():
+    with _lock:
+        projects = set(_buffers) | set(_subscribers)
+    for project_id in projects:
+        _publish_local(project_id, "reset", {"project_id": project_id})
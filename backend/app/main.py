@@ -1,18 +1,71 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Body
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Body, Request, Response, Header, BackgroundTasks, Query
+from fastapi.responses import StreamingResponse, ORJSONResponse, PlainTextResponse, FileResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, inspect
+from sqlalchemy.schema import CreateColumn
 from typing import List, Dict, Optional
 import os, json ,requests
+import logging
+import hashlib
+import time
 import shutil
-from . import models, schemas, crud, auth as _auth
-from .db import SessionLocal, engine, get_db
+import threading
+import uuid
+from . import models, schemas, crud, events, metrics, querystats, slowlog, profiling, search, duplicates, compressed_json, auth as _auth
+from .querystats import query_budget
+from .compression import CompressionMiddleware
+from .db import SessionLocal, engine, replica_engine, get_db, read_only, ensure_fresh_reads, startup_lock, WORKERS
 from requests.auth import HTTPBasicAuth
-# Create tables
-models.Base.metadata.create_all(bind=engine)
+metrics.instrument_engine(engine)
+querystats.instrument_engine(engine)
+slowlog.instrument_engine(engine)
+if replica_engine is not None:
+    metrics.instrument_engine(replica_engine, database="replica")
+    querystats.instrument_engine(replica_engine)
+    slowlog.instrument_engine(replica_engine)
+
+
+def init_database():
+    """Create tables, then add the columns and indexes declared since they were created."""
+    models.Base.metadata.create_all(bind=engine)
+    # Only nullable or server-defaulted columns can be added this way, which is all we add.
+    existing_tables = set(inspect(engine).get_table_names())
+    with engine.begin() as conn:
+        for table in models.Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            columns = {c["name"] for c in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns:
+                    ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {ddl}"))
+    for table in models.Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    search.ensure_index(engine)
+    compressed_json.tune_storage(engine, models.Base.metadata)
+
+
+# Every worker imports this module: the first one to get the lock does the
+# DDL, the others then find nothing left to do
+with startup_lock():
+    init_database()
 from pydantic import BaseModel
 app = FastAPI(title="TestOps Project Manager")
+app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")))
+app.add_middleware(profiling.ProfilingMiddleware)
+app.add_middleware(querystats.QueryStatsMiddleware)
+app.add_middleware(metrics.MetricsMiddleware, fastapi_app=app)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper())
+logger = logging.getLogger(__name__)
 UPLOAD_DIR = "/app/db_data"  # Mounted via docker-compose
+CLONE_SYNC_LIMIT = int(os.getenv("CLONE_SYNC_LIMIT", "5000"))  # larger clones run in the background
+EVENT_RELAY = os.getenv("EVENT_RELAY", "1" if WORKERS > 1 else "0") == "1"  # share events between workers
+if WORKERS > 1 and not (EVENT_RELAY and engine.dialect.name == "postgresql"):
+    # Each worker's change feed, search and duplicate indexes would miss the other workers' writes
+    raise RuntimeError("WEB_CONCURRENCY > 1 needs Postgres and EVENT_RELAY=1; use one worker otherwise")
+AZURE_DEVOPS_URL = os.getenv("AZURE_DEVOPS_URL", "https://dev.azure.com").rstrip("/")  # stub server in benchmarks
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 # ------------------ Auth Setup ------------------
@@ -27,15 +80,23 @@ def ensure_admin():
     db = SessionLocal()
     admin_username = os.getenv("ADMIN_USERNAME", "admin")
     admin_password = os.getenv("ADMIN_PASSWORD", "admin123")
-    existing = crud.get_user_by_username(db, admin_username)
-    if not existing:
-        hashed = _auth.get_password_hash(admin_password)
-        admin = models.User(username=admin_username, password_hash=hashed, role="admin")
-        db.add(admin)
-        db.commit()
+    with startup_lock():  # workers start together: only one may create the admin
+        existing = crud.get_user_by_username(db, admin_username)
+        if not existing:
+            hashed = _auth.get_password_hash(admin_password)
+            admin = models.User(username=admin_username, password_hash=hashed, role="admin")
+            db.add(admin)
+            db.commit()
     db.close()
 
 
+@app.on_event("startup")
+def start_event_relay():
+    # Raises if Postgres can't be reached, so a worker never runs without the relay it needs
+    if EVENT_RELAY and not events.start_relay(engine):
+        logger.warning("EVENT_RELAY needs Postgres: each worker's change feed only sees its own writes")
+
+
 @app.post("/token", response_model=schemas.Token)
 def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -62,8 +123,104 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     return user
 
 
+# ------------------ ETag Helpers ------------------
+def make_etag(*parts):
+    """Weak ETag from a cheap version fingerprint (counts, max(updated_at), ...)."""
+    return 'W/"' + hashlib.sha1(repr(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def not_modified(request: Request, response: Response, etag: str):
+    """
+    Set ETag on the response; return a 304 Response if the client already
+    has this version (If-None-Match), else None.
+    """
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
+    inm = request.headers.get("if-none-match")
+    if inm and (inm.strip() == "*" or etag in [t.strip() for t in inm.split(",")]):
+        return Response(status_code=304, headers=dict(response.headers))
+    return None
+
+
+# ------------------ Fast JSON ------------------
+def fast_json(content, response: Response):
+    """
+    Serialize plain dicts/lists with orjson, skipping the response_model
+    validation. Keeps headers already set on the injected response (ETag, ...).
+    """
+    return ORJSONResponse(content, headers=dict(response.headers))
+
+
+# ------------------ Metrics ------------------
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """Request, database, bcrypt and Azure DevOps timings in the Prometheus text format."""
+    return PlainTextResponse(metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
+
+# ------------------ Admin Diagnostics ------------------
+@app.get("/admin/slow_queries")
+def list_slow_queries(
+    limit: int = 20,
+    order_by: str = "total_ms",
+    current_user: models.User = Depends(get_current_user)
+):
+    """Statements slower than SLOW_QUERY_MS seen by this worker, with routes, redacted params and plans."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    if order_by not in ("total_ms", "max_ms", "count", "last_seen"):
+        raise HTTPException(status_code=400, detail="order_by must be total_ms, max_ms, count or last_seen")
+    return {"threshold_ms": slowlog.SLOW_QUERY_MS, "queries": slowlog.top_offenders(limit, order_by)}
+
+
+@app.get("/admin/profiling")
+def get_profiling_settings(current_user: models.User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return profiling.settings
+
+
+@app.put("/admin/profiling")
+def update_profiling_settings(payload: schemas.ProfilingSettings, current_user: models.User = Depends(get_current_user)):
+    """Change the profiled fraction of requests (0 disables) and the profiler used for them, until restart."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    if payload.sample_rate is not None:
+        if not 0 <= payload.sample_rate <= 1:
+            raise HTTPException(status_code=400, detail="sample_rate must be between 0 and 1")
+        profiling.settings["sample_rate"] = payload.sample_rate
+    if payload.mode is not None:
+        if payload.mode not in profiling.MODES:
+            raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(profiling.MODES)}")
+        profiling.settings["mode"] = payload.mode
+    events.broadcast("profiling_settings", profiling.settings)
+    return profiling.settings
+
+
+events.on_broadcast("profiling_settings", profiling.settings.update)
+
+
+@app.get("/admin/profiles")
+def list_profiles(current_user: models.User = Depends(get_current_user)):
+    """Profiles written by this server, newest first."""
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return profiling.list_profiles()
+
+
+@app.get("/admin/profiles/{name}")
+def download_profile(name: str, current_user: models.User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    path = profiling.profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=name)
+
+
 # ------------------ Auth Routes ------------------
 @app.get("/me", response_model=schemas.UserOut)
+@read_only
 def read_me(current_user: models.User = Depends(get_current_user)):
     """Return the current logged-in user's profile"""
     return current_user
@@ -79,6 +236,8 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
 @app.get("/users", response_model=list[schemas.UserOut])
 @app.get("/users/", response_model=list[schemas.UserOut])
+@query_budget(2)
+@read_only
 def list_users(current_user: models.User = Depends(get_current_user), db_sess: Session = Depends(get_db)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
@@ -132,25 +291,63 @@ def create_project(project: schemas.ProjectCreate, db: Session = Depends(get_db)
 
 
 @app.get("/projects/", response_model=List[schemas.ProjectOut])
-def list_projects(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    return crud.get_projects(db, skip=skip, limit=limit)
+@query_budget(2)
+@read_only
+def list_projects(response: Response, skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    return fast_json(crud.get_project_rows(db, skip=skip, limit=limit), response)
 
 
 @app.get("/projects/{project_id}", response_model=schemas.ProjectWithFiles)
-def get_project(project_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    project = crud.get_project(db, project_id=project_id)
+@query_budget(4)
+@read_only
+def get_project(project_id: int, request: Request, response: Response, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    version = crud.get_project_version(db, project_id=project_id)
+    if not version:
+        raise HTTPException(status_code=404, detail="Project not found")
+    cached = not_modified(request, response, make_etag("project", project_id, *version))
+    if cached:
+        return cached
+    project = crud.get_project_row(db, project_id=project_id)
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    return fast_json(project, response)
 
 
 
 @app.delete("/projects/{project_id}")
-def delete_project(project_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    success = crud.delete_project(db, project_id=project_id)
-    if not success:
+def delete_project(project_id: int, background_tasks: BackgroundTasks, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
+    file_paths = crud.get_project_file_paths(db, project_id=project_id)
+    removed = crud.delete_project(db, project_id=project_id)
+    if not removed:
         raise HTTPException(status_code=404, detail="Project not found")
-    return {"detail": "Project deleted successfully"}
+    # Uploaded files are removed after the response is sent
+    background_tasks.add_task(_remove_unreferenced_files, project_id, file_paths)
+    return {"detail": "Project deleted successfully", "removed": removed}
+
+
+def _remove_unreferenced_files(project_id: int, file_paths: list):
+    """
+    Delete a deleted project's upload folder and the files it referenced,
+    except files that other (cloned) projects still reference.
+    """
+    folder = os.path.join(UPLOAD_DIR, f"project_{project_id}")
+    candidates = set(file_paths)
+    if os.path.isdir(folder):
+        candidates.update(os.path.join(folder, name) for name in os.listdir(folder))
+    db = SessionLocal()
+    try:
+        unreferenced = candidates - crud.get_referenced_paths(db, candidates)
+    finally:
+        db.close()
+    for path in unreferenced:
+        if os.path.isfile(path):
+            os.remove(path)
+    for directory in {os.path.dirname(p) for p in unreferenced} | {folder}:
+        try:
+            os.rmdir(directory)  # only once empty
+        except OSError:
+            pass
+
 
 @app.post("/projects/{project_id}/upload_file", response_model=schemas.ProjectFileOut)
 async def upload_file(
@@ -203,19 +400,21 @@ def assign_users_batch(
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admin privileges required")
 
-    print("DEBUG received payload:", payload.dict())  # 👈 add this
+    logger.debug("assign_users_batch project=%s user_ids=%s", project_id, payload.user_ids)
     try:
         assigned = crud.update_project_users(
             db=db, project_id=project_id, user_ids=payload.user_ids
         )
         return assigned
     except ValueError as ve:
-        print("DEBUG ValueError in assign_users_batch:", ve)  # 👈 add this
+        logger.info("assign_users_batch rejected for project %s: %s", project_id, ve)
         raise HTTPException(status_code=400, detail=str(ve))
 
 
 
 @app.get("/projects/{project_id}/users", response_model=List[schemas.ProjectUserOut])
+@query_budget(2)
+@read_only
 def list_project_users(project_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
     return crud.get_project_users(db=db, project_id=project_id)
 
@@ -228,17 +427,29 @@ def remove_user(project_id: int, user_id: int, db: Session = Depends(get_db), cu
     return {"detail": "User removed from project"}
 
 @app.get("/users/me/projects", response_model=List[schemas.ProjectOut])
+@query_budget(3)
+@read_only
 def get_my_projects(
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    version = crud.get_user_projects_version(db, user_id=current_user.id)
+    cached = not_modified(request, response, make_etag("my_projects", current_user.id, *map(tuple, version)))
+    if cached:
+        return cached
     # Return only the projects that the logged-in user is assigned to
-    return [pu.project for pu in current_user.projects]
+    return fast_json(crud.get_user_project_rows(db, user_id=current_user.id), response)
 
 
 @app.get("/projects/{project_id}/testcases", response_model=List[schemas.TestCaseOut])
+@query_budget(6)
+@read_only
 def get_testcases(
     project_id: int, 
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(get_current_user)
 ):
@@ -249,13 +460,95 @@ def get_testcases(
     if not assigned:
         raise HTTPException(status_code=403, detail="You are not assigned to this project")
 
-    testcases = crud.get_testcases_by_project(db, project_id=project_id)
-    return testcases
+    # Taken before reading the rows, so resuming the change feed from it can't miss anything
+    # (as long as the rows include every commit made so far, hence ensure_fresh_reads)
+    response.headers["X-Event-ID"] = events.current_event_id()
+    ensure_fresh_reads(db)
+    version = crud.get_testcases_version(db, project_id=project_id)
+    cached = not_modified(request, response, make_etag("testcases", project_id, *version))
+    if cached:
+        return cached
+
+    return fast_json(crud.get_testcase_rows(db, project_id=project_id), response)
+
+@app.get("/projects/{project_id}/events")
+@read_only
+def testcase_events(
+    project_id: int,
+    last_event_id: Optional[str] = None,
+    last_event_id_header: Optional[str] = Header(None, alias="Last-Event-ID"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Server-Sent Events feed of test case create / update / delete events.
+    Resume with the Last-Event-ID header (or ?last_event_id=), e.g. the
+    X-Event-ID returned with GET /projects/{project_id}/testcases.
+    """
+    assigned = db.execute(
+        text("SELECT 1 FROM project_users WHERE project_id=:pid AND user_id=:uid"),
+        {"pid": project_id, "uid": current_user.id}
+    ).fetchone()
+    if not assigned:
+        raise HTTPException(status_code=403, detail="You are not assigned to this project")
+
+    # Don't hold a pooled DB connection for the lifetime of the stream
+    db.close()
+
+    last_event_id = events.resolve_event_id(project_id, last_event_id or last_event_id_header)
+    return StreamingResponse(
+        events.stream(project_id, last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/projects/{project_id}/testcases/search", response_model=schemas.TestCaseSearchResult)
+@query_budget(3)
+@read_only
+def search_testcases(
+    project_id: int,
+    q: str,
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Ranked full-text search over Description, Steps and Expected Result, with <mark>ed snippets."""
+    assigned = db.execute(
+        text("SELECT 1 FROM project_users WHERE project_id=:pid AND user_id=:uid"),
+        {"pid": project_id, "uid": current_user.id}
+    ).fetchone()
+    if not assigned:
+        raise HTTPException(status_code=403, detail="You are not assigned to this project")
+    return search.search_testcases(db, project_id, q, limit=limit, offset=offset)
+
+
+@app.get("/projects/{project_id}/testcases/duplicates", response_model=schemas.DuplicateClusters)
+@query_budget(5)
+@read_only
+def find_duplicate_testcases(
+    project_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Groups of near-duplicate test cases (MinHash similarity >= DUPLICATE_THRESHOLD)."""
+    assigned = db.execute(
+        text("SELECT 1 FROM project_users WHERE project_id=:pid AND user_id=:uid"),
+        {"pid": project_id, "uid": current_user.id}
+    ).fetchone()
+    if not assigned:
+        raise HTTPException(status_code=403, detail="You are not assigned to this project")
+    index = duplicates.project_index(db, project_id)
+    return {"threshold": index.threshold, "clusters": index.clusters()}
+
 
 @app.get("/projects/{project_id}/testcases/{testcase_id}", response_model=schemas.TestCaseOut)
+@query_budget(3)
+@read_only
 def get_testcase(
     project_id: int, 
     testcase_id: int, 
+    response: Response,
     db: Session = Depends(get_db), 
     current_user: models.User = Depends(get_current_user)
 ):
@@ -273,11 +566,13 @@ def get_testcase(
     # Security check: ensure test case belongs to the correct project
     if testcase.project_id != project_id:
         raise HTTPException(status_code=403, detail="Test case does not belong to this project")
-        
+
+    response.headers["ETag"] = f'"{testcase.version}"'
     return testcase
 
 
 @app.post("/projects/{project_id}/testcases", response_model=schemas.TestCaseOut)
+@query_budget(4)
 def save_testcase(
     project_id: int,
     testcase: dict = Body(...),
@@ -295,35 +590,60 @@ def save_testcase(
     db_testcase = crud.create_testcase(db, project_id=project_id, test_case_json=testcase)
     return db_testcase
 
+def _if_match_version(if_match: Optional[str]):
+    """Version number from an If-Match header ("3", "\"3\"" or W/"3"); None if absent or "*"."""
+    if not if_match or if_match.strip() == "*":
+        return None
+    value = if_match.strip().removeprefix("W/").strip('"')
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be a test case version")
+
+
 @app.put("/projects/{project_id}/testcases/{testcase_id}", response_model=schemas.TestCaseOut)
+@query_budget(3)
 def update_testcase(
     project_id: int,
     testcase_id: int,
+    response: Response,
     testcase: dict = Body(...),
+    if_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    assigned = db.execute(
-        text("SELECT 1 FROM project_users WHERE project_id=:pid AND user_id=:uid"),
-        {"pid": project_id, "uid": current_user.id}
-    ).fetchone()
-    if not assigned:
-        raise HTTPException(status_code=403, detail="You are not assigned to this project")
-
-    db_testcase = crud.get_testcase(db, testcase_id)
-    if not db_testcase:
-        raise HTTPException(status_code=404, detail="Test case not found")
-    if db_testcase.project_id != project_id:
-        raise HTTPException(status_code=403, detail="Test case does not belong to this project")
-
-    updated_testcase = crud.update_testcase(db, testcase_id=testcase_id, test_case_json=testcase)
-    return updated_testcase
+    expected = _if_match_version(if_match)
+    user_id = current_user.id
+    row = crud.update_testcase(db, project_id, testcase_id, user_id, testcase, expected_version=expected)
+    if row is None:
+        code, detail = crud.testcase_write_error(db, project_id, testcase_id, user_id, expected)
+        raise HTTPException(status_code=code, detail=detail)
+    response.headers["ETag"] = f'"{row["version"]}"'
+    return row
 
 
 @app.delete("/projects/{project_id}/testcases/{testcase_id}")
+@query_budget(3)
 def delete_testcase(
     project_id: int,
     testcase_id: int,
+    if_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    expected = _if_match_version(if_match)
+    user_id = current_user.id
+    if not crud.delete_testcase(db, project_id, testcase_id, user_id, expected_version=expected):
+        code, detail = crud.testcase_write_error(db, project_id, testcase_id, user_id, expected)
+        raise HTTPException(status_code=code, detail=detail)
+    return {"status": "success", "message": "Test case deleted"}
+
+
+@app.post("/projects/{project_id}/testcases/batch", response_model=schemas.TestCaseBatchResult)
+@query_budget(8)
+def batch_testcases(
+    project_id: int,
+    payload: schemas.TestCaseBatch,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
@@ -334,14 +654,107 @@ def delete_testcase(
     if not assigned:
         raise HTTPException(status_code=403, detail="You are not assigned to this project")
 
-    db_testcase = crud.get_testcase(db, testcase_id)
-    if not db_testcase:
-        raise HTTPException(status_code=404, detail="Test case not found")
-    if db_testcase.project_id != project_id:
-        raise HTTPException(status_code=403, detail="Test case does not belong to this project")
+    creates, skipped = payload.creates, []
+    if payload.skip_duplicates and creates:
+        creates, skipped = duplicates.split_duplicates(db, project_id, creates)
+    result = crud.apply_testcase_batch(
+        db,
+        project_id=project_id,
+        delete_ids=payload.delete_ids,
+        updates=[u.dict() for u in payload.updates],
+        creates=creates,
+    )
+    result["duplicates"] = skipped
+    return result
 
-    crud.delete_testcase(db, testcase_id=testcase_id)
-    return {"status": "success", "message": "Test case deleted"}
+
+# ------------------ Cloning ------------------
+_clone_jobs = {}    # job id -> TestCaseCloneJob dict, newest last
+_clone_jobs_lock = threading.Lock()
+MAX_CLONE_JOBS = 100
+
+
+def _store_clone_job(job: dict):
+    with _clone_jobs_lock:
+        _clone_jobs[job["id"]] = job
+        for old in list(_clone_jobs)[:-MAX_CLONE_JOBS]:
+            del _clone_jobs[old]
+
+
+def _update_clone_job(job: dict, **changes):
+    job.update(changes)
+    events.broadcast("clone_job", job)  # the job can be polled through any worker
+
+
+events.on_broadcast("clone_job", _store_clone_job)
+
+
+def _run_clone_job(job: dict, priorities, include_files):
+    _update_clone_job(job, status="running")
+    db = SessionLocal()
+    try:
+        copied = crud.clone_testcases(
+            db, job["source_project_id"], job["target_project_id"], priorities=priorities, include_files=include_files
+        )
+        _update_clone_job(job, status="done", **copied)
+    except Exception as e:
+        logger.exception("Clone job %s failed", job["id"])
+        _update_clone_job(job, status="failed", error=str(e))
+    finally:
+        db.close()
+
+
+@app.post("/projects/{project_id}/clone", response_model=schemas.TestCaseCloneJob)
+def clone_testcases(
+    project_id: int,
+    req: schemas.TestCaseCloneRequest,
+    response: Response,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """
+    Copy this project's test cases (filtered by priorities) into target_project_id
+    on the server. Small clones answer 200 when done; clones of more than
+    CLONE_SYNC_LIMIT test cases (or with background=true) answer 202 with a job
+    to poll at GET /clone_jobs/{id}.
+    """
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    if req.target_project_id == project_id:
+        raise HTTPException(status_code=400, detail="Source and target project must differ")
+    for pid in (project_id, req.target_project_id):
+        if not crud.get_project(db, project_id=pid):
+            raise HTTPException(status_code=404, detail=f"Project {pid} not found")
+
+    job = {
+        "id": None, "status": "pending", "source_project_id": project_id,
+        "target_project_id": req.target_project_id,
+        "matched": crud.count_clone_source(db, project_id, req.priorities),
+    }
+    if job["matched"] <= CLONE_SYNC_LIMIT and not req.background:
+        job.update(crud.clone_testcases(
+            db, project_id, req.target_project_id, priorities=req.priorities, include_files=req.include_files
+        ))
+        job["status"] = "done"
+        return job
+
+    job["id"] = uuid.uuid4().hex
+    _store_clone_job(job)
+    _update_clone_job(job)
+    background_tasks.add_task(_run_clone_job, job, req.priorities, req.include_files)
+    response.status_code = status.HTTP_202_ACCEPTED
+    return job
+
+
+@app.get("/clone_jobs/{job_id}", response_model=schemas.TestCaseCloneJob)
+def get_clone_job(job_id: str, current_user: models.User = Depends(get_current_user)):
+    if current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    job = _clone_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Clone job not found")
+    return job
 
 
 # ----------------- Request Schema -----------------
@@ -374,7 +787,7 @@ def deploy_testcases(req: DeployRequest, db: Session = Depends(get_db)):
         try:
             tc_data = tc.test_case if isinstance(tc.test_case, dict) else json.loads(tc.test_case)
         except Exception as e:
-            print(f"⚠️ Failed to parse test_case ID {tc.id}: {e}")
+            logger.warning("Failed to parse test_case ID %s: %s", tc.id, e)
             tc_data = {}
 
         test_case_title = tc_data.get("Test Case ID", f"TC_{tc.id}")
@@ -382,7 +795,7 @@ def deploy_testcases(req: DeployRequest, db: Session = Depends(get_db)):
         test_case_area_path = req.area_path or req.project_name
         test_case_iteration_path = req.iteration_path or f"{req.project_name}\\Sprint 1"
 
-        url = f"https://dev.azure.com/{req.organization}/{req.project_name}/_apis/wit/workitems/$Test%20Case?api-version=7.0"
+        url = f"{AZURE_DEVOPS_URL}/{req.organization}/{req.project_name}/_apis/wit/workitems/$Test%20Case?api-version=7.0"
         payload = [
             {"op": "add", "path": "/fields/System.Title", "value": test_case_title},
             {"op": "add", "path": "/fields/System.Description", "value": test_case_description},
@@ -392,23 +805,31 @@ def deploy_testcases(req: DeployRequest, db: Session = Depends(get_db)):
         headers = {"Content-Type": "application/json-patch+json"}
 
         try:
+            start = time.perf_counter()
             response = requests.post(
                 url,
                 auth=HTTPBasicAuth("", req.pat),
                 headers=headers,
                 data=json.dumps(payload)
             )
+            metrics.AZURE_DEVOPS_LATENCY.observe(
+                time.perf_counter() - start, operation="create_test_case", status=response.status_code
+            )
             if response.status_code in (200, 201):
                 results.append({"id": test_case_title, "status": "deployed", "detail": "Successfully deployed"})
             else:
                 results.append({"id": test_case_title, "status": "failed", "detail": response.text})
         except Exception as e:
+            metrics.AZURE_DEVOPS_LATENCY.observe(
+                time.perf_counter() - start, operation="create_test_case", status="error"
+            )
             results.append({"id": test_case_title, "status": "failed", "detail": str(e)})
 
     return {"results": results}
 
 # ------------------ Chat History Routes (NEW) ------------------
 @app.put("/projects/{project_id}/chat_history", status_code=status.HTTP_200_OK)
+@query_budget(3)
 def update_chat_history(
     project_id: int,
     payload: schemas.ChatHistoryUpdate,
@@ -423,10 +844,11 @@ def update_chat_history(
     if not assigned:
         raise HTTPException(status_code=403, detail="You are not assigned to this project")
 
-    project = crud.get_project(db, project_id)
-    if not project:
+    # One UPDATE: the previous history (possibly megabytes) is never read back
+    if not crud.update_chat_history(db, project_id, payload.history):
         raise HTTPException(status_code=404, detail="Project not found")
-    
-    project.chat_history = payload.history
-    db.commit()
-    return {"status": "success", "message": "Chat history updated"}
\ No newline at end of file
+    return {"status": "success", "message": "Chat history updated"}
+
+
+# Must run after every route above is registered
+profiling.instrument_routes(app)
@@ -0,0 +1,208 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from starlette.routing import Match
+
+# ------------------ Metrics ------------------
+# Small in-process registry of counters, gauges and histograms, rendered in
+# the Prometheus text exposition format on GET /metrics. Values are per
+# process: with several workers, scrape each one (or sum them).
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+_lock = threading.Lock()
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, doc, labelnames=()):
+        self.name = name
+        self.doc = doc
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with _lock:
+            items = sorted(self.values.items())
+        for key, value in items:
+            lines.extend(self._render_one(key, value))
+        return lines
+
+    def _render_one(self, key, value):
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, doc, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, doc, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+                    break
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_one(self, key, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = f'le="{_number(bound)}"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, [le])} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+def render_latest():
+    """All registered metrics in the Prometheus text format."""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+# ------------------ Application Metrics ------------------
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"])
+REQUEST_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route.", ["method", "route"])
+IN_PROGRESS = Gauge("http_requests_in_progress", "HTTP requests currently being served.", ["method", "route"])
+DB_LATENCY = Histogram("db_query_duration_seconds", "Time spent in database statements.", ["database", "operation"])
+DB_ERRORS = Counter("db_query_errors_total", "Database statements that raised.", ["database", "operation"])
+PASSWORD_HASH_LATENCY = Histogram(
+    "password_hash_duration_seconds", "Time spent hashing or verifying passwords (bcrypt).", ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+AZURE_DEVOPS_LATENCY = Histogram(
+    "azure_devops_request_duration_seconds", "Outbound Azure DevOps API calls.", ["operation", "status"],
+)
+
+
+def route_template(app, scope):
+    """Path template of the route that will handle scope (e.g. /projects/{project_id}), or "unmatched"."""
+    for route in app.router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Records count, latency and in-flight requests per method and route template."""
+
+    def __init__(self, app, fastapi_app):
+        self.app = app
+        self.fastapi_app = fastapi_app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(self.fastapi_app, scope)
+        status = ["500"]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = str(message["status"])
+            await send(message)
+
+        IN_PROGRESS.inc(method=method, route=route)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUEST_LATENCY.observe(time.perf_counter() - start, method=method, route=route)
+            REQUESTS.inc(method=method, route=route, status=status[0])
+            IN_PROGRESS.dec(method=method, route=route)
+
+
+def _operation(statement):
+    return (statement.lstrip().split(None, 1) or ["OTHER"])[0].upper()
+
+
+def instrument_engine(engine, database="primary"):
+    """Time every statement executed on engine, labelled with database (primary / replica)."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        start = conn.info["query_start"].pop()
+        DB_LATENCY.observe(time.perf_counter() - start, database=database, operation=_operation(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        stack = exception_context.connection.info.get("query_start") if exception_context.connection else None
+        if stack:
+            stack.pop()
+        DB_ERRORS.inc(database=database, operation=_operation(exception_context.statement or ""))
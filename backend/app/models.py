@@ -1,6 +1,7 @@
 from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, func, UniqueConstraint, JSON
 from sqlalchemy.orm import relationship
 from .db import Base
+from .compressed_json import CompressedJSON
 from datetime import datetime
 
 
@@ -30,19 +31,20 @@ class Project(Base):
     area_path = Column(String(300), nullable=True)                # Area Path
     api_version = Column(String(20), default="7.0")               # API Version
     description = Column(Text, nullable=True)
-    chat_history = Column(JSON, nullable=True)
+    chat_history = Column(CompressedJSON, nullable=True)  # compressed once large, see compressed_json
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
-    users = relationship("ProjectUser", back_populates="project")
-    files = relationship("ProjectFile", back_populates="project", cascade="all, delete-orphan")
-    test_cases = relationship("TestCase", back_populates="project", cascade="all, delete-orphan")
+    # Rows go with the project through ON DELETE CASCADE; the ORM never loads them to delete them
+    users = relationship("ProjectUser", back_populates="project", passive_deletes=True)
+    files = relationship("ProjectFile", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
+    test_cases = relationship("TestCase", back_populates="project", cascade="all, delete-orphan", passive_deletes=True)
 
 
 # ------------------ Project ↔ User Mapping ------------------
 class ProjectUser(Base):
     __tablename__ = "project_users"
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     role = Column(String(50), default="member")  # admin / contributor / reader
     project = relationship("Project", back_populates="users")
@@ -56,7 +58,7 @@ class ProjectFile(Base):
     __tablename__ = "project_files"
 
     id = Column(Integer, primary_key=True, index=True)
-    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
     filename = Column(String, nullable=False)
     filepath = Column(String, nullable=False)  # Path inside db_data
     uploaded_at = Column(DateTime, default=datetime.utcnow)
@@ -73,6 +75,7 @@ class TestCase(Base):
     test_case = Column(JSON, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    version = Column(Integer, nullable=False, server_default="1")  # bumped on every write, for If-Match
 
-    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"))
+    project_id = Column(Integer, ForeignKey("projects.id", ondelete="CASCADE"), index=True)
     project = relationship("Project", back_populates="test_cases")
\ No newline at end of file
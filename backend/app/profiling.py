@@ -0,0 +1,281 @@
+import asyncio
+import cProfile
+import functools
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+
+from fastapi.routing import APIRoute
+
+from . import auth
+
+# ------------------ Request Profiling ------------------
+# Profiles single requests on demand, without redeploying:
+#   - an admin sends  X-Profile: cprofile | sample  (or 1 for the default mode)
+#   - or a fraction of all requests is picked at random (PROFILE_SAMPLE_RATE,
+#     changeable at runtime through PUT /admin/profiling)
+# "cprofile" writes a .prof file for pstats / snakeviz, "sample" a
+# .speedscope.json from a 1 ms stack sampler (lower overhead, opens in
+# https://www.speedscope.app). Files go to PROFILE_DIR and are listed by
+# GET /admin/profiles.
+#
+# Sync routes run in the threadpool, so the profiler is started around the
+# endpoint call itself (route.dependant.call) rather than in the middleware.
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/app/db_data/profiles")
+MODES = ("cprofile", "sample")
+SAMPLE_INTERVAL = 0.001
+MAX_PROFILES = 200
+
+settings = {
+    "sample_rate": float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+    "mode": os.getenv("PROFILE_MODE", "cprofile"),
+}
+
+_request = ContextVar("profile_request", default=None)
+
+
+# ------------------ Stack Sampler (speedscope) ------------------
+class StackSampler:
+    """Samples one thread's Python stack every SAMPLE_INTERVAL seconds."""
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.frames = []
+        self.frame_index = {}
+        self.samples = []
+        self.weights = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _frame_id(self, code, line):
+        key = (code.co_name, code.co_filename, line)
+        idx = self.frame_index.get(key)
+        if idx is None:
+            idx = self.frame_index[key] = len(self.frames)
+            self.frames.append({"name": code.co_name, "file": code.co_filename, "line": line})
+        return idx
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_id(frame.f_code, frame.f_code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples.append(stack)
+            self.weights.append(now - last)
+            last = now
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def speedscope(self, name):
+        total = sum(self.weights)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": self.frames},
+            "profiles": [{
+                "type": "sampled", "name": name, "unit": "seconds",
+                "startValue": 0, "endValue": total,
+                "samples": self.samples, "weights": self.weights,
+            }],
+            "name": name,
+            "activeProfileIndex": 0,
+            "exporter": "testops-backend",
+        }
+
+
+# ------------------ Profile Files ------------------
+def _slug(route_path):
+    return re.sub(r"[^A-Za-z0-9]+", "_", route_path).strip("_") or "root"
+
+
+def _write(method, route_path, seconds, profiler):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    base = f"{stamp}_{method}_{_slug(route_path)}_{int(seconds * 1000)}ms"
+    if isinstance(profiler, cProfile.Profile):
+        name = base + ".prof"
+        profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+    else:
+        name = base + ".speedscope.json"
+        with open(os.path.join(PROFILE_DIR, name), "w") as f:
+            json.dump(profiler.speedscope(f"{method} {route_path}"), f)
+    _prune()
+    return name
+
+
+def _prune():
+    files = sorted(list_profiles(), key=lambda p: p["created"])
+    for p in files[:-MAX_PROFILES]:
+        try:
+            os.remove(os.path.join(PROFILE_DIR, p["name"]))
+        except OSError:
+            pass
+
+
+def list_profiles():
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if not name.endswith((".prof", ".speedscope.json")):
+            continue
+        st = os.stat(os.path.join(PROFILE_DIR, name))
+        parts = name.split("_")
+        profiles.append({
+            "name": name,
+            "format": "pstats" if name.endswith(".prof") else "speedscope",
+            "method": parts[1] if len(parts) > 2 else None,
+            "duration_ms": int(parts[-1].split("ms")[0]) if parts[-1][:1].isdigit() else None,
+            "size": st.st_size,
+            "created": st.st_mtime,
+        })
+    return sorted(profiles, key=lambda p: p["created"], reverse=True)
+
+
+def profile_path(name):
+    """Absolute path of a listed profile, or None (also for anything outside PROFILE_DIR)."""
+    if os.path.basename(name) != name or not name.endswith((".prof", ".speedscope.json")):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ------------------ Endpoint Wrapping ------------------
+def _start(mode):
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+            return profiler
+        except ValueError:
+            pass  # Python 3.12+ allows one active cProfile at a time: sample instead
+    profiler = StackSampler(threading.get_ident())
+    profiler.start()
+    return profiler
+
+
+def _stop(profiler):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+
+
+def _profiled(call, method, route_path):
+    if getattr(call, "__profiled__", False):
+        return call
+
+    if asyncio.iscoroutinefunction(call):
+        # Async endpoints run on the event loop, so other requests served
+        # meanwhile can show up in their profile too
+        @functools.wraps(call)
+        async def wrapper(**kwargs):
+            req = _request.get()
+            if req is None:
+                return await call(**kwargs)
+            profiler = _start(req["mode"])
+            start = time.perf_counter()
+            try:
+                return await call(**kwargs)
+            finally:
+                _stop(profiler)
+                req["file"] = _write(method, route_path, time.perf_counter() - start, profiler)
+    else:
+        @functools.wraps(call)
+        def wrapper(**kwargs):
+            req = _request.get()
+            if req is None:
+                return call(**kwargs)
+            profiler = _start(req["mode"])
+            start = time.perf_counter()
+            try:
+                return call(**kwargs)
+            finally:
+                _stop(profiler)
+                req["file"] = _write(method, route_path, time.perf_counter() - start, profiler)
+
+    wrapper.__profiled__ = True
+    return wrapper
+
+
+def instrument_routes(app):
+    """Wrap every API route's endpoint call so it can be profiled. Call once all routes are defined."""
+    for route in app.routes:
+        if isinstance(route, APIRoute):
+            method = ",".join(sorted(route.methods or ()))
+            route.dependant.call = _profiled(route.dependant.call, method, route.path)
+
+
+# ------------------ Middleware ------------------
+def _is_admin(scope):
+    for key, value in scope.get("headers", ()):
+        if key == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            payload = auth.decode_access_token(token) if scheme.lower() == "bearer" else None
+            return bool(payload) and payload.get("role") == "admin"
+    return False
+
+
+def _requested_mode(scope):
+    for key, value in scope.get("headers", ()):
+        if key == b"x-profile":
+            value = value.decode("latin-1").strip().lower()
+            if value in MODES:
+                return value
+            if value in ("1", "true", "yes"):
+                return settings["mode"]
+    return None
+
+
+class ProfilingMiddleware:
+    """Decides per request whether to profile it and reports the file in X-Profile-File."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        mode = _requested_mode(scope)
+        if mode and not _is_admin(scope):
+            mode = None
+        if mode is None and settings["sample_rate"] > 0 and random.random() < settings["sample_rate"]:
+            mode = settings["mode"]
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+
+        req = {"mode": mode, "file": None}
+        token = _request.set(req)
+
+        async def send_with_file(message):
+            if message["type"] == "http.response.start" and req["file"]:
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"x-profile-file", req["file"].encode())
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_file)
+        finally:
+            _request.reset(token)
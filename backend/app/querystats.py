@@ -0,0 +1,220 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+
+from .metrics import Counter
+
+# ------------------ Query Counting ------------------
+# Counts SQL statements and DB time per request (or per `with count_queries()`
+# block), so N+1 patterns such as lazy relationships walked in a loop show up
+# as numbers instead of hiding in the latency.
+#
+#   QUERY_DEBUG_HEADERS=1   add X-DB-Query-Count / X-DB-Time-Ms to responses
+#   QUERY_BUDGET_STRICT=1   answer 500 when a route exceeds its @query_budget
+#                           (for CI and benchmark runs; otherwise just logged)
+#
+# Requests run in their own context (the route in the threadpool, the app in
+# TestClient's portal thread), so finished requests are also handed to every
+# active watch_requests() block: tests read route counts from there.
+
+DEBUG_HEADERS = os.getenv("QUERY_DEBUG_HEADERS", "0") == "1"
+BUDGET_STRICT = os.getenv("QUERY_BUDGET_STRICT", "0") == "1"
+
+BUDGET_EXCEEDED = Counter(
+    "db_query_budget_exceeded_total", "Requests that ran more SQL statements than their route's budget.", ["route"]
+)
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar("query_stats", default=None)
+_watchers = {}      # id -> list collecting the QueryStats of finished requests
+_watchers_lock = threading.Lock()
+
+
+class QueryStats:
+    def __init__(self, scope=None):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = []
+        self.scope = scope
+
+    @property
+    def route(self):
+        """Route template once the request has been routed, else the raw path."""
+        if self.scope is None:
+            return "-"
+        return getattr(self.scope.get("route"), "path", self.scope.get("path", "-"))
+
+    @property
+    def budget(self):
+        """@query_budget of the route that served the request, if any."""
+        return getattr((self.scope or {}).get("endpoint"), "query_budget", None)
+
+    @property
+    def over_budget(self):
+        return self.budget is not None and self.count > self.budget
+
+    def add(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if len(self.statements) < 100:
+            self.statements.append(statement)
+
+
+def current_stats():
+    """Stats of the request (or count_queries block) running in this context, if any."""
+    return _current.get()
+
+
+def instrument_engine(engine):
+    """Attribute every statement executed on engine to the current QueryStats."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_stats_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_stats_start"].pop()
+        stats = _current.get()
+        if stats is not None:
+            stats.add(statement, elapsed)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_stats_start"):
+            conn.info["query_stats_start"].pop()
+
+
+# ------------------ Budgets ------------------
+def query_budget(max_queries: int):
+    """
+    Declare how many SQL statements a route may run per request:
+
+        @app.get("/projects/{project_id}/testcases")
+        @query_budget(4)
+        def get_testcases(...): ...
+    """
+    def decorator(fn):
+        fn.query_budget = max_queries
+        return fn
+    return decorator
+
+
+@contextmanager
+def watch_requests():
+    """Collect the QueryStats of every request this process finishes inside the block."""
+    finished = []
+    with _watchers_lock:
+        _watchers[id(finished)] = finished
+    try:
+        yield finished
+    finally:
+        with _watchers_lock:
+            del _watchers[id(finished)]
+
+
+def _request_finished(stats):
+    with _watchers_lock:
+        for finished in _watchers.values():
+            finished.append(stats)
+
+
+def check_budgets(requests):
+    """Raise AssertionError listing the requests (QueryStats) that ran more statements than their route's budget."""
+    over = [stats for stats in requests if stats.over_budget]
+    if over:
+        listing = "\n".join(
+            f"{stats.scope['method']} {stats.route}: {stats.count} queries, budget {stats.budget}\n"
+            + "\n".join(f"    {s}" for s in stats.statements)
+            for stats in over
+        )
+        raise AssertionError(f"Query budget exceeded:\n{listing}")
+
+
+@contextmanager
+def count_queries():
+    """
+    Count the statements run inside the block, including those of requests
+    served meanwhile (e.g. through TestClient): `with count_queries() as stats: ...; stats.count`.
+    """
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        with watch_requests() as finished:
+            yield stats
+    finally:
+        _current.reset(token)
+        for request in finished:
+            stats.count += request.count
+            stats.seconds += request.seconds
+            stats.statements.extend(request.statements[:100 - len(stats.statements)])
+
+
+@contextmanager
+def assert_max_queries(max_queries: int):
+    """Fail with AssertionError if the block runs more than max_queries statements."""
+    with count_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {s}" for s in stats.statements)
+        raise AssertionError(f"{stats.count} queries, budget is {max_queries}:\n{listing}")
+
+
+class QueryStatsMiddleware:
+    """Collects QueryStats per request, adds debug headers and enforces route budgets."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(scope)
+        token = _current.set(stats)
+        over_budget = [False]
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                budget = stats.budget
+                if stats.over_budget:
+                    route = stats.route
+                    BUDGET_EXCEEDED.inc(route=route)
+                    logger.warning(
+                        "%s %s ran %d queries (budget %d)", scope["method"], route, stats.count, budget
+                    )
+                    if BUDGET_STRICT:
+                        over_budget[0] = True
+                        body = json.dumps({
+                            "detail": f"Query budget exceeded: {stats.count} > {budget}",
+                            "statements": stats.statements,
+                        }).encode()
+                        await send({"type": "http.response.start", "status": 500,
+                                    "headers": [(b"content-type", b"application/json"),
+                                                (b"content-length", str(len(body)).encode())]})
+                        await send({"type": "http.response.body", "body": body})
+                        return
+                if DEBUG_HEADERS:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (b"x-db-query-count", str(stats.count).encode()),
+                        (b"x-db-time-ms", f"{stats.seconds * 1000:.2f}".encode()),
+                    ]
+            elif over_budget[0]:
+                return  # original body was replaced by the budget error
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current.reset(token)
+            _request_finished(stats)
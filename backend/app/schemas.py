@@ -99,6 +99,67 @@ class TestCaseOut(TestCaseBase):
     project_id: int
     created_at: datetime
     updated_at: datetime
+    version: int = 1
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class TestCaseFieldUpdate(BaseModel):
+    id: int
+    fields: Dict
+
+
+class TestCaseBatch(BaseModel):
+    delete_ids: List[int] = []
+    updates: List[TestCaseFieldUpdate] = []
+    creates: List[Dict] = []
+    skip_duplicates: bool = False   # drop creates that near-duplicate existing test cases
+
+
+class TestCaseBatchResult(BaseModel):
+    created: List[int] = []
+    deleted: List[int] = []
+    updated: List[int] = []
+    not_found: List[int] = []
+    duplicates: List[Dict] = []     # {"index": position in creates, "duplicate_of": id or None}
+
+
+class TestCaseSearchHit(BaseModel):
+    id: int
+    rank: float
+    snippet: str
+    test_case: Dict
+
+
+class TestCaseSearchResult(BaseModel):
+    total: int
+    results: List[TestCaseSearchHit] = []
+
+
+class TestCaseCloneRequest(BaseModel):
+    target_project_id: int
+    priorities: Optional[List[str]] = None  # only test cases with one of these Priority values
+    include_files: bool = False             # also reference the source project's files
+    background: bool = False                # run as a job even below CLONE_SYNC_LIMIT
+
+
+class TestCaseCloneJob(BaseModel):
+    id: Optional[str] = None                # set for background jobs, see GET /clone_jobs/{id}
+    status: str                             # pending | running | done | failed
+    source_project_id: int
+    target_project_id: int
+    matched: int
+    testcases: Optional[int] = None
+    files: Optional[int] = None
+    error: Optional[str] = None
+
+
+class DuplicateClusters(BaseModel):
+    threshold: float
+    clusters: List[List[int]] = []
+
+
+# ------------------ Admin Diagnostics Schemas ------------------
+class ProfilingSettings(BaseModel):
+    sample_rate: Optional[float] = None
+    mode: Optional[str] = None
@@ -0,0 +1,225 @@
+import heapq
+import html
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from . import events, models
+
+# ------------------ Test Case Full-Text Search ------------------
+# Ranked search over Description, Steps and Expected Result of a project's
+# test cases, with highlighted snippets.
+#
+# Postgres: a GIN index on the to_tsvector() expression (ix_testcases_search),
+# maintained by Postgres on every write; queries use websearch_to_tsquery
+# (quoted phrases, -exclusions, "or"), ts_rank_cd and ts_headline.
+#
+# Other databases (SQLite in development and benchmarks): an in-process
+# inverted index per project, built on the first search and kept up to date
+# from the change feed. It ranks with BM25 and matches whole words, without
+# Postgres' stemming or query syntax.
+
+FIELDS = ("Description", "Steps", "Expected Result")
+TS_CONFIG = "english"
+MAX_INDEXED_PROJECTS = 50
+SNIPPET_CHARS = 160
+
+_DOCUMENT = " || ' ' || ".join(f"coalesce(test_case->>'{field}', '')" for field in FIELDS)
+_TSVECTOR = f"to_tsvector('{TS_CONFIG}', {_DOCUMENT})"
+# ts_headline marks matches with private-use characters; the snippet is HTML-escaped before they become <mark>s
+_MARK_START, _MARK_STOP = "\ue000", "\ue001"
+_HEADLINE_OPTIONS = f"StartSel={_MARK_START}, StopSel={_MARK_STOP}, MaxWords=35, MinWords=15, MaxFragments=2"
+
+_PG_SEARCH = text(f"""
+    WITH hits AS (
+        SELECT id, ts_rank_cd({_TSVECTOR}, query) AS rank, count(*) OVER () AS total, query
+        FROM testcases, websearch_to_tsquery('{TS_CONFIG}', :q) AS query
+        WHERE project_id = :pid AND {_TSVECTOR} @@ query
+        ORDER BY rank DESC, id
+        LIMIT :limit OFFSET :offset
+    )
+    SELECT t.id, t.test_case, hits.rank, hits.total,
+           ts_headline('{TS_CONFIG}', {_DOCUMENT.replace("test_case", "t.test_case")}, hits.query,
+                       '{_HEADLINE_OPTIONS}') AS snippet
+    FROM hits JOIN testcases t ON t.id = hits.id
+    ORDER BY hits.rank DESC, t.id
+""")
+
+
+def ensure_index(engine):
+    """Create the Postgres GIN index used by search (no-op on other databases)."""
+    if engine.dialect.name != "postgresql":
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS ix_testcases_search ON testcases USING GIN (({_TSVECTOR}))"))
+
+
+def document_text(test_case):
+    if not isinstance(test_case, dict):
+        return ""
+    return " ".join(str(test_case.get(field) or "") for field in FIELDS)
+
+
+def search_testcases(db: Session, project_id: int, q: str, limit: int = 20, offset: int = 0):
+    """Returns {"total": n, "results": [{"id", "rank", "snippet", "test_case"}, ...]}, best match first."""
+    if db.get_bind().dialect.name == "postgresql":
+        rows = db.execute(_PG_SEARCH, {"q": q, "pid": project_id, "limit": limit, "offset": offset}).mappings().all()
+        return {
+            "total": rows[0]["total"] if rows else 0,
+            "results": [
+                {"id": r["id"], "rank": float(r["rank"]), "snippet": _marked(r["snippet"]), "test_case": r["test_case"]}
+                for r in rows
+            ],
+        }
+    return _fallback_index(db, project_id).search(q, limit, offset)
+
+
+# ------------------ In-Process Index (fallback) ------------------
+_TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were will with".split()
+)
+
+
+def tokenize(value):
+    return [t for t in _TOKEN.findall(value.lower()) if t not in STOPWORDS]
+
+
+def _marked(headline):
+    """HTML-escape a ts_headline result, then turn its match markers into <mark> tags."""
+    return html.escape(headline or "").replace(_MARK_START, "<mark>").replace(_MARK_STOP, "</mark>")
+
+
+def _snippet(value, terms):
+    pattern = re.compile(r"\b(" + "|".join(re.escape(t) for t in terms) + r")\b", re.IGNORECASE)
+    first = pattern.search(value)
+    start = max(0, first.start() - SNIPPET_CHARS // 3) if first else 0
+    excerpt = value[start:start + SNIPPET_CHARS]
+    # Escape around the matches rather than before: a term like "amp" would match inside "&amp;"
+    parts, end = [], 0
+    for match in pattern.finditer(excerpt):
+        parts += [html.escape(excerpt[end:match.start()]), "<mark>", html.escape(match.group()), "</mark>"]
+        end = match.end()
+    parts.append(html.escape(excerpt[end:]))
+    return ("..." if start > 0 else "") + "".join(parts) + ("..." if start + SNIPPET_CHARS < len(value) else "")
+
+
+class ProjectIndex:
+    """Inverted index of one project's test cases: term -> {test case id: term frequency}."""
+
+    K1, B = 1.2, 0.75
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}          # id -> (test_case, Counter of terms, length)
+        self.total_length = 0
+        self.lock = threading.Lock()
+
+    def add(self, tc_id, test_case):
+        with self.lock:
+            self._remove(tc_id)
+            self._add(tc_id, test_case)
+
+    def _add(self, tc_id, test_case):
+        terms = Counter(tokenize(document_text(test_case)))
+        for term, tf in terms.items():
+            self.postings.setdefault(term, {})[tc_id] = tf
+        length = sum(terms.values())
+        self.docs[tc_id] = (test_case, terms, length)
+        self.total_length += length
+
+    def remove(self, tc_id):
+        with self.lock:
+            self._remove(tc_id)
+
+    def _remove(self, tc_id):
+        doc = self.docs.pop(tc_id, None)
+        if doc is None:
+            return
+        for term in doc[1]:
+            posting = self.postings[term]
+            del posting[tc_id]
+            if not posting:
+                del self.postings[term]
+        self.total_length -= doc[2]
+
+    def search(self, q, limit, offset):
+        terms = list(dict.fromkeys(tokenize(q)))
+        with self.lock:
+            postings = [self.postings.get(t, {}) for t in terms]
+            if not terms or not all(postings):
+                return {"total": 0, "results": []}
+            # Every term must match: intersect starting from the rarest
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+
+            n = len(self.docs)
+            avg_length = self.total_length / n
+            idf = [math.log(1 + (n - len(p) + 0.5) / (len(p) + 0.5)) for p in postings]
+
+            def score(tc_id):
+                norm = self.K1 * (1 - self.B + self.B * self.docs[tc_id][2] / avg_length)
+                return sum(w * p[tc_id] * (self.K1 + 1) / (p[tc_id] + norm) for w, p in zip(idf, postings))
+
+            ranked = heapq.nsmallest(offset + limit, ((-score(i), i) for i in candidates))[offset:]
+            results = [
+                {
+                    "id": tc_id,
+                    "rank": -neg,
+                    "snippet": _snippet(document_text(self.docs[tc_id][0]), terms),
+                    "test_case": self.docs[tc_id][0],
+                }
+                for neg, tc_id in ranked
+            ]
+        return {"total": len(candidates), "results": results}
+
+
+_indexes = OrderedDict()    # project_id -> ProjectIndex, least recently searched first
+_indexes_lock = threading.Lock()
+
+
+def _fallback_index(db: Session, project_id: int):
+    with _indexes_lock:
+        index = _indexes.get(project_id)
+        if index is not None:
+            _indexes.move_to_end(project_id)
+            return index
+        # Registered (and locked) before loading: writes committed meanwhile
+        # wait for the load and are applied on top of it
+        index = _indexes[project_id] = ProjectIndex()
+        index.lock.acquire()
+        while len(_indexes) > MAX_INDEXED_PROJECTS:
+            _indexes.popitem(last=False)
+    try:
+        t = models.TestCase
+        for tc_id, test_case in db.execute(select(t.id, t.test_case).where(t.project_id == project_id)):
+            index._add(tc_id, test_case)
+    except Exception:
+        with _indexes_lock:
+            _indexes.pop(project_id, None)
+        raise
+    finally:
+        index.lock.release()
+    return index
+
+
+def _on_event(project_id, event_type, data):
+    index = _indexes.get(project_id)
+    if index is None:
+        return
+    if event_type in ("create", "update"):
+        index.add(data["id"], data["test_case"])
+    elif event_type == "delete":
+        index.remove(data["id"])
+    elif event_type == "reset":
+        with _indexes_lock:
+            _indexes.pop(project_id, None)
+
+
+events.add_listener(_on_event)
@@ -0,0 +1,199 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+from .querystats import current_stats
+
+# ------------------ Slow Query Log ------------------
+# Statements slower than SLOW_QUERY_MS are written as JSON lines to a rotating
+# file (SLOW_QUERY_LOG) with the route that issued them and their parameters
+# redacted, and aggregated in memory for GET /admin/slow_queries.
+# The plan is captured in the background on a separate connection:
+# EXPLAIN (ANALYZE, BUFFERS) for plain table reads on Postgres, plain EXPLAIN
+# for everything else (ANALYZE executes the statement again: writes, row
+# locks and functions with side effects such as pg_advisory_lock() would
+# happen twice), EXPLAIN QUERY PLAN on SQLite.
+# Each distinct statement is explained at most once per EXPLAIN_INTERVAL.
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "/app/db_data/slow_queries.log")
+EXPLAIN_INTERVAL = 600
+MAX_FINGERPRINTS = 500
+
+_offenders = {}     # fingerprint -> aggregate dict
+_lock = threading.Lock()
+_explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slowlog-explain")
+_pending_explains = set()
+
+_file_logger = logging.getLogger("slow_queries")
+_file_logger.propagate = False
+logger = logging.getLogger(__name__)
+
+
+def _setup_file():
+    if _file_logger.handlers or not SLOW_QUERY_LOG:
+        return
+    try:
+        os.makedirs(os.path.dirname(SLOW_QUERY_LOG) or ".", exist_ok=True)
+        handler = RotatingFileHandler(SLOW_QUERY_LOG, maxBytes=10 * 1024 * 1024, backupCount=5)
+    except OSError as e:
+        logger.warning("Slow query log disabled, cannot open %s: %s", SLOW_QUERY_LOG, e)
+        return
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    _file_logger.addHandler(handler)
+    _file_logger.setLevel(logging.INFO)
+
+
+def _redact_value(value):
+    if value is None or isinstance(value, (bool, int, float)):
+        return value  # ids, limits, flags: useful and not sensitive
+    if isinstance(value, (str, bytes)):
+        return f"<{type(value).__name__} len={len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [_redact_value(v) for v in value[:20]]
+    return f"<{type(value).__name__}>"
+
+
+def redact(parameters):
+    """Keep numbers and NULLs, replace strings / JSON / binaries with a type and length."""
+    if isinstance(parameters, dict):
+        return {k: _redact_value(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"executemany": len(parameters), "first": redact(parameters[0])}
+        return [_redact_value(v) for v in parameters]
+    return _redact_value(parameters)
+
+
+def _normalize(statement):
+    return re.sub(r"\s+", " ", statement).strip()
+
+
+def _fingerprint(statement):
+    return hashlib.sha1(statement.encode("utf-8")).hexdigest()[:12]
+
+
+_READ = re.compile(r"\s*(SELECT|WITH)\b", re.IGNORECASE)
+_FROM = re.compile(r"\bFROM\b", re.IGNORECASE)
+_SIDE_EFFECTS = re.compile(
+    r"\b(INSERT|UPDATE|DELETE|MERGE|FOR\s+SHARE|INTO)\b"
+    r"|\b(pg_\w+|nextval|setval|set_config|lo_\w+|dblink\w*)\s*\(",
+    re.IGNORECASE,
+)
+
+
+def analyze_safe(statement):
+    """True for plain table reads, the only statements worth re-running under EXPLAIN ANALYZE."""
+    return bool(_READ.match(statement) and _FROM.search(statement) and not _SIDE_EFFECTS.search(statement))
+
+
+def explain_prefix(dialect, statement):
+    if dialect == "postgresql":
+        return "EXPLAIN (ANALYZE, BUFFERS) " if analyze_safe(statement) else "EXPLAIN "
+    if dialect == "sqlite":
+        return "EXPLAIN QUERY PLAN "
+    return "EXPLAIN "
+
+
+def _explain(engine, statement, parameters, fp):
+    try:
+        prefix = explain_prefix(engine.dialect.name, statement)
+        with engine.connect() as conn:
+            conn.info["slowlog_skip"] = True
+            try:
+                rows = conn.exec_driver_sql(prefix + statement, parameters).fetchall()
+            finally:
+                conn.rollback()
+                conn.info.pop("slowlog_skip", None)
+        plan = "\n".join(" ".join(str(col) for col in row) for row in rows)
+    except Exception as e:
+        plan = f"EXPLAIN failed: {e}"
+    with _lock:
+        entry = _offenders.get(fp)
+        if entry is not None:
+            entry["plan"] = plan
+            entry["plan_at"] = time.time()
+        _pending_explains.discard(fp)
+    _file_logger.info(json.dumps({"fingerprint": fp, "plan": plan}))
+
+
+def record(engine, statement, parameters, seconds, route):
+    """Log one slow statement and schedule its EXPLAIN if due."""
+    text = _normalize(statement)
+    fp = _fingerprint(text)
+    ms = round(seconds * 1000, 2)
+    redacted = redact(parameters)
+    now = time.time()
+    with _lock:
+        entry = _offenders.get(fp)
+        if entry is None:
+            if len(_offenders) >= MAX_FINGERPRINTS:
+                # forget the least costly statement to make room
+                del _offenders[min(_offenders, key=lambda k: _offenders[k]["total_ms"])]
+            entry = _offenders[fp] = {
+                "fingerprint": fp, "statement": text, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                "routes": {}, "last_params": None, "last_seen": None, "plan": None, "plan_at": 0.0,
+            }
+        entry["count"] += 1
+        entry["total_ms"] += ms
+        entry["max_ms"] = max(entry["max_ms"], ms)
+        entry["routes"][route] = entry["routes"].get(route, 0) + 1
+        entry["last_params"] = redacted
+        entry["last_seen"] = now
+        explain_due = now - entry["plan_at"] > EXPLAIN_INTERVAL and fp not in _pending_explains
+        if explain_due:
+            _pending_explains.add(fp)
+
+    _file_logger.info(json.dumps({
+        "ts": datetime.now(timezone.utc).isoformat(),
+        "fingerprint": fp,
+        "ms": ms,
+        "route": route,
+        "statement": text,
+        "params": redacted,
+    }, default=str))
+    if explain_due:
+        _explainer.submit(_explain, engine, statement, parameters, fp)
+
+
+def top_offenders(limit: int = 20, order_by: str = "total_ms"):
+    """Slowest statements seen by this process, most expensive first."""
+    with _lock:
+        entries = [dict(e, routes=dict(e["routes"])) for e in _offenders.values()]
+    entries.sort(key=lambda e: e.get(order_by, 0), reverse=True)
+    for e in entries:
+        e["avg_ms"] = round(e["total_ms"] / e["count"], 2)
+        e["total_ms"] = round(e["total_ms"], 2)
+    return entries[:limit]
+
+
+def instrument_engine(engine):
+    """Report statements slower than SLOW_QUERY_MS executed on engine."""
+    _setup_file()
+    threshold = SLOW_QUERY_MS / 1000
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slowlog_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["slowlog_start"].pop()
+        if elapsed >= threshold and not conn.info.get("slowlog_skip"):
+            stats = current_stats()
+            record(engine, statement, parameters, elapsed, stats.route if stats else "background")
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("slowlog_start"):
+            conn.info["slowlog_start"].pop()
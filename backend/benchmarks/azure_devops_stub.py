@@ -0,0 +1,73 @@
+"""
+Stand-in for the Azure DevOps work item API, for benchmarks.
+
+Accepts POST /{org}/{project}/_apis/wit/workitems/$Test%20Case and answers
+like Azure DevOps (200 + a work item with an increasing id), after an
+optional artificial latency. Point the backend at it with AZURE_DEVOPS_URL.
+
+    python benchmarks/azure_devops_stub.py [port] [latency_ms]
+"""
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def make_handler(latency, counter, received):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = self.rfile.read(length)
+            if latency:
+                time.sleep(latency)
+            if "/_apis/wit/workitems/" not in self.path:
+                self._reply(404, {"message": "not found"})
+                return
+            try:
+                ops = json.loads(body or b"[]")
+                fields = {op["path"].rsplit("/", 1)[-1]: op.get("value") for op in ops}
+            except (ValueError, KeyError, TypeError):
+                self._reply(400, {"message": "invalid json-patch document"})
+                return
+            item_id = next(counter)
+            received.append(item_id)
+            self._reply(200, {"id": item_id, "rev": 1, "fields": fields})
+
+        def _reply(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def start_stub(port=0, latency_ms=0.0):
+    """Start the stub in a background thread. Returns (server, base_url); server.received lists created ids."""
+    received = []
+    handler = make_handler(latency_ms / 1000, itertools.count(1), received)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.received = received
+    threading.Thread(target=server.serve_forever, name="azure-devops-stub", daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8089
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.0
+    server, url = start_stub(port, latency)
+    print(f"Azure DevOps stub on {url} (latency {latency} ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
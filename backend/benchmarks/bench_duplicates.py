@@ -0,0 +1,99 @@
+"""
+Benchmark for the near-duplicate index (app.duplicates) at 100k test cases.
+
+Builds a synthetic project of --testcases random test cases in which
+--dup-rate of them are near-copies of another one (a word or two changed),
+then measures:
+
+  - building the index (MinHash + LSH) and the cost of one more insert,
+  - GET .../testcases/duplicates (ProjectIndex.clusters) against the planted
+    duplicates (recall / precision of the pairs),
+  - a brute-force all-pairs comparison of the signatures on a sample,
+    extrapolated to the full size, for reference.
+
+    python benchmarks/bench_duplicates.py [--testcases 100000] [--dup-rate 0.05]
+
+Runs in memory; no database is needed.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import numpy as np  # noqa: E402
+
+from app import duplicates  # noqa: E402
+
+WORDS = [f"w{i}" for i in range(5000)]
+
+
+def make_corpus(n, dup_rate, rng):
+    cases, planted = [], set()
+    for i in range(n):
+        if cases and rng.random() < dup_rate:
+            src = rng.randrange(len(cases))
+            words = cases[src]["Description"].split()
+            words[rng.randrange(len(words))] = rng.choice(WORDS)
+            case = dict(cases[src], Description=" ".join(words))
+            planted.add((src, i))
+        else:
+            case = {
+                "Description": " ".join(rng.choices(WORDS, k=14)),
+                "Steps": " ".join(rng.choices(WORDS, k=20)),
+                "Expected Result": " ".join(rng.choices(WORDS, k=10)),
+            }
+        cases.append(case)
+    return cases, planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--testcases", type=int, default=100_000)
+    parser.add_argument("--dup-rate", type=float, default=0.05)
+    parser.add_argument("--sample", type=int, default=2000, help="size of the brute-force sample")
+    args = parser.parse_args()
+    rng = random.Random(7)
+
+    cases, planted = make_corpus(args.testcases, args.dup_rate, rng)
+    index = duplicates.ProjectIndex()
+
+    start = time.perf_counter()
+    for tc_id, case in enumerate(cases):
+        index.add(tc_id, case)
+    build = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for k in range(200):
+        index.add(args.testcases + k, cases[rng.randrange(len(cases))])
+    insert_ms = (time.perf_counter() - start) / 200 * 1000
+    for k in range(200):
+        index.remove(args.testcases + k)
+
+    start = time.perf_counter()
+    clusters = index.clusters()
+    clusters_ms = (time.perf_counter() - start) * 1000
+
+    found = {(min(a, b), max(a, b)) for a, others in index.edges.items() for b in others}
+    hits = len(found & planted)
+    print(f"{args.testcases} test cases, {len(planted)} planted duplicate pairs, threshold {index.threshold}")
+    print(f"  build index:        {build:8.1f} s  ({build / args.testcases * 1e6:.0f} us per test case)")
+    print(f"  one more insert:    {insert_ms:8.2f} ms")
+    print(f"  list clusters:      {clusters_ms:8.2f} ms  ({len(clusters)} clusters, {len(found)} pairs)")
+    print(f"  pair recall:        {hits / max(1, len(planted)):8.3f}")
+    print(f"  pair precision:     {hits / max(1, len(found)):8.3f}  (other pairs are duplicates of duplicates)")
+
+    sample = np.stack([index.signatures[i] for i in range(min(args.sample, args.testcases))])
+    start = time.perf_counter()
+    for i in range(len(sample)):
+        np.count_nonzero(sample[i + 1:] == sample[i], axis=1)
+    brute = time.perf_counter() - start
+    scale = (args.testcases / len(sample)) ** 2
+    print(f"  all pairs, {len(sample)} sample: {brute:6.2f} s  -> ~{brute * scale:.0f} s at {args.testcases}")
+
+
+if __name__ == "__main__":
+    main()
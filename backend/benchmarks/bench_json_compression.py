@@ -0,0 +1,114 @@
+"""
+Benchmark for compressed JSON columns (app.compressed_json.CompressedJSON).
+
+Writes the same chat histories (user prompts and generated test cases, of
+--sizes KB each) into two scratch tables, one with a plain JSON column and
+one with CompressedJSON, and reports per size:
+
+  - bytes stored for the column (and the table size on Postgres),
+  - write time, and read latency of one history (p50),
+  - time to scan the table without reading the histories.
+
+    python benchmarks/bench_json_compression.py [--sizes 10 100 1000] [--rows 50]
+
+Uses a throwaway SQLite database unless DATABASE_URL is set; the scratch
+tables are dropped afterwards.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seed import make_testcase  # noqa: E402
+
+from sqlalchemy import JSON, Column, Integer, MetaData, String, Table, func, insert, select, text  # noqa: E402
+
+from app import compressed_json  # noqa: E402
+from app.db import engine  # noqa: E402
+
+metadata = MetaData()
+TABLES = {
+    "plain JSON": Table("bench_history_plain", metadata, Column("id", Integer, primary_key=True),
+                        Column("name", String(200)), Column("chat_history", JSON)),
+    "CompressedJSON": Table("bench_history_compressed", metadata, Column("id", Integer, primary_key=True),
+                            Column("name", String(200)), Column("chat_history", compressed_json.CompressedJSON)),
+}
+
+
+def make_history(kb, rng):
+    """Alternating prompts and answers listing generated test cases, about kb kilobytes of JSON."""
+    history, size, i = [], 0, 0
+    while size < kb * 1024:
+        prompt = f"generate test cases for section {i} of the requirements"
+        cases = [make_testcase(i * 10 + k, rng) for k in range(5)]
+        answer = "\n\n".join("\n".join(f"{key}: {value}" for key, value in tc.items()) for tc in cases)
+        history += [{"role": "user", "content": prompt}, {"role": "assistant", "content": answer}]
+        size += len(prompt) + len(answer) + 60
+        i += 1
+    return history
+
+
+def stored_bytes(conn, table):
+    if engine.dialect.name == "postgresql":
+        column = conn.execute(select(func.sum(func.pg_column_size(table.c.chat_history)))).scalar()
+        total = conn.execute(text(f"SELECT pg_total_relation_size('{table.name}')")).scalar()
+        return column, total
+    return conn.execute(select(func.sum(func.length(table.c.chat_history)))).scalar(), None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000], help="history size in KB")
+    parser.add_argument("--rows", type=int, default=50, help="projects (histories) per size")
+    parser.add_argument("--reads", type=int, default=50)
+    args = parser.parse_args()
+    rng = random.Random(1)
+
+    print(f"{engine.dialect.name}, {args.rows} histories per size, "
+          f"zstd={'yes' if compressed_json.zstandard else 'no (zlib)'}, "
+          f"threshold {compressed_json.JSON_COMPRESS_MIN_BYTES} B\n")
+    print(f"  {'size':>6s} {'column':15s} {'stored MB':>10s} {'table MB':>9s} {'write s':>8s} "
+          f"{'read ms':>8s} {'scan ms':>8s}")
+    try:
+        for kb in args.sizes:
+            histories = [make_history(kb, rng) for _ in range(args.rows)]
+            for label, table in TABLES.items():
+                metadata.drop_all(engine, tables=[table])
+                metadata.create_all(engine, tables=[table])
+                start = time.perf_counter()
+                with engine.begin() as conn:
+                    for i, history in enumerate(histories):
+                        conn.execute(insert(table), {"name": f"project-{i}", "chat_history": history})
+                write = time.perf_counter() - start
+
+                with engine.connect() as conn:
+                    if engine.dialect.name == "postgresql":
+                        conn.execute(text(f"VACUUM ANALYZE {table.name}").execution_options(isolation_level="AUTOCOMMIT"))
+                    column, total = stored_bytes(conn, table)
+                    reads = []
+                    for _ in range(args.reads):
+                        row_id = rng.randint(1, args.rows)
+                        start = time.perf_counter()
+                        value = conn.execute(select(table.c.chat_history).where(table.c.id == row_id)).scalar()
+                        reads.append((time.perf_counter() - start) * 1000)
+                    assert value == histories[row_id - 1]
+                    start = time.perf_counter()
+                    for _ in range(20):
+                        conn.execute(select(func.count()).where(table.c.name.like("%-4%"))).scalar()
+                    scan = (time.perf_counter() - start) / 20 * 1000
+                total_mb = f"{total / 2**20:9.1f}" if total is not None else f"{'-':>9s}"
+                print(f"  {kb:4d}KB {label:15s} {column / 2**20:10.2f} {total_mb} {write:8.2f} "
+                      f"{statistics.median(reads):8.2f} {scan:8.2f}")
+    finally:
+        metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Benchmark for POST /projects/{id}/users/assign (crud.update_project_users)
+with 5,000 users.
+
+Compares the previous implementation (a conflict SELECT per user, list
+membership checks, ORM deletes / inserts one by one) with the set-based
+sync, for the first assignment and for a re-sync that swaps 10% of them.
+
+    python benchmarks/bench_project_users.py [users]
+
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import os
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from app import crud, models  # noqa: E402
+from app.db import SessionLocal, engine  # noqa: E402
+from app.querystats import count_queries, instrument_engine  # noqa: E402
+
+instrument_engine(engine)
+
+
+def legacy_update_project_users(db, project_id, user_ids):
+    conflicts = []
+    for uid in user_ids:
+        q = db.query(models.ProjectUser).filter(models.ProjectUser.user_id == uid).first()
+        if q and q.project_id != project_id:
+            conflicts.append(uid)
+    if conflicts:
+        raise ValueError(f"Users already assigned to other projects: {conflicts}")
+
+    existing = db.query(models.ProjectUser).filter(models.ProjectUser.project_id == project_id).all()
+    existing_ids = [e.user_id for e in existing]
+
+    for e in existing:
+        if e.user_id not in user_ids:
+            db.delete(e)
+    for uid in user_ids:
+        if uid not in existing_ids:
+            db.add(models.ProjectUser(project_id=project_id, user_id=uid))
+    db.commit()
+    return db.query(models.ProjectUser).filter(models.ProjectUser.project_id == project_id).all()
+
+
+def setup(n):
+    models.Base.metadata.create_all(bind=engine)
+    run = time.time_ns()
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"username": f"assign-{run}-{i}", "password_hash": "-", "role": "user"} for i in range(n + n // 10)
+        ])
+        conn.execute(insert(models.Project), [
+            {"name": f"assign-{run}-{p}", "organization": "org", "pat": "x"} for p in range(2)
+        ])
+        users = conn.execute(
+            select(models.User.id).where(models.User.username.like(f"assign-{run}-%")).order_by(models.User.id)
+        ).scalars().all()
+        projects = conn.execute(
+            select(models.Project.id).where(models.Project.name.like(f"assign-{run}-%")).order_by(models.Project.id)
+        ).scalars().all()
+    return users, projects
+
+
+def timed(fn, db, project_id, user_ids):
+    with count_queries() as stats:
+        start = time.perf_counter()
+        result = fn(db, project_id, user_ids)
+        elapsed = time.perf_counter() - start
+    return elapsed, stats.count, len(result)
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    users, (legacy_project, new_project) = setup(2 * n)
+    legacy_users, new_users = users[: len(users) // 2], users[len(users) // 2:]
+    print(f"{n} users on {engine.dialect.name}\n")
+    print(f"  {'':34s} {'seconds':>9s} {'queries':>8s} {'members':>8s}")
+
+    for label, fn, pool, project_id in (
+        ("before", legacy_update_project_users, legacy_users, legacy_project),
+        ("after ", crud.update_project_users, new_users, new_project),
+    ):
+        first = pool[:n]
+        swapped = pool[n // 10:n] + pool[n:n + n // 10]  # drop the first 10%, add 10% new
+        for step, ids in (("assign", first), ("re-sync, 10% swapped", swapped)):
+            db = SessionLocal()
+            elapsed, queries, members = timed(fn, db, project_id, ids)
+            db.close()
+            print(f"  {label} {step:27s} {elapsed:9.3f} {queries:8d} {members:8d}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Load on the primary database with and without a read replica.
+
+Seeds once, then runs the loadtest.py mix against a fresh server twice:
+without DATABASE_REPLICA_URL and with it. After each run it reads the
+server's /metrics and prints the statements and DB time on each database,
+per request, next to req/s and p95.
+
+    python benchmarks/bench_replica.py [--vus 40] [--duration 30]
+    DATABASE_URL=postgresql://...@primary/db DATABASE_REPLICA_URL=postgresql://...@standby/db \\
+        python benchmarks/bench_replica.py --scale medium
+
+On SQLite the replica is the primary's file opened read-only
+(sqlite:///file:<path>?mode=ro&uri=true): any write routed to it fails, and
+the numbers show which statements moved, but both share one file. With a
+Postgres standby the primary's CPU and I/O go down with its statement count.
+"""
+import argparse
+import os
+import re
+import tempfile
+from collections import defaultdict
+
+import requests
+
+from loadtest import SCALES, _free_port, run_load, start_server
+from azure_devops_stub import start_stub
+from seed import seed
+
+METRIC = re.compile(r'db_query_duration_seconds_(count|sum)\{database="(\w+)",operation="[^"]*"\} (\S+)')
+
+
+def db_load(url):
+    """{database: [statements, seconds]} so far, from the server's /metrics."""
+    totals = defaultdict(lambda: [0, 0.0])
+    for line in requests.get(f"{url}/metrics", timeout=10).text.splitlines():
+        match = METRIC.match(line)
+        if match:
+            kind, database, value = match.groups()
+            totals[database][0 if kind == "count" else 1] += float(value)
+    return totals
+
+
+def replica_url():
+    if os.getenv("DATABASE_REPLICA_URL"):
+        return os.environ["DATABASE_REPLICA_URL"]
+    database_url = os.environ["DATABASE_URL"]
+    if not database_url.startswith("sqlite:///"):
+        raise SystemExit("Set DATABASE_REPLICA_URL to a replica of DATABASE_URL")
+    return f"sqlite:///file:{database_url[len('sqlite:///'):]}?mode=ro&uri=true"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--vus", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    replica = replica_url()
+    data = seed(**SCALES[args.scale], seed_value=args.seed)
+    stub, stub_url = start_stub(latency_ms=20)
+    rows = []
+    try:
+        for label, replica_env in (("primary only", ""), ("with replica", replica)):
+            proc, url = start_server(_free_port(), {
+                "AZURE_DEVOPS_URL": stub_url,
+                "DATABASE_REPLICA_URL": replica_env,
+                "LOG_LEVEL": "WARNING",
+                "PROFILE_DIR": os.path.join(tempfile.gettempdir(), "bench_replica_profiles"),
+                "SLOW_QUERY_LOG": os.path.join(tempfile.gettempdir(), "bench_replica_slow_queries.log"),
+            })
+            try:
+                before = db_load(url)
+                summary = run_load(url, data, args.vus, args.duration, args.seed)
+                after = db_load(url)
+            finally:
+                proc.terminate()
+                proc.wait(30)
+            load = {db: [after[db][i] - before[db][i] for i in (0, 1)] for db in after}
+            rows.append((label, summary, load))
+    finally:
+        stub.shutdown()
+
+    print(f"\n{args.vus} virtual users, {args.duration:.0f} s, {args.scale} scale, "
+          f"{os.environ['DATABASE_URL'].split(':', 1)[0]} (replica {replica.split(':', 1)[0]})")
+    print(f"  {'':14s} {'req/s':>7s} {'p95 ms':>8s} {'errors':>7s} {'primary stmts':>14s} {'per req':>8s} "
+          f"{'primary s':>10s} {'replica stmts':>14s} {'replica s':>10s}")
+    for label, s, load in rows:
+        primary, replica_load = load.get("primary", [0, 0.0]), load.get("replica", [0, 0.0])
+        print(f"  {label:14s} {s['rps']:7.1f} {s['p95_ms']:8.1f} {s['error_rate']:7.2%} {primary[0]:14.0f} "
+              f"{primary[0] / max(1, s['requests']):8.2f} {primary[1]:10.2f} {replica_load[0]:14.0f} "
+              f"{replica_load[1]:10.2f}")
+    base, routed = (load.get("primary", [0])[0] / max(1, s["requests"]) for _, s, load in rows)
+    print(f"  primary statements per request: {1 - routed / max(base, 1e-9):.0%} fewer with the replica")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark for GET /projects/{id}/testcases/search (search.search_testcases).
+
+Seeds --testcases test cases (default 1,000,000) over --projects projects
+and times a set of queries against one project: p50 / p95 / max over
+--repeat runs, with the number of hits. On Postgres this measures the GIN
+index; on SQLite the in-process fallback index, whose build time on the
+first search is reported separately.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_search.py [--testcases 1000000] [--projects 20]
+
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from seed import seed  # noqa: E402
+
+from sqlalchemy import func, select  # noqa: E402
+
+from app import models, search  # noqa: E402
+from app.db import SessionLocal, engine  # noqa: E402
+
+QUERIES = [
+    ("common word", "login"),
+    ("two words", "billing export"),
+    ("rare", "42"),
+    ("phrase", '"confirmation message"'),
+    ("no match", "kubernetes"),
+]
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return result, times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--testcases", type=int, default=1_000_000)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    seeded = seed(users=args.projects, projects=args.projects, testcases=args.testcases)
+    search.ensure_index(engine)
+    print(f"Seeded {args.testcases} test cases in {time.perf_counter() - start:.1f} s "
+          f"({engine.dialect.name})")
+
+    project_id = seeded["projects"][0]
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(func.count()).select_from(models.TestCase).where(models.TestCase.project_id == project_id)
+        ).scalar()
+        print(f"Project {project_id}: {rows} test cases, limit {args.limit}\n")
+        if engine.dialect.name != "postgresql":
+            start = time.perf_counter()
+            search.search_testcases(db, project_id, "warm up", limit=1)
+            print(f"  fallback index build: {(time.perf_counter() - start) * 1000:.0f} ms")
+
+        print(f"  {'query':14s} {'q':26s} {'hits':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'max ms':>8s}")
+        for label, q in QUERIES:
+            result, times = timed(lambda: search.search_testcases(db, project_id, q, limit=args.limit), args.repeat)
+            p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+            print(f"  {label:14s} {q:26s} {result['total']:8d} {statistics.median(times):8.1f} "
+                  f"{p95:8.1f} {times[-1]:8.1f}")
+        _, times = timed(lambda: search.search_testcases(db, project_id, "login", limit=args.limit, offset=1000),
+                         args.repeat)
+        print(f"  {'page 51':14s} {'login (offset 1000)':26s} {'':8s} {statistics.median(times):8.1f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
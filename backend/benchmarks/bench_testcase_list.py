@@ -0,0 +1,105 @@
+"""
+Benchmark for GET /projects/{id}/testcases on a large project.
+
+Before: ORM objects -> response_model validation of every row (pydantic
+orm_mode) -> jsonable_encoder -> json.dumps, uncompressed.
+After:  column rows as dicts -> orjson, compressed when the client accepts it.
+
+    python benchmarks/bench_testcase_list.py [rows]
+
+Uses a throwaway SQLite database unless DATABASE_URL is set.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+_tmp = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_tmp}/bench.db")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from fastapi.utils import create_response_field  # noqa: E402
+
+from app import crud, models, schemas  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+def seed(db, rows):
+    project = models.Project(name=f"bench-{time.time_ns()}", organization="org", pat="x")
+    db.add(project)
+    db.flush()
+    db.add_all(
+        models.TestCase(project_id=project.id, test_case={
+            "Test Case ID": f"TC_{i:05d}",
+            "Description": f"Verify that a refund for invoice {i} is issued to the original payment method",
+            "Steps": "1. Log in as billing admin\n2. Open the invoice\n3. Click Refund\n4. Confirm",
+            "Expected Result": "The refund is issued and the invoice shows status Refunded",
+            "Priority": ("High", "Medium", "Low")[i % 3],
+        })
+        for i in range(rows)
+    )
+    db.commit()
+    return project.id
+
+
+def best_of(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def legacy_body(db, project_id, field):
+    rows = crud.get_testcases_by_project(db, project_id)
+    content = asyncio.run(serialize_response(field=field, response_content=rows))
+    return JSONResponse(content).body
+
+
+def fast_body(db, project_id):
+    return ORJSONResponse(crud.get_testcase_rows(db, project_id)).body
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    db = SessionLocal()
+    project_id = seed(db, rows)
+    field = create_response_field(name="Response", type_=List[schemas.TestCaseOut])
+
+    print(f"{rows} test cases\n")
+    print("serialization (DB read included):")
+    t_old, old = best_of(lambda: (db.expunge_all(), legacy_body(db, project_id, field))[1])
+    t_new, new = best_of(lambda: (db.expunge_all(), fast_body(db, project_id))[1])
+    print(f"  before  pydantic + json   {t_old * 1000:8.1f} ms  {len(old) / 1e6:6.2f} MB")
+    print(f"  after   rows + orjson     {t_new * 1000:8.1f} ms  {len(new) / 1e6:6.2f} MB  ({t_old / t_new:.1f}x)")
+
+    # End to end through the app, including auth and the compression middleware
+    admin = models.User(username=f"bench-{time.time_ns()}", password_hash="-", role="admin")
+    db.add(admin)
+    db.flush()
+    db.add(models.ProjectUser(project_id=project_id, user_id=admin.id))
+    db.commit()
+    from app.auth import create_access_token
+    token = create_access_token({"sub": admin.username, "role": "admin"})
+    client = TestClient(app)
+    url = f"/projects/{project_id}/testcases"
+
+    print("\nGET", url)
+    for encoding in ("identity", "gzip", "br"):
+        headers = {"Authorization": f"Bearer {token}", "Accept-Encoding": encoding}
+        t, resp = best_of(lambda: client.get(url, headers=headers))
+        wire = int(resp.headers.get("content-length", len(resp.content)))
+        used = resp.headers.get("content-encoding", "identity")
+        print(f"  Accept-Encoding {encoding:8s} {t * 1000:8.1f} ms  {wire / 1e6:6.2f} MB on the wire ({used})")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Throughput of the backend with 1..N uvicorn worker processes.
+
+Seeds once, then for each worker count starts the app with
+WEB_CONCURRENCY=<n> (so each worker sizes its pool from DB_POOL_BUDGET) and
+runs the loadtest.py mix against it. Prints req/s, speed-up over the first
+count, overall p50 / p95 and the error rate.
+
+    DATABASE_URL=postgresql://... python benchmarks/bench_workers.py --workers 1 2 4 8 [--vus 64]
+
+Needs Postgres: the app refuses to start several workers without the
+LISTEN/NOTIFY event relay. Worker counts default to 1, 2, 4, ... up to the
+number of cores; more workers than cores only adds contention, so scaling
+can only be measured on a machine with several cores.
+"""
+import argparse
+import os
+import tempfile
+
+from loadtest import SCALES, _free_port, run_load, start_server
+from azure_devops_stub import start_stub
+from seed import seed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    cores = os.cpu_count() or 1
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({n for n in (1, 2, 4, 8, 16) if n < cores} | {cores}))
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--vus", type=int, default=40)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--pool-budget", type=int, default=40, help="DB_POOL_BUDGET for all workers together")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if not os.environ["DATABASE_URL"].startswith("postgresql"):
+        raise SystemExit("bench_workers.py needs DATABASE_URL=postgresql://... (several workers need the event relay)")
+    if max(args.workers) > cores:
+        print(f"warning: {max(args.workers)} workers on {cores} cores, the extra workers only add contention")
+
+    data = seed(**SCALES[args.scale], seed_value=args.seed)
+    stub, stub_url = start_stub(latency_ms=20)
+    rows = []
+    try:
+        for workers in args.workers:
+            proc, url = start_server(_free_port(), {
+                "AZURE_DEVOPS_URL": stub_url,
+                "DB_POOL_BUDGET": str(args.pool_budget),
+                "LOG_LEVEL": "WARNING",
+                "PROFILE_DIR": os.path.join(tempfile.gettempdir(), "bench_workers_profiles"),
+                "SLOW_QUERY_LOG": os.path.join(tempfile.gettempdir(), "bench_workers_slow_queries.log"),
+            }, workers)
+            try:
+                summary = run_load(url, data, args.vus, args.duration, args.seed)
+            finally:
+                proc.terminate()
+                proc.wait(30)
+            rows.append((workers, summary))
+    finally:
+        stub.shutdown()
+
+    print(f"\n{os.cpu_count()} cores, {args.vus} virtual users, {args.scale} scale, "
+          f"{os.environ['DATABASE_URL'].split(':', 1)[0]}, pool budget {args.pool_budget}")
+    print(f"  {'workers':>7s} {'req/s':>8s} {'speed-up':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'errors':>7s}")
+    base = rows[0][1]["rps"] or 1
+    for workers, s in rows:
+        print(f"  {workers:7d} {s['rps']:8.1f} {s['rps'] / base:8.2f}x {s['p50_ms']:8.1f} {s['p95_ms']:8.1f} "
+              f"{s['error_rate']:7.2%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Load test for the backend API.
+
+Seeds a database (benchmarks/seed.py), starts the real app under uvicorn
+with deploys pointed at a stub Azure DevOps server, and runs concurrent
+virtual users through a weighted mix of login, project listing, test case
+CRUD, batch edits, chat history saves and deploys. Reports throughput,
+error rate and p50/p95/p99 latency per route, and compares them with the
+baseline in loadtest_baseline.json (recorded with the defaults: small scale,
+20 virtual users, 30 s, seed 42, SQLite, one worker). Record a new one on
+your own machine or database before comparing other setups.
+
+    python benchmarks/loadtest.py                          # small run on a temp SQLite file
+    python benchmarks/loadtest.py --scale full             # 5000 users, 500 projects, 1M test cases
+    DATABASE_URL=postgresql://... python benchmarks/loadtest.py --scale full
+    python benchmarks/loadtest.py --save-baseline          # re-record loadtest_baseline.json
+    python benchmarks/loadtest.py --url http://host:8000   # existing server (seeds through DATABASE_URL)
+
+Exits with status 1 when a route's p95 or the overall throughput regressed
+more than --tolerance against the baseline, when errors exceed 1%, or when
+there is no baseline file.
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+sys.path.insert(0, HERE)
+sys.path.insert(0, BACKEND)
+
+from azure_devops_stub import start_stub  # noqa: E402
+from seed import PASSWORD, make_testcase, seed  # noqa: E402
+
+SCALES = {
+    "small": {"users": 200, "projects": 20, "testcases": 20000},
+    "medium": {"users": 1000, "projects": 100, "testcases": 200000},
+    "full": {"users": 5000, "projects": 500, "testcases": 1000000},
+}
+DEFAULT_BASELINE = os.path.join(HERE, "loadtest_baseline.json")
+SLACK_MS = 5.0      # p95 differences below this are noise, whatever the percentage
+
+# (name, weight) of the actions a virtual user picks from
+ACTIONS = [
+    ("login", 2),
+    ("my_projects", 12),
+    ("get_project", 8),
+    ("list_testcases", 15),
+    ("get_testcase", 15),
+    ("create_testcase", 12),
+    ("update_testcase", 10),
+    ("delete_testcase", 6),
+    ("batch_testcases", 5),
+    ("chat_history", 8),
+    ("deploy", 2),
+]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(port, env, workers=1):
+    cmd = [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"]
+    # uvicorn takes its worker count from WEB_CONCURRENCY, and the app sizes its pool from it
+    proc = subprocess.Popen(cmd, cwd=BACKEND, env={**os.environ, "WEB_CONCURRENCY": str(workers), **env})
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        if proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        try:
+            requests.get(f"{url}/metrics", timeout=1)
+            return proc, url
+        except requests.ConnectionError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("uvicorn did not start")
+
+
+class Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, route, seconds, ok):
+        with self.lock:
+            self.latencies[route].append(seconds)
+            if not ok:
+                self.errors[route] += 1
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+class VirtualUser(threading.Thread):
+    def __init__(self, url, username, project_id, deploy_project, recorder, stop_at, rng):
+        super().__init__(daemon=True)
+        self.url = url
+        self.username = username
+        self.project_id = project_id
+        self.deploy_project = deploy_project
+        self.recorder = recorder
+        self.stop_at = stop_at
+        self.rng = rng
+        self.session = requests.Session()
+        self.testcase_ids = []
+        self.own_ids = []
+        names, weights = zip(*ACTIONS)
+        self.names, self.weights = names, weights
+
+    def call(self, route, method, path, ok_status=(200,), **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self.session.request(method, self.url + path, timeout=120, **kwargs)
+            ok = resp.status_code in ok_status
+        except requests.RequestException:
+            resp, ok = None, False
+        self.recorder.record(route, time.perf_counter() - start, ok)
+        return resp if ok else None
+
+    def login(self):
+        resp = self.call("POST /token", "POST", "/token", data={"username": self.username, "password": PASSWORD})
+        if resp is not None:
+            self.session.headers["Authorization"] = f"Bearer {resp.json()['access_token']}"
+        return resp is not None
+
+    def run(self):
+        if not self.login():
+            return
+        pid = self.project_id
+        resp = self.call("GET /projects/{id}/testcases", "GET", f"/projects/{pid}/testcases")
+        if resp is not None:
+            self.testcase_ids = [tc["id"] for tc in resp.json()]
+
+        while time.monotonic() < self.stop_at:
+            action = self.rng.choices(self.names, self.weights)[0]
+            getattr(self, "do_" + action)(pid)
+
+    def _some_id(self):
+        pool = self.own_ids or self.testcase_ids
+        return self.rng.choice(pool) if pool else None
+
+    def do_login(self, pid):
+        self.login()
+
+    def do_my_projects(self, pid):
+        self.call("GET /users/me/projects", "GET", "/users/me/projects")
+
+    def do_get_project(self, pid):
+        self.call("GET /projects/{id}", "GET", f"/projects/{pid}")
+
+    def do_list_testcases(self, pid):
+        self.call("GET /projects/{id}/testcases", "GET", f"/projects/{pid}/testcases")
+
+    def do_get_testcase(self, pid):
+        tc = self._some_id()
+        if tc:
+            self.call("GET /projects/{id}/testcases/{tc}", "GET", f"/projects/{pid}/testcases/{tc}", ok_status=(200, 404))
+
+    def do_create_testcase(self, pid):
+        resp = self.call("POST /projects/{id}/testcases", "POST", f"/projects/{pid}/testcases",
+                         json=make_testcase(self.rng.randrange(10**6), self.rng))
+        if resp is not None:
+            self.own_ids.append(resp.json()["id"])
+
+    def do_update_testcase(self, pid):
+        tc = self._some_id()
+        if tc:
+            self.call("PUT /projects/{id}/testcases/{tc}", "PUT", f"/projects/{pid}/testcases/{tc}",
+                      json=make_testcase(tc, self.rng), ok_status=(200, 404))
+
+    def do_delete_testcase(self, pid):
+        if self.own_ids:
+            tc = self.own_ids.pop(self.rng.randrange(len(self.own_ids)))
+            self.call("DELETE /projects/{id}/testcases/{tc}", "DELETE", f"/projects/{pid}/testcases/{tc}",
+                      ok_status=(200, 404))
+
+    def do_batch_testcases(self, pid):
+        ids = self.rng.sample(self.testcase_ids, min(20, len(self.testcase_ids)))
+        payload = {
+            "updates": [{"id": i, "fields": {"Priority": self.rng.choice(("High", "Medium", "Low"))}} for i in ids],
+            "creates": [make_testcase(self.rng.randrange(10**6), self.rng) for _ in range(3)],
+        }
+        resp = self.call("POST /projects/{id}/testcases/batch", "POST", f"/projects/{pid}/testcases/batch", json=payload)
+        if resp is not None:
+            self.own_ids.extend(resp.json()["created"])
+
+    def do_chat_history(self, pid):
+        history = [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i} " + "lorem ipsum " * 20}
+            for i in range(self.rng.randint(10, 60))
+        ]
+        self.call("PUT /projects/{id}/chat_history", "PUT", f"/projects/{pid}/chat_history", json={"history": history})
+
+    def do_deploy(self, pid):
+        self.call("POST /deploy_testcases", "POST", "/deploy_testcases", json={
+            "project_id": self.deploy_project, "organization": "bench-org",
+            "project_name": "bench", "pat": "bench-pat",
+        })
+
+
+def summarize(recorder, duration):
+    routes = {}
+    total = 0
+    errors = 0
+    for route, values in sorted(recorder.latencies.items()):
+        values.sort()
+        n = len(values)
+        total += n
+        errors += recorder.errors[route]
+        routes[route] = {
+            "count": n,
+            "rps": round(n / duration, 2),
+            "errors": recorder.errors[route],
+            "p50_ms": round(percentile(values, 50) * 1000, 2),
+            "p95_ms": round(percentile(values, 95) * 1000, 2),
+            "p99_ms": round(percentile(values, 99) * 1000, 2),
+        }
+    everything = sorted(v for values in recorder.latencies.values() for v in values)
+    return {
+        "duration_s": round(duration, 1),
+        "requests": total,
+        "rps": round(total / duration, 2),
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "p50_ms": round(percentile(everything, 50) * 1000, 2),
+        "p95_ms": round(percentile(everything, 95) * 1000, 2),
+        "routes": routes,
+    }
+
+
+def run_load(url, data, vus, duration, seed):
+    """Run vus virtual users (seeded users from data) against url for duration seconds."""
+    rng = random.Random(seed)
+    users = rng.sample(data["users"], min(vus, len(data["users"])))
+    recorder = Recorder()
+    stop_at = time.monotonic() + duration
+    threads = [
+        VirtualUser(url, name, data["memberships"][uid], data["deploy_project"], recorder, stop_at,
+                    random.Random(seed + i))
+        for i, (uid, name) in enumerate(users)
+    ]
+    print(f"Running {len(threads)} virtual users for {duration:.0f} s against {url} ...")
+    started = time.monotonic()
+    for vu in threads:
+        vu.start()
+    for vu in threads:
+        vu.join()
+    summary = summarize(recorder, time.monotonic() - started)
+    summary["vus"] = len(threads)
+    return summary
+
+
+def print_report(summary, baseline=None):
+    print(f"\n{summary['requests']} requests in {summary['duration_s']} s: "
+          f"{summary['rps']} req/s, error rate {summary['error_rate']:.2%}")
+    print(f"{'route':40s} {'count':>7s} {'req/s':>7s} {'err':>5s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}"
+          + ("  p95 vs baseline" if baseline else ""))
+    for route, r in summary["routes"].items():
+        line = (f"{route:40s} {r['count']:7d} {r['rps']:7.1f} {r['errors']:5d} "
+                f"{r['p50_ms']:8.1f} {r['p95_ms']:8.1f} {r['p99_ms']:8.1f}")
+        base = (baseline or {}).get("routes", {}).get(route)
+        if base and base["p95_ms"]:
+            line += f"  {(r['p95_ms'] / base['p95_ms'] - 1) * 100:+6.1f}%"
+        print(line)
+
+
+def compare(summary, baseline, tolerance):
+    """List of regressions of summary against baseline (empty if none)."""
+    problems = []
+    if summary["error_rate"] > 0.01:
+        problems.append(f"error rate {summary['error_rate']:.2%} is above 1%")
+    if summary["rps"] < baseline["rps"] * (1 - tolerance):
+        problems.append(f"throughput {summary['rps']} req/s vs baseline {baseline['rps']} req/s")
+    for route, base in baseline.get("routes", {}).items():
+        cur = summary["routes"].get(route)
+        if cur is None:
+            continue
+        limit = base["p95_ms"] * (1 + tolerance) + SLACK_MS
+        if cur["p95_ms"] > limit:
+            problems.append(f"{route}: p95 {cur['p95_ms']} ms vs baseline {base['p95_ms']} ms (limit {limit:.1f} ms)")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--vus", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after warm-up")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the started server")
+    parser.add_argument("--url", help="use a running server instead of starting one")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="Azure DevOps stub response time")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (0.25 = 25%%)")
+    parser.add_argument("--output", help="also write the JSON summary here")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale]
+    print(f"Seeding {scale} into {os.environ['DATABASE_URL']} ...")
+    start = time.perf_counter()
+    data = seed(**scale, seed_value=args.seed)
+    print(f"  done in {time.perf_counter() - start:.1f} s")
+
+    stub, stub_url = start_stub(latency_ms=args.stub_latency_ms)
+    proc = None
+    url = args.url
+    if not url:
+        env = {
+            "AZURE_DEVOPS_URL": stub_url,
+            "PROFILE_DIR": os.path.join(tempfile.gettempdir(), "loadtest_profiles"),
+            "SLOW_QUERY_LOG": os.path.join(tempfile.gettempdir(), "loadtest_slow_queries.log"),
+            "LOG_LEVEL": "WARNING",
+        }
+        proc, url = start_server(_free_port(), env, args.workers)
+
+    try:
+        summary = run_load(url, data, args.vus, args.duration, args.seed)
+        summary["config"] = {"scale": args.scale, "vus": summary.pop("vus"), "workers": args.workers,
+                             "database": os.environ["DATABASE_URL"].split(":", 1)[0], "cores": os.cpu_count()}
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(10)
+        stub.shutdown()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(summary, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"\nNo baseline at {args.baseline} to compare with (record one with --save-baseline).")
+        return 1
+    if baseline.get("config") != summary["config"]:
+        print(f"\nWarning: baseline was recorded with {baseline.get('config')}")
+    problems = compare(summary, baseline, args.tolerance)
+    if problems:
+        print("\nREGRESSION:")
+        for p in problems:
+            print("  " + p)
+        return 1
+    print(f"\nNo regression against the baseline (tolerance {args.tolerance:.0%}).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Seed a database with realistic volumes for benchmarks.
+
+    DATABASE_URL=postgresql://... python benchmarks/seed.py --users 5000 --projects 500 --testcases 1000000
+
+Every seeded user is a member of one project (users are spread round-robin)
+and has the password "password". Rows are inserted with Core executemany in
+chunks, so a million test cases take a minute or so rather than an hour.
+Uses a throwaway SQLite file when DATABASE_URL is not set.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from sqlalchemy import insert, select, func  # noqa: E402
+
+from app import models  # noqa: E402
+from app.auth import get_password_hash  # noqa: E402
+from app.db import engine  # noqa: E402
+
+PASSWORD = "password"
+CHUNK = 5000
+PRIORITIES = ("High", "Medium", "Low")
+AREAS = ("login", "billing", "search", "checkout", "profile", "reports", "notifications", "admin")
+VERBS = ("create", "update", "delete", "export", "filter", "validate", "upload", "share")
+
+
+def make_testcase(i, rng):
+    area, verb = rng.choice(AREAS), rng.choice(VERBS)
+    return {
+        "Test Case ID": f"TC_{i:07d}",
+        "Description": f"Verify that a user can {verb} {area} records with valid input (case {i})",
+        "Steps": f"1. Log in as a standard user\n2. Open the {area} page\n3. {verb.title()} a record\n4. Save",
+        "Expected Result": f"The {area} record is {verb}d and a confirmation message is shown",
+        "Priority": rng.choice(PRIORITIES),
+    }
+
+
+def _chunks(rows):
+    for start in range(0, len(rows), CHUNK):
+        yield rows[start:start + CHUNK]
+
+
+def seed(users=200, projects=20, testcases=20000, deploy_cases=20, seed_value=42, prefix="bench"):
+    """
+    Insert users, projects, memberships and test cases. Returns a dict with the
+    created ids: {"users": [(id, username)], "projects": [...], "deploy_project": id}.
+    Another project with deploy_cases test cases is created for deploy runs.
+    """
+    rng = random.Random(seed_value)
+    models.Base.metadata.create_all(bind=engine)
+    password_hash = get_password_hash(PASSWORD)  # one bcrypt hash shared by every seeded user
+    run = f"{prefix}{int(time.time())}"
+
+    with engine.begin() as conn:
+        project_rows = [
+            {"name": f"{run}-project-{p:04d}", "organization": "bench-org", "pat": "bench-pat",
+             "description": f"Seeded project {p}", "chat_history": []}
+            for p in range(projects + 1)
+        ]
+        for chunk in _chunks(project_rows):
+            conn.execute(insert(models.Project), chunk)
+        project_ids = conn.execute(
+            select(models.Project.id).where(models.Project.name.like(f"{run}-project-%")).order_by(models.Project.id)
+        ).scalars().all()
+        deploy_project, project_ids = project_ids[-1], project_ids[:-1]
+
+        user_rows = [
+            {"username": f"{run}-user-{u:05d}", "password_hash": password_hash, "role": "user"}
+            for u in range(users)
+        ]
+        for chunk in _chunks(user_rows):
+            conn.execute(insert(models.User), chunk)
+        user_list = conn.execute(
+            select(models.User.id, models.User.username)
+            .where(models.User.username.like(f"{run}-user-%")).order_by(models.User.id)
+        ).all()
+
+        memberships = [
+            {"project_id": project_ids[i % len(project_ids)], "user_id": uid}
+            for i, (uid, _) in enumerate(user_list)
+        ]
+        for chunk in _chunks(memberships):
+            conn.execute(insert(models.ProjectUser), chunk)
+
+    start = time.perf_counter()
+    done = 0
+    rows = []
+    for i in range(testcases):
+        rows.append({"project_id": project_ids[i % len(project_ids)], "test_case": make_testcase(i, rng)})
+        if len(rows) == CHUNK:
+            with engine.begin() as conn:
+                conn.execute(insert(models.TestCase), rows)
+            done += len(rows)
+            rows = []
+            if done % 100000 == 0:
+                print(f"  {done} test cases ({time.perf_counter() - start:.0f} s)", file=sys.stderr)
+    rows += [{"project_id": deploy_project, "test_case": make_testcase(i, rng)} for i in range(deploy_cases)]
+    with engine.begin() as conn:
+        conn.execute(insert(models.TestCase), rows)
+
+    return {
+        "users": [(uid, name) for uid, name in user_list],
+        "projects": list(project_ids),
+        "deploy_project": deploy_project,
+        "memberships": {uid: m["project_id"] for (uid, _), m in zip(user_list, memberships)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--testcases", type=int, default=20000)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    result = seed(args.users, args.projects, args.testcases)
+    with engine.connect() as conn:
+        total = conn.execute(select(func.count()).select_from(models.TestCase)).scalar()
+    print(f"Seeded {len(result['users'])} users, {len(result['projects'])} projects, "
+          f"{args.testcases} test cases in {time.perf_counter() - start:.1f} s "
+          f"({total} test cases in the database) at {engine.url.render_as_string(hide_password=True)}")
+
+
+if __name__ == "__main__":
+    main()
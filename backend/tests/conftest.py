@@ -0,0 +1,82 @@
+import itertools
+import os
+import sys
+import tempfile
+
+import pytest
+
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/test.db")
+os.environ.setdefault("QUERY_BUDGET_STRICT", "1")   # over-budget requests answer 500
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import models, querystats  # noqa: E402
+from app.db import SessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def db(client):
+    """A session on the test database, for calling crud directly."""
+    with SessionLocal() as session:
+        yield session
+
+
+_names = itertools.count()
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a user directly in the database; returns its id."""
+    def make():
+        user = models.User(username=f"member{next(_names)}", password_hash="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    return make
+
+
+@pytest.fixture
+def make_project(db):
+    """Create a project directly in the database (nobody assigned); returns its id."""
+    def make():
+        project = models.Project(name=f"Project {next(_names)}", organization="org", pat="x")
+        db.add(project)
+        db.commit()
+        return project.id
+    return make
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    token = client.post("/token", data={"username": "admin", "password": "admin123"}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+@pytest.fixture(scope="session")
+def project(client, admin_headers):
+    """A project the admin is assigned to, with 25 test cases."""
+    project = client.post("/projects", json={"name": "Budgets", "organization": "org", "pat": "x"},
+                          headers=admin_headers).json()
+    me = client.get("/me", headers=admin_headers).json()
+    client.post(f"/projects/{project['id']}/users/assign", json={"user_ids": [me["id"]]}, headers=admin_headers)
+    for i in range(25):
+        client.post(f"/projects/{project['id']}/testcases",
+                    json={"Test Case ID": f"TC{i}", "Description": f"case {i}", "Priority": "Low"},
+                    headers=admin_headers)
+    return project
+
+
+@pytest.fixture(autouse=True)
+def query_budgets():
+    """Fail the test when a request it made ran more SQL statements than its route's @query_budget."""
+    with querystats.watch_requests() as requests:
+        yield requests
+    querystats.check_budgets(requests)
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import select
+
+from app import crud, main, models
+
+
+@pytest.fixture
+def source(db, make_project):
+    project = make_project()
+    for i, priority in enumerate(["High", "Low", "High", "Medium", "Low", "High"]):
+        db.add(models.TestCase(project_id=project, test_case={"Test Case ID": f"TC_{i}", "Priority": priority}))
+    crud.create_project_file(db, project, "spec.pdf", "/uploads/spec.pdf")
+    return project
+
+
+def cloned(db, project_id):
+    rows = db.execute(select(models.TestCase.test_case).where(models.TestCase.project_id == project_id)
+                      .order_by(models.TestCase.id)).scalars().all()
+    return [tc["Test Case ID"] for tc in rows]
+
+
+def test_clone_copies_every_row(db, source, make_project):
+    target = make_project()
+    assert crud.clone_testcases(db, source, target) == {"testcases": 6, "files": 0}
+    assert cloned(db, target) == [f"TC_{i}" for i in range(6)]
+    assert len(cloned(db, source)) == 6
+
+
+def test_clone_filters_by_priority(db, source, make_project):
+    target = make_project()
+    assert crud.count_clone_source(db, source, ["High", "Medium"]) == 4
+    assert crud.clone_testcases(db, source, target, priorities=["High", "Medium"])["testcases"] == 4
+    assert cloned(db, target) == ["TC_0", "TC_2", "TC_3", "TC_5"]
+
+
+def test_clone_references_files_once(db, source, make_project):
+    target = make_project()
+    assert crud.clone_testcases(db, source, target, priorities=["Low"], include_files=True) == {"testcases": 2, "files": 1}
+    assert crud.clone_testcases(db, source, target, priorities=["Low"], include_files=True)["files"] == 0
+    assert crud.get_project_file_paths(db, target) == ["/uploads/spec.pdf"]
+
+
+def test_small_clone_answers_when_done(client, admin_headers, source, make_project):
+    target = make_project()
+    r = client.post(f"/projects/{source}/clone", headers=admin_headers,
+                    json={"target_project_id": target, "priorities": ["Low"]})
+    assert r.status_code == 200
+    assert r.json() == {"id": None, "status": "done", "source_project_id": source, "target_project_id": target,
+                        "matched": 2, "testcases": 2, "files": 0, "error": None}
+
+
+@pytest.fixture
+def job_statuses(monkeypatch):
+    statuses = []
+    broadcast = main.events.broadcast
+    monkeypatch.setattr(main.events, "broadcast",
+                        lambda kind, data: (statuses.append(data["status"]), broadcast(kind, data)))
+    return statuses
+
+
+def test_background_clone_job_lifecycle(client, admin_headers, db, source, make_project, job_statuses):
+    target = make_project()
+    r = client.post(f"/projects/{source}/clone", headers=admin_headers,
+                    json={"target_project_id": target, "background": True, "include_files": True})
+    assert r.status_code == 202
+    job = r.json()
+    assert (job["status"], job["matched"], job["testcases"]) == ("pending", 6, None)
+
+    # TestClient runs the background task before returning
+    assert job_statuses == ["pending", "running", "done"]
+    done = client.get(f"/clone_jobs/{job['id']}", headers=admin_headers).json()
+    assert (done["status"], done["testcases"], done["files"]) == ("done", 6, 1)
+    assert len(cloned(db, target)) == 6
+
+
+def test_failed_clone_job(client, admin_headers, source, make_project, job_statuses, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("disk full")
+    monkeypatch.setattr(main.crud, "clone_testcases", fail)
+    r = client.post(f"/projects/{source}/clone", headers=admin_headers,
+                    json={"target_project_id": make_project(), "background": True})
+    assert job_statuses == ["pending", "running", "failed"]
+    job = client.get(f"/clone_jobs/{r.json()['id']}", headers=admin_headers).json()
+    assert (job["status"], job["error"]) == ("failed", "disk full")
+
+
+def test_large_clones_run_in_the_background(client, admin_headers, source, make_project, monkeypatch):
+    monkeypatch.setattr(main, "CLONE_SYNC_LIMIT", 5)
+    assert client.post(f"/projects/{source}/clone", headers=admin_headers,
+                       json={"target_project_id": make_project()}).status_code == 202
+
+
+@pytest.mark.parametrize("target, code", [(None, 400), (999999, 404)])
+def test_clone_rejects_bad_targets(client, admin_headers, source, target, code):
+    r = client.post(f"/projects/{source}/clone", headers=admin_headers, json={"target_project_id": target or source})
+    assert r.status_code == code
+
+
+def test_unknown_clone_job_is_404(client, admin_headers):
+    assert client.get("/clone_jobs/nope", headers=admin_headers).status_code == 404
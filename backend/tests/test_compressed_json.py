@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import JSON, Column, Integer, MetaData, Table, create_engine, insert, select, text
+
+from app import compressed_json
+from app.compressed_json import CompressedJSON, is_envelope
+
+SMALL = {"role": "user", "content": "hi"}
+LARGE = [{"role": "assistant", "content": f"Test case {i}: check the login page"} for i in range(50)]
+
+
+@pytest.fixture
+def table():
+    engine = create_engine("sqlite://")
+    metadata = MetaData()
+    table = Table("docs", metadata, Column("id", Integer, primary_key=True),
+                  Column("value", CompressedJSON(min_bytes=256)))
+    metadata.create_all(engine)
+    with engine.begin() as conn:
+        yield conn, table
+
+
+def write(conn, table, value):
+    return conn.execute(insert(table).values(value=value)).inserted_primary_key[0]
+
+
+def read(conn, table, row_id):
+    return conn.execute(select(table.c.value).where(table.c.id == row_id)).scalar()
+
+
+def stored(conn, row_id):
+    """The raw JSON in the column, without CompressedJSON's decoding."""
+    return conn.execute(select(Column("value", JSON)).select_from(text("docs")).where(text(f"id = {row_id}"))).scalar()
+
+
+@pytest.mark.parametrize("value", [SMALL, LARGE, "x" * 255, "x" * 256, None])
+def test_round_trip(table, value):
+    conn, t = table
+    assert read(conn, t, write(conn, t, value)) == value
+
+
+def test_only_values_above_min_bytes_are_compressed(table):
+    conn, t = table
+    assert stored(conn, write(conn, t, SMALL)) == SMALL
+    envelope = stored(conn, write(conn, t, LARGE))
+    assert is_envelope(envelope)
+    assert envelope["__compressed__"] == ("zstd" if compressed_json.zstandard else "zlib")
+    assert len(envelope["data"]) < len(str(LARGE))
+
+
+def test_legacy_plain_json_rows_are_read_as_they_are(table):
+    conn, t = table
+    conn.execute(text("INSERT INTO docs (id, value) VALUES (1, :raw)"), {"raw": '[{"role": "user", "content": "old"}]'})
+    assert read(conn, t, 1) == [{"role": "user", "content": "old"}]
+    # a plain dict that merely has a "data" key is not an envelope
+    conn.execute(text("INSERT INTO docs (id, value) VALUES (2, :raw)"), {"raw": '{"data": "abc"}'})
+    assert read(conn, t, 2) == {"data": "abc"}
+
+
+def test_zlib_without_zstandard(table, monkeypatch):
+    conn, t = table
+    monkeypatch.setattr(compressed_json, "zstandard", None)
+    row_id = write(conn, t, LARGE)
+    assert stored(conn, row_id)["__compressed__"] == "zlib"
+    assert read(conn, t, row_id) == LARGE
+
+
+def test_zstd_values_need_zstandard(table, monkeypatch):
+    pytest.importorskip("zstandard")
+    conn, t = table
+    row_id = write(conn, t, LARGE)
+    monkeypatch.setattr(compressed_json, "zstandard", None)
+    with pytest.raises(RuntimeError, match="zstandard package is not installed"):
+        read(conn, t, row_id)
+
+
+def test_unknown_codec():
+    with pytest.raises(ValueError, match="brotli"):
+        compressed_json.decompress("brotli", b"")
+
+
+def test_large_chat_history_round_trips(client, admin_headers, project, db):
+    history = [{"role": "user", "content": f"message {i} " * 20} for i in range(100)]
+    r = client.put(f"/projects/{project['id']}/chat_history", json={"history": history}, headers=admin_headers)
+    assert r.status_code == 200
+    raw = db.execute(text("SELECT chat_history FROM projects WHERE id = :id"), {"id": project["id"]}).scalar()
+    assert '"__compressed__"' in raw
+    assert client.get(f"/projects/{project['id']}", headers=admin_headers).json()["chat_history"] == history
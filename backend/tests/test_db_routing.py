@@ -0,0 +1,29 @@
+from sqlalchemy import create_engine, select, text, update
+
+from app import db, models, search
+
+
+def test_is_read():
+    t = models.TestCase
+    assert db._is_read(select(t))
+    assert db._is_read(search._PG_SEARCH)
+    assert db._is_read(text("SELECT 1 FROM project_users WHERE project_id=:pid"))
+    assert not db._is_read(select(t).with_for_update())
+    assert not db._is_read(update(t).values(version=1))
+    assert not db._is_read(text("SELECT id FROM testcases FOR UPDATE"))
+    assert not db._is_read(text("WITH moved AS (DELETE FROM testcases RETURNING id) SELECT count(*) FROM moved"))
+    assert not db._is_read(text("UPDATE testcases SET version = version + 1"))
+
+
+def test_read_only_session_routes_reads_until_first_write(monkeypatch):
+    replica = create_engine("sqlite://")
+    monkeypatch.setattr(db, "replica_engine", replica)
+    session = db.SessionLocal()
+    session.info["replica"] = True
+    try:
+        assert session.get_bind(clause=search._PG_SEARCH) is replica
+        assert session.get_bind(clause=text("UPDATE testcases SET version = 1")) is db.engine
+        # read-your-writes: once written, reads stay on the primary
+        assert session.get_bind(clause=search._PG_SEARCH) is db.engine
+    finally:
+        session.close()
@@ -0,0 +1,58 @@
+import os
+
+from sqlalchemy import func, select
+
+from app import crud, main, models
+
+
+def test_delete_cascades_and_keeps_shared_files(client, admin_headers, db, make_user, make_project,
+                                                tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_DIR", str(tmp_path))
+    doomed, clone = make_project(), make_project()
+
+    folder = tmp_path / f"project_{doomed}"
+    folder.mkdir()
+    paths = {}
+    for name in ("spec.pdf", "shared.docx", "leftover.txt"):   # leftover.txt has no row
+        (folder / name).write_text(name)
+        paths[name] = str(folder / name)
+    crud.create_project_file(db, doomed, "spec.pdf", paths["spec.pdf"])
+    crud.create_project_file(db, doomed, "shared.docx", paths["shared.docx"])
+    crud.create_project_file(db, clone, "shared.docx", paths["shared.docx"])    # cloned by reference
+
+    db.add_all(models.TestCase(project_id=doomed, test_case={"Description": f"case {i}"}) for i in range(3))
+    db.add(models.TestCase(project_id=clone, test_case={"Description": "copy"}))
+    db.commit()
+    crud.update_project_users(db, doomed, [make_user(), make_user()])
+
+    r = client.delete(f"/projects/{doomed}", headers=admin_headers)
+    assert r.status_code == 200
+    assert r.json()["removed"] == {"testcases": 3, "files": 2, "memberships": 2}
+
+    def count(model, project_id):
+        return db.execute(select(func.count()).select_from(model).where(model.project_id == project_id)).scalar()
+
+    for model in (models.TestCase, models.ProjectFile, models.ProjectUser):
+        assert count(model, doomed) == 0, model
+    assert db.get(models.Project, doomed) is None
+    assert count(models.TestCase, clone) == 1
+    assert count(models.ProjectFile, clone) == 1
+
+    # background task: files only the deleted project used are gone, the shared one stays
+    assert sorted(os.listdir(folder)) == ["shared.docx"]
+
+
+def test_delete_removes_empty_upload_folder(client, admin_headers, db, make_project, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "UPLOAD_DIR", str(tmp_path))
+    project = make_project()
+    folder = tmp_path / f"project_{project}"
+    folder.mkdir()
+    (folder / "only.pdf").write_text("x")
+    crud.create_project_file(db, project, "only.pdf", str(folder / "only.pdf"))
+
+    assert client.delete(f"/projects/{project}", headers=admin_headers).json()["removed"]["files"] == 1
+    assert not folder.exists()
+
+
+def test_delete_missing_project_is_404(client, admin_headers):
+    assert client.delete("/projects/999999", headers=admin_headers).status_code == 404
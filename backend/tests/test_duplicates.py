@@ -0,0 +1,61 @@
+from app import duplicates, events
+
+
+def words(tag, n=40):
+    """A test case text of n words nobody else's test shares."""
+    return " ".join(f"{tag}{i}" for i in range(n))
+
+
+def create(client, headers, project, description):
+    r = client.post(f"/projects/{project['id']}/testcases", headers=headers,
+                    json={"Description": description, "Steps": "open the page", "Priority": "Low"})
+    return r.json()["id"]
+
+
+def cluster_of(client, headers, project, tc_id):
+    clusters = client.get(f"/projects/{project['id']}/testcases/duplicates", headers=headers).json()["clusters"]
+    return next((c for c in clusters if tc_id in c), None)
+
+
+def test_batch_skips_near_duplicates(client, admin_headers, project):
+    existing = create(client, admin_headers, project, words("skip"))
+    creates = [
+        {"Description": words("skip") + " again", "Steps": "open the page"},   # near-identical to existing
+        {"Description": words("fresh"), "Steps": "open the page"},
+        {"Description": words("fresh") + " twice", "Steps": "open the page"},  # repeats the entry above
+        {"Description": words("other"), "Steps": "open the page"},
+    ]
+    r = client.post(f"/projects/{project['id']}/testcases/batch", headers=admin_headers,
+                    json={"creates": creates, "skip_duplicates": True})
+    assert r.status_code == 200
+    result = r.json()
+    assert len(result["created"]) == 2
+    assert result["duplicates"] == [{"index": 0, "duplicate_of": existing}, {"index": 2, "duplicate_of": None}]
+
+
+def test_batch_keeps_duplicates_unless_asked(client, admin_headers, project):
+    create(client, admin_headers, project, words("keep"))
+    r = client.post(f"/projects/{project['id']}/testcases/batch", headers=admin_headers,
+                    json={"creates": [{"Description": words("keep"), "Steps": "open the page"}]})
+    assert len(r.json()["created"]) == 1
+    assert r.json()["duplicates"] == []
+
+
+def test_index_follows_updates_deletes_and_resets(client, admin_headers, project):
+    a = create(client, admin_headers, project, words("follow"))
+    b = create(client, admin_headers, project, words("follow") + " copy")
+    assert cluster_of(client, admin_headers, project, a) == [a, b]
+
+    url = f"/projects/{project['id']}/testcases/{b}"
+    client.put(url, headers=admin_headers, json={"Description": words("elsewhere")})
+    assert cluster_of(client, admin_headers, project, a) is None
+
+    client.put(url, headers=admin_headers, json={"Description": words("follow") + " back"})
+    assert cluster_of(client, admin_headers, project, a) == [a, b]
+
+    events.publish(project["id"], "reset", {"project_id": project["id"]})
+    assert project["id"] not in duplicates._indexes
+    assert cluster_of(client, admin_headers, project, a) == [a, b]     # reloaded from the database
+
+    client.delete(f"/projects/{project['id']}/testcases/{a}", headers=admin_headers)
+    assert cluster_of(client, admin_headers, project, b) is None
@@ -0,0 +1,118 @@
+import asyncio
+import itertools
+import json
+
+import pytest
+
+from app import events
+
+_projects = itertools.count(9001)   # project ids nobody else publishes to
+
+
+@pytest.fixture
+def project_id():
+    return next(_projects)
+
+
+def publish(project_id, n, event_type="update"):
+    return [events._publish_local(project_id, event_type, {"id": i, "project_id": project_id, "test_case": {}})
+            for i in range(n)]
+
+
+def frames(project_id, last_event_id, n, then=None):
+    """The first n SSE frames of a stream resumed at last_event_id, as (id, type, data)."""
+    async def take():
+        gen = events.stream(project_id, last_event_id)
+        out = [await gen.__anext__()]
+        if then is not None:
+            then()
+        out += [await gen.__anext__() for _ in range(n - 1)]
+        await gen.aclose()
+        return out
+    parsed = []
+    for frame in asyncio.run(take()):
+        fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+        parsed.append((fields["id"], fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def test_last_event_id_replays_what_was_missed(project_id):
+    ids = publish(project_id, 3)
+    seq = events.resolve_event_id(project_id, ids[0])
+    got = frames(project_id, seq, 3, then=lambda: publish(project_id, 1, "delete"))
+    assert [(i, t) for i, t, _ in got] == [(ids[1], "update"), (ids[2], "update"),
+                                           (events.current_event_id(), "delete")]
+
+
+def test_relayed_event_ids_resolve_while_buffered(project_id):
+    publish(project_id, 1)
+    events._publish_local(project_id, "create", {"id": 1}, event_id="0badc0de-7")
+    after = publish(project_id, 1)
+    seq = events.resolve_event_id(project_id, "0badc0de-7")
+    assert seq > 0
+    assert [i for i, _, _ in frames(project_id, seq, 1)] == after
+
+
+@pytest.mark.parametrize("last_event_id", ["0badc0de-99999", "not-an-id"])
+def test_unknown_id_resets(project_id, last_event_id):
+    publish(project_id, 2)
+    assert events.resolve_event_id(project_id, last_event_id) == -1
+    (event_id, event_type, data), = frames(project_id, -1, 1)
+    assert (event_id, event_type, data) == (events.current_event_id(), "reset", {"project_id": project_id})
+
+
+def test_id_from_before_a_restart_resets(project_id):
+    publish(project_id, 1)
+    future = f"{events._token}-{events._last_id + 1000}"
+    assert frames(project_id, events.resolve_event_id(project_id, future), 1)[0][1] == "reset"
+
+
+def test_evicted_id_resets(project_id, monkeypatch):
+    monkeypatch.setattr(events, "BUFFER_SIZE", 3)
+    ids = publish(project_id, 5)
+    assert frames(project_id, events.resolve_event_id(project_id, ids[0]), 1)[0][1] == "reset"
+    # the oldest id still buffered resumes normally
+    seq = events.resolve_event_id(project_id, ids[2])
+    assert [i for i, _, _ in frames(project_id, seq, 2)] == ids[3:]
+
+
+class FakeRelay:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, body):
+        self.sent.append(json.loads(body))
+
+
+@pytest.fixture
+def relay(monkeypatch):
+    relay = FakeRelay()
+    monkeypatch.setattr(events, "_relay", relay)
+    return relay
+
+
+def test_relay_forwards_events(relay, project_id):
+    events.publish(project_id, "update", {"id": 1, "test_case": {"Description": "short"}})
+    event_id = events.current_event_id()
+    message, = relay.sent
+    assert message["origin"] == events._token
+    assert message["data"] == {"project_id": project_id, "type": "update", "id": event_id,
+                               "data": {"id": 1, "test_case": {"Description": "short"}}}
+
+
+def test_oversized_event_is_relayed_as_reset(relay, project_id):
+    big = {"id": 1, "test_case": {"Steps": "x" * events.NOTIFY_MAX_BYTES}}
+    events.publish(project_id, "update", big)
+    event_id = events.current_event_id()
+    message, = relay.sent
+    assert message["kind"] == "event"
+    assert message["data"] == {"project_id": project_id, "type": "reset",
+                               "data": {"project_id": project_id}, "id": event_id}
+    assert len(json.dumps(message).encode()) <= events.NOTIFY_MAX_BYTES
+    # the local subscribers still get the full event
+    assert frames(project_id, events.resolve_event_id(project_id, event_id) - 1, 1)[0][2] == big
+
+
+def test_oversized_other_messages_are_dropped(relay):
+    events.broadcast("clone_job", {"log": "x" * events.NOTIFY_MAX_BYTES})
+    assert relay.sent == []
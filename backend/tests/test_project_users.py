@@ -0,0 +1,52 @@
+import pytest
+
+from app import crud
+
+
+def members(db, project_id):
+    return sorted(pu.user_id for pu in crud.get_project_users(db, project_id))
+
+
+def test_assign_reassign_and_remove(db, make_user, make_project):
+    project = make_project()
+    a, b, c = make_user(), make_user(), make_user()
+
+    result = crud.update_project_users(db, project, [b, a, a])
+    assert [(m.project_id, m.user_id) for m in result] == [(project, a), (project, b)]
+    assert members(db, project) == [a, b]
+
+    result = crud.update_project_users(db, project, [b, c])     # a leaves, b stays, c joins
+    assert [m.user_id for m in result] == [b, c]
+    assert members(db, project) == [b, c]
+
+    assert crud.update_project_users(db, project, []) == []
+    assert members(db, project) == []
+
+
+def test_member_keeps_its_row_when_reassigned(db, make_user, make_project):
+    project, user = make_project(), make_user()
+    first, = crud.update_project_users(db, project, [user])
+    again, = crud.update_project_users(db, project, [user])
+    assert again.id == first.id
+
+
+def test_users_in_another_project_conflict(db, make_user, make_project):
+    mine, theirs = make_project(), make_project()
+    a, b, free = make_user(), make_user(), make_user()
+    crud.update_project_users(db, theirs, [b, a])
+    crud.update_project_users(db, mine, [free])
+
+    with pytest.raises(ValueError) as exc:
+        crud.update_project_users(db, mine, [free, b, a])
+    assert str(exc.value) == f"Users already assigned to other projects: {sorted([a, b])}"
+    # nothing changed on either side
+    assert members(db, mine) == [free]
+    assert members(db, theirs) == sorted([a, b])
+
+
+def test_assign_route_reports_conflicts(client, admin_headers, db, make_user, make_project):
+    taken = make_user()
+    crud.update_project_users(db, make_project(), [taken])
+    r = client.post(f"/projects/{make_project()}/users/assign", json={"user_ids": [taken]}, headers=admin_headers)
+    assert r.status_code == 400
+    assert r.json()["detail"] == f"Users already assigned to other projects: [{taken}]"
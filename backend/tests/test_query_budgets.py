@@ -0,0 +1,47 @@
+import pytest
+
+from app import main, querystats
+
+
+def test_read_routes_within_budget(client, admin_headers, project):
+    pid = project["id"]
+    testcases = client.get(f"/projects/{pid}/testcases", headers=admin_headers).json()
+    for path in ["/projects/", f"/projects/{pid}", "/users/me/projects", f"/projects/{pid}/users",
+                 f"/projects/{pid}/testcases/{testcases[0]['id']}", f"/projects/{pid}/testcases/search?q=case"]:
+        assert client.get(path, headers=admin_headers).status_code == 200, path
+
+
+def test_count_queries_includes_requests(client, admin_headers, project):
+    with querystats.count_queries() as stats:
+        client.get(f"/projects/{project['id']}/testcases", headers=admin_headers)
+    assert stats.count >= 2
+
+    with pytest.raises(AssertionError, match="budget is 0"):
+        with querystats.assert_max_queries(0):
+            client.get(f"/projects/{project['id']}/testcases", headers=admin_headers)
+
+
+def test_route_over_budget_fails(client, admin_headers, project, query_budgets, monkeypatch):
+    monkeypatch.setattr(main.get_testcases, "query_budget", 1)
+    client.get(f"/projects/{project['id']}/testcases", headers=admin_headers)
+    with pytest.raises(AssertionError, match=r"/projects/\{project_id\}/testcases: \d+ queries, budget 1"):
+        querystats.check_budgets(query_budgets)
+    query_budgets.clear()   # checked above; don't fail this test again at teardown
+
+
+def test_batch_budget_does_not_grow_with_updates(client, admin_headers, project):
+    pid = project["id"]
+    testcases = client.get(f"/projects/{pid}/testcases", headers=admin_headers).json()
+    before = {tc["id"]: tc for tc in testcases}
+    updates = [{"id": tc["id"], "fields": {"Priority": "High"}} for tc in testcases[:20]]
+    with querystats.count_queries() as stats:
+        result = client.post(f"/projects/{pid}/testcases/batch", headers=admin_headers, json={
+            "updates": updates, "creates": [{"Description": f"new {i}"} for i in range(3)],
+        }).json()
+    assert stats.count <= main.batch_testcases.query_budget
+    assert result["updated"] == sorted(u["id"] for u in updates)
+
+    after = {tc["id"]: tc for tc in client.get(f"/projects/{pid}/testcases", headers=admin_headers).json()}
+    for u in updates:
+        assert after[u["id"]]["test_case"] == {**before[u["id"]]["test_case"], "Priority": "High"}
+        assert after[u["id"]]["version"] == before[u["id"]]["version"] + 1
@@ -0,0 +1,10 @@
+def test_snippet_escapes_test_case_markup(client, admin_headers, project):
+    pid = project["id"]
+    client.post(f"/projects/{pid}/testcases", headers=admin_headers, json={
+        "Description": "Checkout <img src=x onerror=alert(1)> & coupon", "Priority": "Low",
+    })
+    hits = client.get(f"/projects/{pid}/testcases/search?q=checkout", headers=admin_headers).json()["results"]
+    snippet = hits[0]["snippet"]
+    assert "<img" not in snippet
+    assert "&lt;img src=x onerror=alert(1)&gt; &amp; coupon" in snippet
+    assert "<mark>Checkout</mark>" in snippet
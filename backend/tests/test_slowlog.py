@@ -0,0 +1,56 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app import slowlog
+
+
+class FakeEngine:
+    """Records what _explain runs instead of talking to Postgres."""
+
+    def __init__(self):
+        self.dialect = SimpleNamespace(name="postgresql")
+        self.executed = []
+
+    @contextmanager
+    def connect(self):
+        engine = self
+
+        class Conn:
+            info = {}
+
+            def exec_driver_sql(self, sql, parameters):
+                engine.executed.append(sql)
+                return SimpleNamespace(fetchall=lambda: [("Result",)])
+
+            def rollback(self):
+                pass
+
+        yield Conn()
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT pg_advisory_lock(%(key)s)",
+    "SELECT pg_advisory_unlock(%(key)s)",
+    "select pg_try_advisory_lock(1)",
+    "SELECT pg_notify('testops_events', 'x')",
+    "SELECT nextval('testcases_id_seq') FROM testcases",
+    "SELECT id FROM testcases WHERE project_id = 1 FOR UPDATE",
+    "WITH gone AS (DELETE FROM testcases RETURNING id) SELECT count(*) FROM gone",
+    "UPDATE testcases SET version = version + 1",
+])
+def test_explain_never_analyzes_side_effects(statement):
+    engine = FakeEngine()
+    slowlog._explain(engine, statement, {}, "fp")
+    assert engine.executed == ["EXPLAIN " + statement]
+
+
+@pytest.mark.parametrize("statement", [
+    "SELECT id, test_case FROM testcases WHERE project_id = %(pid)s ORDER BY id",
+    "WITH hits AS (SELECT id FROM testcases) SELECT count(*) FROM hits",
+])
+def test_explain_analyzes_plain_reads(statement):
+    engine = FakeEngine()
+    slowlog._explain(engine, statement, {}, "fp")
+    assert engine.executed == ["EXPLAIN (ANALYZE, BUFFERS) " + statement]
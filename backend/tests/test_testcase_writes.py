@@ -0,0 +1,59 @@
+import pytest
+
+from app import models
+
+
+@pytest.fixture
+def testcase(client, admin_headers, project):
+    return client.post(f"/projects/{project['id']}/testcases", headers=admin_headers,
+                       json={"Description": "guarded write", "Priority": "Low"}).json()
+
+
+@pytest.fixture(scope="module")
+def other_project(client, admin_headers):
+    """A project the admin is not assigned to."""
+    return client.post("/projects", json={"name": "Elsewhere", "organization": "org", "pat": "x"},
+                       headers=admin_headers).json()
+
+
+def test_update_with_current_version(client, admin_headers, project, testcase):
+    url = f"/projects/{project['id']}/testcases/{testcase['id']}"
+    r = client.put(url, headers={**admin_headers, "If-Match": f'"{testcase["version"]}"'},
+                   json={"Description": "changed"})
+    assert r.status_code == 200
+    assert r.headers["ETag"] == f'"{testcase["version"] + 1}"'
+
+
+def test_stale_version_is_412(client, admin_headers, project, testcase):
+    url = f"/projects/{project['id']}/testcases/{testcase['id']}"
+    client.put(url, headers=admin_headers, json={"Description": "someone else"})
+    stale = {**admin_headers, "If-Match": f'"{testcase["version"]}"'}
+    r = client.put(url, headers=stale, json={"Description": "mine"})
+    assert r.status_code == 412, r.json()
+    assert client.delete(url, headers=stale).status_code == 412
+
+
+def test_missing_testcase_is_404(client, admin_headers, project):
+    url = f"/projects/{project['id']}/testcases/999999"
+    assert client.put(url, headers=admin_headers, json={"Description": "x"}).status_code == 404
+    assert client.delete(url, headers=admin_headers).status_code == 404
+
+
+def test_not_assigned_is_403(client, admin_headers, other_project, testcase):
+    url = f"/projects/{other_project['id']}/testcases/{testcase['id']}"
+    r = client.put(url, headers=admin_headers, json={"Description": "x"})
+    assert r.status_code == 403
+    assert r.json()["detail"] == "You are not assigned to this project"
+    assert client.delete(url, headers=admin_headers).status_code == 403
+
+
+def test_testcase_of_another_project_is_403(client, admin_headers, project, other_project, db):
+    # the admin can only join one project, so add the row directly
+    foreign = models.TestCase(project_id=other_project["id"], test_case={"Description": "not yours"})
+    db.add(foreign)
+    db.commit()
+    url = f"/projects/{project['id']}/testcases/{foreign.id}"
+    r = client.put(url, headers=admin_headers, json={"Description": "x"})
+    assert r.status_code == 403
+    assert r.json()["detail"] == "Test case does not belong to this project"
+    assert client.delete(url, headers=admin_headers).status_code == 403
@@ -0,0 +1,126 @@
+import threading
+import time
+
+import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from config import API_URL, API_TIMEOUT, API_GET_TTL
+
+# ---------- Backend API Client ----------
+# All calls to the backend go through here:
+#   - one keep-alive requests.Session (connection pool) per process
+#   - default (connect, read) timeouts on every call
+#   - short-lived cache of successful GET responses, keyed per token
+#   - once the TTL is over, responses with an ETag are revalidated with
+#     If-None-Match instead of downloaded again (304 -> reuse our copy)
+#   - mutations expire the cached reads they can affect
+
+
+@st.cache_resource
+def get_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+_CACHE_MAX_ENTRIES = 512
+
+# A mutation under the first path segment invalidates cached reads under these prefixes
+_RELATED = {
+    "projects": ("/projects", "/users/me/projects"),
+    "users": ("/users", "/projects", "/me"),
+    "deploy_testcases": (),
+}
+
+
+def _token(headers):
+    return (headers or {}).get("Authorization", "")
+
+
+def invalidate(path):
+    """
+    Expire cached GET responses (for every token) that a mutation of path can
+    affect. The copies are kept so they can still be revalidated by ETag.
+    """
+    first = path.strip("/").split("/", 1)[0]
+    prefixes = _RELATED.get(first, ("/" + first,))
+    if not prefixes:
+        return
+    with _cache_lock:
+        for key in [k for k in _cache if k[1].startswith(prefixes)]:
+            _cache[key] = (0.0, _cache[key][1])
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+
+
+def _request(method, path, timeout=None, **kwargs):
+    return get_session().request(method, f"{API_URL}{path}", timeout=timeout or API_TIMEOUT, **kwargs)
+
+
+def get(path, headers=None, params=None, ttl=None, timeout=None):
+    """
+    GET path. 200 responses are reused for ttl seconds (API_GET_TTL by default,
+    0 disables), then revalidated with If-None-Match when they carry an ETag.
+    """
+    ttl = API_GET_TTL if ttl is None else ttl
+    key = (_token(headers), path, tuple(sorted((params or {}).items())))
+    hit = None
+    if ttl > 0:
+        with _cache_lock:
+            hit = _cache.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+
+    etag = hit[1].headers.get("ETag") if hit else None
+    if etag:
+        headers = {**(headers or {}), "If-None-Match": etag}
+    resp = _request("GET", path, headers=headers, params=params, timeout=timeout)
+    if resp.status_code == 304 and etag:
+        resp = hit[1]
+
+    if ttl > 0 and resp.status_code == 200:
+        now = time.monotonic()
+        with _cache_lock:
+            if len(_cache) >= _CACHE_MAX_ENTRIES:
+                for k in [k for k, (expires, r) in _cache.items() if expires <= now and "ETag" not in r.headers]:
+                    del _cache[k]
+                while len(_cache) >= _CACHE_MAX_ENTRIES:
+                    del _cache[next(iter(_cache))]
+            _cache[key] = (now + ttl, resp)
+    return resp
+
+
+_mutation_listeners = []
+
+
+def add_mutation_listener(fn):
+    """Call fn(path) just before every POST / PUT / DELETE made through this client."""
+    _mutation_listeners.append(fn)
+
+
+def _mutate(method, path, **kwargs):
+    for fn in _mutation_listeners:
+        fn(path)
+    resp = _request(method, path, **kwargs)
+    invalidate(path)
+    return resp
+
+
+def post(path, **kwargs):
+    return _mutate("POST", path, **kwargs)
+
+
+def put(path, **kwargs):
+    return _mutate("PUT", path, **kwargs)
+
+
+def delete(path, **kwargs):
+    return _mutate("DELETE", path, **kwargs)
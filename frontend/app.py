@@ -1,9 +1,13 @@
 import streamlit as st
-import requests
 import os ,json
-
-# ---------- Backend API ----------
-API_URL = os.getenv("API_URL", "http://localhost:8000")
+import api_client as api
+from testcase_parser import parse_test_cases
+from retrieval import get_document_index, get_testcase_index
+from commands import parse_command, describe_result
+from llm_gateway import get_gateway, LLMGatewayError, INTERACTIVE, BULK
+from change_feed import get_project_feed
+from changeset import compute_changes
+from documents import extract_text, SUPPORTED_TYPES
 
 st.set_page_config(page_title="Auth Frontend", layout="wide")
 
@@ -55,7 +59,7 @@ def login_page():
         st.markdown("<br>", unsafe_allow_html=True) # Add some space
         
         if st.button("SIGN IN", use_container_width=True):
-            resp = requests.post(f"{API_URL}/token", data={"username": username, "password": password})
+            resp = api.post("/token", data={"username": username, "password": password})
             if resp.status_code == 200:
                 token = resp.json()["access_token"]
                 st.session_state["token"] = token
@@ -63,7 +67,7 @@ def login_page():
 
                 # Fetch current user
                 headers = {"Authorization": f"Bearer {token}"}
-                me = requests.get(f"{API_URL}/me", headers=headers)
+                me = api.get("/me", headers=headers)
                 if me.status_code == 200:
                     st.session_state["role"] = me.json().get("role", "user")
                     st.success("✅ Login successful")
@@ -82,13 +86,13 @@ def admin_dashboard():
     headers = {"Authorization": f"Bearer {token}"}
 
     # Sidebar menu
-    menu = st.sidebar.selectbox("📌 Menu", ["Users", "Project Configuration"])
+    menu = st.sidebar.selectbox("📌 Menu", ["Users", "Project Configuration", "LLM Gateway"])
 
     if menu == "Users":
         st.subheader("👥 Manage Users")
 
         if st.button("🔄 Refresh users", use_container_width=True):
-            r = requests.get(f"{API_URL}/users", headers=headers)
+            r = api.get("/users", headers=headers, ttl=0)
             if r.status_code == 200:
                 st.session_state["users"] = r.json()
             else:
@@ -114,7 +118,7 @@ def admin_dashboard():
                                     st.error("Password cannot be empty.")
                                 else:
                                     payload = {"username": u['username'], "password": new_pw, "role": u['role']}
-                                    r = requests.put(f"{API_URL}/users/{u['id']}", json=payload, headers=headers)
+                                    r = api.put(f"/users/{u['id']}", json=payload, headers=headers)
                                     if r.status_code == 200:
                                         st.success(f"✅ Password for {u['username']} updated")
                                     else:
@@ -127,7 +131,7 @@ def admin_dashboard():
                             if u['username'] == st.session_state.get("username"):
                                 st.error("You cannot delete your own account.")
                             else:
-                                r = requests.delete(f"{API_URL}/users/{u['id']}", headers=headers)
+                                r = api.delete(f"/users/{u['id']}", headers=headers)
                                 if r.status_code == 200:
                                     st.success(f"🗑️ User {u['username']} deleted")
                                     st.rerun()
@@ -143,7 +147,7 @@ def admin_dashboard():
 
         if st.button("Create user", use_container_width=True):
             payload = {"username": new_username, "password": new_password, "role": new_role}
-            r = requests.post(f"{API_URL}/users", json=payload, headers=headers)
+            r = api.post("/users", json=payload, headers=headers)
             if r.status_code in (200, 201):
                 st.success("✅ User created")
                 st.rerun()
@@ -167,7 +171,7 @@ def admin_dashboard():
                 azure_pat = st.text_input("Azure PAT", type="password")
 
                 try:
-                    _users_resp = requests.get(f"{API_URL}/users", headers=headers)
+                    _users_resp = api.get("/users", headers=headers)
                     all_users = _users_resp.json() if _users_resp.status_code == 200 else []
                 except Exception:
                     all_users = []
@@ -189,15 +193,15 @@ def admin_dashboard():
                         "chat_history": []
                     }
 
-                    r = requests.post(f"{API_URL}/projects", json=payload, headers=headers)
+                    r = api.post("/projects", json=payload, headers=headers)
 
                     if r.status_code in (200, 201):
                         st.success(f"✅ Project '{project_name}' saved")
                         if assigned_usernames:
                             user_ids = [user_options[n] for n in assigned_usernames]
                             assign_payload = {"user_ids": user_ids}
-                            ar = requests.post(f"{API_URL}/projects/{r.json().get('id')}/users/assign",
-                                               json=assign_payload, headers=headers)
+                            ar = api.post(f"/projects/{r.json().get('id')}/users/assign",
+                                          json=assign_payload, headers=headers)
                             if ar.status_code == 200:
                                 st.success("✅ Users assigned to project")
                             else:
@@ -206,8 +210,15 @@ def admin_dashboard():
                     else:
                         st.error(f"❌ Failed to save project: {r.text}")
 
+    elif menu == "LLM Gateway":
+        st.subheader("🤖 LLM Gateway")
+        st.caption("Shared by all sessions of this frontend process.")
+        if st.button("🔄 Refresh metrics", use_container_width=True):
+            st.rerun()
+        st.json(get_gateway().metrics())
+
     st.markdown("### 📋 Existing Projects")
-    r = requests.get(f"{API_URL}/projects/", headers=headers)
+    r = api.get("/projects/", headers=headers)
     if r.status_code == 200:
         projects = r.json()
     else:
@@ -217,7 +228,7 @@ def admin_dashboard():
     if not projects:
         st.info("No projects found. Add one above.")
     else:
-        users_resp = requests.get(f"{API_URL}/users", headers=headers)
+        users_resp = api.get("/users", headers=headers)
         all_users = users_resp.json() if users_resp.status_code == 200 else []
 
         for p in projects:
@@ -244,8 +255,8 @@ def admin_dashboard():
                             st.session_state[f"uploaded_file_{p['id']}"],
                             st.session_state[f"uploaded_file_{p['id']}"].type
                         )}
-                        r = requests.post(
-                            f"{API_URL}/projects/{p['id']}/upload_file",
+                        r = api.post(
+                            f"/projects/{p['id']}/upload_file",
                             files=files,
                             headers={"Authorization": f"Bearer {token}"}
                         )
@@ -257,7 +268,7 @@ def admin_dashboard():
                         else:
                             st.error(f"❌ Upload failed: {r.text}")
 
-                fr = requests.get(f"{API_URL}/projects/{p['id']}", headers={"Authorization": f"Bearer {token}"})
+                fr = api.get(f"/projects/{p['id']}", headers={"Authorization": f"Bearer {token}"})
                 if fr.status_code == 200:
                     project_details = fr.json()
                     files = project_details.get("files", [])
@@ -269,8 +280,8 @@ def admin_dashboard():
 
                             with col2:
                                 if st.button("🗑️", key=f"del_file_{f['id']}"):
-                                    r_del = requests.delete(
-                                        f"{API_URL}/projects/files/{f['id']}",
+                                    r_del = api.delete(
+                                        f"/projects/files/{f['id']}",
                                         headers={"Authorization": f"Bearer {token}"}
                                     )
                                     if r_del.status_code == 200:
@@ -280,9 +291,10 @@ def admin_dashboard():
                                         st.error("❌ Failed to delete file")
 
                             with col3:
-                                r_dl = requests.get(
-                                    f"{API_URL}/projects/files/{f['id']}/download",
-                                    headers={"Authorization": f"Bearer {token}"}
+                                r_dl = api.get(
+                                    f"/projects/files/{f['id']}/download",
+                                    headers={"Authorization": f"Bearer {token}"},
+                                    ttl=0
                                 )
                                 if r_dl.status_code == 200:
                                     col3.download_button(
@@ -295,7 +307,7 @@ def admin_dashboard():
 
                 assigned_users = []
                 try:
-                    ar = requests.get(f"{API_URL}/projects/{p['id']}/users", headers=headers)
+                    ar = api.get(f"/projects/{p['id']}/users", headers=headers)
                     if ar.status_code == 200:
                         assigned_users = ar.json()
                 except Exception:
@@ -327,7 +339,7 @@ def admin_dashboard():
 
                 with cols[1]:
                     if st.button("🗑️ Delete Project", key=f"del_proj_{p['id']}"):
-                        dr = requests.delete(f"{API_URL}/projects/{p['id']}", headers=headers)
+                        dr = api.delete(f"/projects/{p['id']}", headers=headers)
                         if dr.status_code == 200:
                             st.success(f"🗑️ Project '{p['name']}' deleted")
                             st.rerun()
@@ -337,8 +349,8 @@ def admin_dashboard():
                 if st.button("Update Assignments", key=f"assign_btn_{p['id']}"):
                     payload = {"user_ids": [int(uid) for uid in selected_users]}
                     st.write("DEBUG payload →", payload)  # Debug output
-                    r = requests.post(
-                        f"{API_URL}/projects/{p['id']}/users/assign",
+                    r = api.post(
+                        f"/projects/{p['id']}/users/assign",
                         json=payload,
                         headers=headers,
                     )
@@ -356,8 +368,8 @@ def save_chat_history(project_id, history, headers):
     """
     payload = {"history": history}
     try:
-        requests.put(
-            f"{API_URL}/projects/{project_id}/chat_history",
+        api.put(
+            f"/projects/{project_id}/chat_history",
             json=payload,
             headers=headers,
             timeout=5 # Use a timeout to avoid hanging the app
@@ -368,15 +380,10 @@ def save_chat_history(project_id, history, headers):
 
 # ---------- User Dashboard (Healthcare Test Case Generator) ----------
 def user_dashboard():
-    import google.generativeai as genai
-    import fitz  # PyMuPDF
-    import docx  # python-docx
     import pandas as pd
-    import re
-    from config import GENAI_API_KEY
+    from config import CONTEXT_TOKEN_BUDGET, CHAT_CONTEXT_TOP_K, CHANGE_FEED_ENABLED
 
-    genai.configure(api_key=GENAI_API_KEY)
-    model = genai.GenerativeModel("gemini-2.5-pro")
+    gateway = get_gateway()
 
     st.title("🏥 Healthcare Test Case Generator")
     headers = {"Authorization": f"Bearer {st.session_state['token']}"}
@@ -387,7 +394,7 @@ def user_dashboard():
     if "doc_content" not in st.session_state:
         st.session_state.doc_content = None
 
-    r = requests.get(f"{API_URL}/users/me/projects", headers=headers)
+    r = api.get("/users/me/projects", headers=headers)
     if r.status_code != 200:
         st.markdown("❌ Failed to fetch project info")
         return
@@ -422,48 +429,27 @@ def user_dashboard():
         'HARM_CATEGORY_DANGEROUS_CONTENT': 'BLOCK_NONE',
     }
     
-    def parse_test_cases(response_text):
-        pattern = r"\**Test Case ID\**:\s*(.*?)\s*\**Description\**:\s*(.*?)\s*\**Steps\**:\s*(.*?)\s*\**Expected Result\**:\s*(.*?)\s*\**Priority\**:\s*(.*?)(?=\n\n|\Z)"
-        matches = re.findall(pattern, response_text, re.DOTALL | re.IGNORECASE)
-        if not matches:
-            return None
-        return pd.DataFrame([{
-            "Test Case ID": m[0].strip(),
-            "Description": m[1].strip(),
-            "Steps": m[2].strip(),
-            "Expected Result": m[3].strip(),
-            "Priority": m[4].strip()
-        } for m in matches])
-
-    uploaded_file = st.file_uploader("Upload a file", type=["pdf", "docx", "md"])
-
-    def extract_text(file, ftype):
-        if ftype == "pdf":
-            doc = fitz.open(stream=file.read(), filetype="pdf")
-            return "".join([page.get_text("text") for page in doc])
-        elif ftype == "docx":
-            doc = docx.Document(file)
-            return "\n".join([p.text for p in doc.paragraphs])
-        elif ftype == "md":
-            return file.read().decode("utf-8")
-        return ""
+    uploaded_file = st.file_uploader("Upload a file", type=list(SUPPORTED_TYPES))
 
     if uploaded_file:
         ftype = uploaded_file.name.split(".")[-1].lower()
         st.session_state.doc_content = extract_text(uploaded_file, ftype)
         st.success(f"✅ {uploaded_file.name} uploaded and ready. Ask me to 'generate test cases' in the chat.")
 
-    r2 = requests.get(f"{API_URL}/projects/{selected_project['id']}/testcases", headers=headers)
-    if r2.status_code == 200:
-        fetched = r2.json()
-        st.session_state.testcases = []
-        for tc in fetched:
-            tc_data = tc.get("test_case", {}) 
-            if tc_data:
-                tc_data["id"] = tc.get("id")
-                st.session_state.testcases.append(tc_data)
-    else:
-        st.session_state.testcases = [] 
+    # Local copy kept current by the change feed; plain fetch until it is ready
+    fetched = None
+    if CHANGE_FEED_ENABLED:
+        fetched = get_project_feed(selected_project['id'], headers).snapshot()
+    if fetched is None:
+        r2 = api.get(f"/projects/{selected_project['id']}/testcases", headers=headers)
+        fetched = r2.json() if r2.status_code == 200 else []
+
+    st.session_state.testcases = []
+    for tc in fetched:
+        tc_data = tc.get("test_case", {}) 
+        if tc_data:
+            tc_data["id"] = tc.get("id")
+            st.session_state.testcases.append(tc_data)
 
     col1, col2 = st.columns([0.6, 0.4])
 
@@ -496,38 +482,16 @@ def user_dashboard():
         with btn_col1:
             if st.button("Save Changes to Test Cases", use_container_width=True):
                 with st.spinner("Saving changes..."):
-                    original_ids = set(original_df['id'].dropna().astype(int))
-                    edited_ids = set(edited_df['id'].dropna().astype(int))
-                    
-                    deleted_ids = original_ids - edited_ids
-                    for db_id in deleted_ids:
-                        resp = requests.delete(
-                            f"{API_URL}/projects/{selected_project['id']}/testcases/{db_id}",
-                            headers=headers
-                        )
-                    
-                    new_rows = edited_df[edited_df['id'].isna()]
-                    for _, row in new_rows.iterrows():
-                        payload = row.to_dict()
-                        del payload['id'] 
-                        resp = requests.post(
-                            f"{API_URL}/projects/{selected_project['id']}/testcases",
-                            json=payload,
+                    changes = compute_changes(original_df, edited_df, [c for c in display_columns if c != "id"])
+                    if changes["delete_ids"] or changes["updates"] or changes["creates"]:
+                        resp = api.post(
+                            f"/projects/{selected_project['id']}/testcases/batch",
+                            json=changes,
                             headers=headers
                         )
-
-                    original_map = {row['id']: row.to_dict() for _, row in original_df.iterrows() if pd.notna(row['id'])}
-                    edited_map = {row['id']: row.to_dict() for _, row in edited_df.iterrows() if pd.notna(row['id'])}
-                    
-                    for db_id in original_ids.intersection(edited_ids):
-                        if original_map[db_id] != edited_map[db_id]:
-                            payload = edited_map[db_id]
-                            del payload['id'] 
-                            resp = requests.put(
-                                f"{API_URL}/projects/{selected_project['id']}/testcases/{db_id}",
-                                json=payload, 
-                                headers=headers
-                            )
+                        if resp.status_code != 200:
+                            st.error(f"❌ Failed to save changes: {resp.text}")
+                            st.stop()
                     
                     st.success("All changes saved successfully!")
                     st.rerun()
@@ -552,10 +516,11 @@ def user_dashboard():
             
             with st.spinner(f"Assigning test cases to {selected_project.get('name')}..."):
                 try:
-                    deploy_resp = requests.post(
-                        f"{API_URL}/deploy_testcases",
+                    deploy_resp = api.post(
+                        "/deploy_testcases",
                         headers={**headers, "Content-Type": "application/json"},
-                        json=payload
+                        json=payload,
+                        timeout=600
                     )
                     if deploy_resp.status_code == 200:
                         results = deploy_resp.json().get("results", [])
@@ -601,6 +566,21 @@ def user_dashboard():
             st.session_state.messages.append({"role": "assistant", "content": intro_message})
             save_chat_history(selected_project['id'], st.session_state.messages, headers)
             st.rerun()
+
+        elif (command := parse_command(prompt, st.session_state.testcases)) is not None:
+            # Simple delete / modify commands are handled locally in one batch, no LLM call
+            resp = api.post(
+                f"/projects/{selected_project['id']}/testcases/batch",
+                json=command,
+                headers=headers
+            )
+            if resp.status_code == 200:
+                chat_message = describe_result(command, resp.json(), st.session_state.testcases)
+            else:
+                chat_message = f"❌ Failed to apply the command: {resp.text}"
+            st.session_state.messages.append({"role": "assistant", "content": chat_message})
+            save_chat_history(selected_project['id'], st.session_state.messages, headers)
+            st.rerun()
         
         elif any(x in normalized_prompt for x in ["generate", "create"]):
             
@@ -610,6 +590,9 @@ def user_dashboard():
                         with st.chat_message("assistant"):
                             with st.spinner("🤖 Generating test cases from your file..."):
                                 
+                                doc_index = get_document_index(st.session_state.doc_content)
+                                doc_context = doc_index.select_context(prompt, CONTEXT_TOKEN_BUDGET)
+
                                 full_prompt = f"""
                                 You are an AI specialized in generating structured test cases.
                                 You MUST generate test cases in the following format. Do NOT add any
@@ -623,31 +606,43 @@ def user_dashboard():
                                 
                                 (Leave a blank line between test cases)
 
-                                Document Content: {st.session_state.doc_content[:20000]}
+                                Document Content: {doc_context}
                                 User Query: "{prompt}"
                                 """
                                 
-                                gen_response = model.generate_content(full_prompt, safety_settings=safety_settings)
                                 gen_response_text = ""
+                                gateway_error = None
                                 try:
-                                    gen_response_text = gen_response.text
+                                    gen_response_text = gateway.generate(
+                                        full_prompt,
+                                        project_id=selected_project['id'],
+                                        priority=BULK,
+                                        safety_settings=safety_settings
+                                    )
                                 except ValueError:
                                     gen_response_text = "Sorry, I was unable to generate a response for that."
+                                except LLMGatewayError as e:
+                                    gateway_error = f"⚠️ {e}"
 
-                                df = parse_test_cases(gen_response_text)
+                                parsed = parse_test_cases(gen_response_text)
                                 chat_message = ""
-                                if df is not None and not df.empty:
-                                    for _, row in df.iterrows():
-                                        testcase_json = row.to_dict()
-                                        resp = requests.post(
-                                            f"{API_URL}/projects/{selected_project['id']}/testcases",
-                                            json=testcase_json,
-                                            headers=headers
-                                        )
-                                        if resp.status_code != 200:
-                                            st.error(f"❌ Failed to save test case: {resp.text}")
-                                    
-                                    chat_message = f"I've generated and saved {len(df)} test cases from the file."
+                                if gateway_error:
+                                    chat_message = gateway_error
+                                elif parsed:
+                                    # One request; the backend drops near-duplicates of existing test cases
+                                    resp = api.post(
+                                        f"/projects/{selected_project['id']}/testcases/batch",
+                                        json={"creates": parsed, "skip_duplicates": True},
+                                        headers=headers
+                                    )
+                                    if resp.status_code != 200:
+                                        st.error(f"❌ Failed to save test cases: {resp.text}")
+                                        chat_message = "❌ The generated test cases could not be saved."
+                                    else:
+                                        result = resp.json()
+                                        chat_message = f"I've generated and saved {len(result['created'])} test cases from the file."
+                                        if result.get("duplicates"):
+                                            chat_message += f" Skipped {len(result['duplicates'])} near-duplicate test cases."
                                 else:
                                     chat_message = "I'm sorry, I couldn't find any test cases in that document. The AI response may not have been in the correct format."
 
@@ -663,8 +658,11 @@ def user_dashboard():
                 st.rerun()
 
         else:
+            tc_index = get_testcase_index(selected_project['id'])
+            tc_index.sync(st.session_state.testcases)
+
             tc_data_for_prompt = []
-            for tc in st.session_state.testcases:
+            for tc in tc_index.top_k(prompt, CHAT_CONTEXT_TOP_K):
                 tc_data_for_prompt.append({
                     "id": tc.get("id"),
                     "Test Case ID": tc.get("Test Case ID"),
@@ -672,7 +670,8 @@ def user_dashboard():
                 })
 
             instructions_prompt = f"""
-            You are an AI assistant. The user has the following test cases:
+            You are an AI assistant. These are the user's test cases most relevant
+            to the instruction ({len(tc_data_for_prompt)} of {len(tc_index)}):
             {tc_data_for_prompt}
             
             When the user asks to delete or modify, use the "id" field (the database ID),
@@ -687,11 +686,19 @@ def user_dashboard():
             If it is NOT a command, just respond as a helpful assistant.
             """
             
-            response = model.generate_content(instructions_prompt, safety_settings=safety_settings)
-
             response_text = ""
             try:
-                response_text = response.text
+                response_text = gateway.generate(
+                    instructions_prompt,
+                    project_id=selected_project['id'],
+                    priority=INTERACTIVE,
+                    safety_settings=safety_settings
+                )
+            except LLMGatewayError as e:
+                st.session_state.messages.append({"role": "assistant", "content": f"⚠️ {e}"})
+                save_chat_history(selected_project['id'], st.session_state.messages, headers)
+                st.rerun()
+                return
             except ValueError:
                 fallback_message = (
                     "I'm sorry, I couldn't process that last request (it may have been blocked by safety filters). "
@@ -710,8 +717,8 @@ def user_dashboard():
                 if instr.startswith("DELETE:"):
                     processed_command = True
                     tcid = instr.replace("DELETE:", "").strip()
-                    resp = requests.delete(
-                        f"{API_URL}/projects/{selected_project['id']}/testcases/{tcid}",
+                    resp = api.delete(
+                        f"/projects/{selected_project['id']}/testcases/{tcid}",
                         headers=headers
                     )
                     if resp.status_code == 200:
@@ -743,8 +750,8 @@ def user_dashboard():
                         original_tc[field] = new_value
                         payload = original_tc 
                         
-                        resp = requests.put(
-                            f"{API_URL}/projects/{selected_project['id']}/testcases/{tcid}",
+                        resp = api.put(
+                            f"/projects/{selected_project['id']}/testcases/{tcid}",
                             json=payload, 
                             headers=headers
                         )
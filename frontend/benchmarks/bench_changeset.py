@@ -0,0 +1,83 @@
+"""
+Benchmark for the data editor "Save Changes" diff on a 20k-row grid.
+
+Compares the old per-row approach (iterrows() into dicts, then comparing
+every row) with changeset.compute_changes.
+
+    python benchmarks/bench_changeset.py [rows] [edited_fraction]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from changeset import compute_changes  # noqa: E402
+
+FIELDS = ["Test Case ID", "Description", "Steps", "Expected Result", "Priority"]
+
+
+def make_grid(n, rng):
+    df = pd.DataFrame({
+        "Test Case ID": [f"TC_{i:05d}" for i in range(n)],
+        "Description": [f"Verify billing refund {i}" for i in range(n)],
+        "Steps": [f"1. Open billing\n2. Refund invoice {i}" for i in range(n)],
+        "Expected Result": ["Refund is issued"] * n,
+        "Priority": rng.choice(["High", "Medium", "Low"], n),
+        "id": np.arange(1, n + 1, dtype=float),
+    })
+    df.loc[rng.choice(n, n // 20, replace=False), "Description"] = None  # some empty cells
+    return df
+
+
+def edit_grid(df, fraction, rng):
+    edited = df.copy()
+    n = len(df)
+    changed = rng.choice(n, int(n * fraction), replace=False)
+    edited.loc[changed, "Priority"] = "Critical"
+    edited = edited.drop(index=rng.choice(np.setdiff1d(np.arange(n), changed), 50, replace=False))
+    new = pd.DataFrame({f: [f"new {i}" for i in range(50)] for f in FIELDS})
+    new["id"] = np.nan
+    return pd.concat([edited, new], ignore_index=False)
+
+
+def legacy_changes(original_df, edited_df):
+    original_ids = set(original_df["id"].dropna().astype(int))
+    edited_ids = set(edited_df["id"].dropna().astype(int))
+    deleted = original_ids - edited_ids
+    new_rows = [row.to_dict() for _, row in edited_df[edited_df["id"].isna()].iterrows()]
+    original_map = {row["id"]: row.to_dict() for _, row in original_df.iterrows() if pd.notna(row["id"])}
+    edited_map = {row["id"]: row.to_dict() for _, row in edited_df.iterrows() if pd.notna(row["id"])}
+    updates = [edited_map[i] for i in original_ids & edited_ids if original_map[i] != edited_map[i]]
+    return deleted, updates, new_rows
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    fraction = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    rng = np.random.default_rng(0)
+    original = make_grid(n, rng)
+    edited = edit_grid(original, fraction, rng)
+
+    t_old, (deleted, updates, creates) = timed(legacy_changes, original, edited)
+    t_new, changes = timed(compute_changes, original, edited, FIELDS)
+
+    print(f"rows: {n}, edited: {int(n * fraction)}, deleted: 50, added: 50")
+    print(f"legacy iterrows:  {t_old * 1000:8.1f} ms  -> {len(deleted)} deletes, {len(updates)} full-row updates, {len(creates)} creates")
+    print(f"vectorized:       {t_new * 1000:8.1f} ms  -> {len(changes['delete_ids'])} deletes, "
+          f"{len(changes['updates'])} updates ({sum(len(u['fields']) for u in changes['updates'])} fields), "
+          f"{len(changes['creates'])} creates")
+    print(f"speedup: {t_old / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
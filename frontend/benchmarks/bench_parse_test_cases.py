@@ -0,0 +1,102 @@
+"""
+Benchmark for parse_test_cases.
+
+Builds well-formed and malformed model responses from ~1 KB up to several MB
+and times the state-machine parser against the old regex. The old regex runs
+in a child process with a timeout because it backtracks badly on malformed
+input (about 14 s for 2 KB with a missing Priority field).
+
+    python benchmarks/bench_parse_test_cases.py
+"""
+import multiprocessing
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from testcase_parser import parse_test_cases  # noqa: E402
+
+LEGACY_PATTERN = r"\**Test Case ID\**:\s*(.*?)\s*\**Description\**:\s*(.*?)\s*\**Steps\**:\s*(.*?)\s*\**Expected Result\**:\s*(.*?)\s*\**Priority\**:\s*(.*?)(?=\n\n|\Z)"
+LEGACY_MAX_BYTES = 64 * 1024
+LEGACY_TIMEOUT = 10
+SIZES = [1_000, 10_000, 100_000, 1_000_000, 4_000_000]
+
+
+def legacy_parse(text):
+    return re.findall(LEGACY_PATTERN, text, re.DOTALL | re.IGNORECASE)
+
+
+def _legacy_worker(text, queue):
+    queue.put(timed(legacy_parse, text, repeat=1))
+
+
+def timed_legacy(text):
+    queue = multiprocessing.Queue()
+    proc = multiprocessing.Process(target=_legacy_worker, args=(text, queue))
+    proc.start()
+    proc.join(LEGACY_TIMEOUT)
+    if proc.is_alive():
+        proc.kill()
+        proc.join()
+        return f">{LEGACY_TIMEOUT * 1000}"
+    return f"{queue.get() * 1000:.1f}"
+
+
+def well_formed_block(i):
+    return (
+        f"**Test Case ID:** TC_{i:05d}\n"
+        f"**Description:** Verify billing refund scenario {i}\n"
+        f"**Steps:**\n- Open billing\n- Cancel invoice {i}\n- Request refund\n"
+        f"**Expected Result:** Refund {i} is issued\n"
+        f"**Priority:** High\n\n"
+    )
+
+
+def malformed_block(i):
+    # Every block misses "Priority", so the old regex has to scan ahead for it
+    return (
+        f"Test Case ID: TC_{i:05d}\n"
+        f"Description: Appointment reminder {i}\n"
+        f"Steps: Schedule appointment {i}\n"
+        f"Expected Result: Reminder is queued\n\n"
+    )
+
+
+def build(block, size):
+    parts, total, i = [], 0, 0
+    while total < size:
+        b = block(i)
+        parts.append(b)
+        total += len(b)
+        i += 1
+    return "".join(parts)
+
+
+def timed(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    print(f"{'input':<12}{'bytes':>10}{'records':>9}{'parser ms':>12}{'us/KB':>8}{'legacy ms':>12}")
+    for name, block in (("well-formed", well_formed_block), ("malformed", malformed_block)):
+        for size in SIZES:
+            text = build(block, size)
+            records = len(parse_test_cases(text))
+            t_new = timed(parse_test_cases, text)
+            per_kb = t_new * 1e6 / (len(text) / 1024)
+            if len(text) <= LEGACY_MAX_BYTES:
+                legacy = timed_legacy(text)
+            else:
+                legacy = "skipped"
+            print(f"{name:<12}{len(text):>10}{records:>9}{t_new * 1000:>12.1f}{per_kb:>8.1f}{legacy:>12}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Headless benchmark of the "generate test cases from a document" flow.
+
+Runs the same steps as user_dashboard, without Streamlit:
+
+    extract -> context (retrieval) -> generate (LLM gateway) -> parse
+            -> save (one batch POST skipping duplicates as the app does, and per-row POSTs)
+            -> deploy (backend -> Azure DevOps)
+
+The LLM is a fake provider behind the real LLMGateway, with configurable
+latency and output size. The backend is the real app started under uvicorn
+on a temporary SQLite database (or DATABASE_URL), with deploys going to the
+Azure DevOps stub from backend/benchmarks. Prints time, Python allocation
+peak (tracemalloc) and RSS per stage for each document size.
+
+    python benchmarks/bench_pipeline.py [--pages 10 100 1000] [--format md|pdf|docx]
+                                        [--llm-latency-ms 2000] [--cases-per-page 1]
+
+pdf / docx documents need pymupdf / python-docx (see requirements.txt);
+without them use --format md. tracemalloc slows the Python stages down;
+pass --no-tracemalloc for timings only.
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import requests
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BACKEND_BENCHMARKS = os.path.join(HERE, "..", "..", "backend", "benchmarks")
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/pipeline.db"
+sys.path.insert(0, BACKEND_BENCHMARKS)
+
+# Before the frontend directory goes on sys.path: its app.py would shadow the backend's app package
+from azure_devops_stub import start_stub  # noqa: E402
+from loadtest import _free_port, start_server  # noqa: E402
+
+sys.path.insert(0, os.path.join(HERE, ".."))
+
+from config import CONTEXT_TOKEN_BUDGET  # noqa: E402
+from documents import extract_text  # noqa: E402
+from llm_gateway import BULK, LLMGateway  # noqa: E402
+from retrieval import estimate_tokens, get_document_index  # noqa: E402
+from testcase_parser import parse_test_cases  # noqa: E402
+
+PROMPT = "generate test cases for the appointment booking requirements"
+FEATURES = ["appointment booking", "patient registration", "lab results", "prescription renewal",
+            "billing refunds", "insurance claims", "discharge summaries", "login lockout"]
+
+
+# ---------- Inputs ----------
+def page_text(i):
+    feature = FEATURES[i % len(FEATURES)]
+    lines = [f"Section {i + 1}: {feature.title()}", ""]
+    for r in range(12):
+        lines.append(
+            f"REQ-{i + 1:04d}-{r + 1:02d}: The system shall allow an authorised user to manage {feature} "
+            f"records, validate mandatory fields, and record an audit entry for every change ({r})."
+        )
+    return "\n".join(lines)
+
+
+def build_document(pages, fmt):
+    if fmt == "md":
+        return "\n\n".join(page_text(i) for i in range(pages)).encode("utf-8")
+    if fmt == "pdf":
+        import fitz
+        doc = fitz.open()
+        for i in range(pages):
+            doc.new_page().insert_textbox(fitz.Rect(40, 40, 555, 800), page_text(i), fontsize=8)
+        return doc.tobytes()
+    if fmt == "docx":
+        import docx
+        doc = docx.Document()
+        for i in range(pages):
+            for line in page_text(i).split("\n"):
+                doc.add_paragraph(line)
+            doc.add_page_break()
+        buf = io.BytesIO()
+        doc.save(buf)
+        return buf.getvalue()
+    raise ValueError(fmt)
+
+
+def fake_provider(latency_ms, output_cases, tokens_per_second):
+    """Provider returning output_cases test cases after latency_ms plus generation time."""
+    def call(model_name, prompt, safety_settings):
+        blocks = []
+        for i in range(output_cases):
+            feature = FEATURES[i % len(FEATURES)]
+            blocks.append(
+                f"Test Case ID: TC_{i + 1:05d}\n"
+                f"Description: Verify that an authorised user can manage {feature} records ({i})\n"
+                f"Steps: 1. Log in 2. Open {feature} 3. Create a record 4. Save\n"
+                f"Expected Result: The {feature} record is saved and an audit entry is written\n"
+                f"Priority: {('High', 'Medium', 'Low')[i % 3]}"
+            )
+        text = "\n\n".join(blocks)
+        time.sleep(latency_ms / 1000 + estimate_tokens(text) / tokens_per_second)
+        return text
+    return call
+
+
+# ---------- Measurement ----------
+def rss_mb(pid="self"):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float("nan")
+
+
+class Stages:
+    def __init__(self, trace, server_pid):
+        self.trace = trace
+        self.server_pid = server_pid
+        self.rows = []
+
+    def run(self, name, fn, *args, **kwargs):
+        if self.trace:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        peak = (tracemalloc.get_traced_memory()[1] - base) / 2**20 if self.trace else float("nan")
+        self.rows.append((name, elapsed, peak, rss_mb(), rss_mb(self.server_pid)))
+        return result
+
+    def print(self, title):
+        total = sum(r[1] for r in self.rows if "for reference" not in r[0])
+        print(f"\n{title}")
+        print(f"  {'stage':28s} {'seconds':>9s} {'py peak MB':>11s} {'client RSS':>11s} {'server RSS':>11s}")
+        for name, elapsed, peak, rss, server_rss in self.rows:
+            print(f"  {name:28s} {elapsed:9.3f} {peak:11.1f} {rss:11.1f} {server_rss:11.1f}")
+        print(f"  {'total (as the app does it)':28s} {total:9.3f}")
+
+
+# ---------- Backend ----------
+class Backend:
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+        token = self.session.post(f"{url}/token", data={"username": "admin", "password": "admin123"}).json()
+        self.admin = {"Authorization": f"Bearer {token['access_token']}"}
+
+    def new_project(self, name):
+        """Project with a fresh member (a user can only belong to one project). Returns (id, headers)."""
+        s, url = self.session, self.url
+        project = s.post(f"{url}/projects", json={"name": name, "organization": "bench-org", "pat": "bench-pat"}).json()
+        user = s.post(f"{url}/users", json={"username": name, "password": "password"}, headers=self.admin).json()
+        s.post(f"{url}/projects/{project['id']}/users/assign", json={"user_ids": [user["id"]]},
+               headers=self.admin).raise_for_status()
+        token = s.post(f"{url}/token", data={"username": name, "password": "password"}).json()
+        return project["id"], {"Authorization": f"Bearer {token['access_token']}"}
+
+    def save_per_row(self, project_id, headers, parsed):
+        for tc in parsed:
+            self.session.post(f"{self.url}/projects/{project_id}/testcases", json=tc, headers=headers).raise_for_status()
+
+    def save_batch(self, project_id, headers, parsed):
+        r = self.session.post(f"{self.url}/projects/{project_id}/testcases/batch",
+                              json={"creates": parsed, "skip_duplicates": True}, headers=headers)
+        r.raise_for_status()
+        return r.json()
+
+    def deploy(self, project_id):
+        r = self.session.post(f"{self.url}/deploy_testcases", json={
+            "project_id": project_id, "organization": "bench-org", "project_name": "bench", "pat": "bench-pat",
+        }, timeout=3600)
+        r.raise_for_status()
+        return r.json()["results"]
+
+
+def run_pipeline(pages, args, backend, server_pid, stub):
+    stages = Stages(not args.no_tracemalloc, server_pid)
+    data = build_document(pages, args.format)
+    gateway = LLMGateway(
+        fake_provider(args.llm_latency_ms, pages * args.cases_per_page, args.llm_tokens_per_second),
+        requests_per_minute=600, burst=10,
+    )
+    project_id, headers = backend.new_project(f"pipeline-{pages}-{time.time_ns()}")
+    reference_project, reference_headers = backend.new_project(f"pipeline-reference-{pages}-{time.time_ns()}")
+
+    text = stages.run("extract", extract_text, io.BytesIO(data), args.format)
+    index = stages.run("index document", get_document_index, text)
+    context = stages.run("select context", index.select_context, PROMPT, CONTEXT_TOKEN_BUDGET)
+    prompt = (
+        "You are an AI specialized in generating structured test cases.\n"
+        "Test Case ID: <ID>\nDescription: <Description>\nSteps: <Steps>\n"
+        "Expected Result: <Result>\nPriority: <Priority>\n\n"
+        f"Document Content: {context}\nUser Query: \"{PROMPT}\""
+    )
+    output = stages.run("generate (fake LLM)", gateway.generate, prompt, project_id=project_id, priority=BULK)
+    parsed = stages.run("parse", parse_test_cases, output)
+    saved = stages.run("save (batch)", backend.save_batch, project_id, headers, parsed)
+    stages.run("save (per-row, for reference)", backend.save_per_row, reference_project, reference_headers, parsed)
+    sent_before = len(stub.received)
+    results = stages.run("deploy", backend.deploy, project_id)
+
+    deployed = sum(r["status"] == "deployed" for r in results)
+    stages.print(
+        f"{pages} pages ({len(data) / 2**20:.1f} MB {args.format}, {len(text)} chars, "
+        f"{estimate_tokens(context)} context tokens) -> {len(parsed)} test cases "
+        f"({len(saved['duplicates'])} duplicates skipped), "
+        f"{deployed}/{len(stub.received) - sent_before} deployed"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--format", choices=["md", "pdf", "docx"], default="md")
+    parser.add_argument("--llm-latency-ms", type=float, default=2000.0, help="time to first token")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=2000.0, help="output speed")
+    parser.add_argument("--cases-per-page", type=int, default=1, help="test cases the fake LLM returns per page")
+    parser.add_argument("--stub-latency-ms", type=float, default=20.0, help="Azure DevOps response time")
+    parser.add_argument("--no-tracemalloc", action="store_true")
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub(latency_ms=args.stub_latency_ms)
+    proc, url = start_server(_free_port(), {
+        "AZURE_DEVOPS_URL": stub_url,
+        "LOG_LEVEL": "WARNING",
+        "PROFILE_DIR": os.path.join(tempfile.gettempdir(), "pipeline_profiles"),
+        "SLOW_QUERY_LOG": os.path.join(tempfile.gettempdir(), "pipeline_slow_queries.log"),
+    })
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    try:
+        backend = Backend(url)
+        for pages in args.pages:
+            run_pipeline(pages, args, backend, proc.pid, stub)
+    finally:
+        proc.terminate()
+        proc.wait(10)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for the chat command context on a 10k test case project.
+
+Compares the old prompt (every test case's id / Test Case ID / Description)
+with the top-k candidates from TestCaseIndex, and times the initial index
+build, an incremental sync after a few edits and the per-instruction lookup.
+
+    python benchmarks/bench_testcase_context.py [num_testcases] [top_k]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from retrieval import TestCaseIndex, estimate_tokens  # noqa: E402
+
+AREAS = ["billing refund", "appointment reminder", "patient registration", "lab result",
+         "discharge summary", "prescription renewal", "insurance claim", "login lockout"]
+ACTIONS = ["verify", "reject", "cancel", "update", "audit", "export", "notify", "retry"]
+INSTRUCTIONS = [
+    "delete the test cases about insurance claim export",
+    "modify the discharge summary audit case priority to High",
+    "change 1234 Priority to Low",
+    "remove duplicate billing refund cancel tests",
+]
+
+
+def make_testcases(n, rng):
+    out = []
+    for i in range(1, n + 1):
+        area, action = rng.choice(AREAS), rng.choice(ACTIONS)
+        out.append({
+            "id": i,
+            "Test Case ID": f"TC_{i:05d}",
+            "Description": f"{action.capitalize()} {area} for patient {rng.randint(1, 500)}",
+            "Steps": f"1. Open {area}\n2. {action} it\n3. Check the audit log",
+            "Expected Result": f"{area} is {action}ed",
+            "Priority": rng.choice(["High", "Medium", "Low"]),
+        })
+    return out
+
+
+def prompt_rows(testcases):
+    return str([{"id": tc["id"], "Test Case ID": tc["Test Case ID"], "Description": tc["Description"]}
+                for tc in testcases])
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(0)
+    testcases = make_testcases(n, rng)
+
+    full_tokens = estimate_tokens(prompt_rows(testcases))
+
+    index = TestCaseIndex()
+    start = time.perf_counter()
+    index.sync(testcases)
+    build_ms = (time.perf_counter() - start) * 1000
+
+    # A teammate edits 10 rows, deletes 5 and adds 5
+    for tc in rng.sample(testcases, 10):
+        tc["Description"] += " (edited)"
+    del testcases[:5]
+    testcases.extend(make_testcases(5, rng))
+    for j, tc in enumerate(testcases[-5:]):
+        tc["id"] = n + 1 + j
+    start = time.perf_counter()
+    index.sync(testcases)
+    resync_ms = (time.perf_counter() - start) * 1000
+
+    print(f"test cases: {n}, top_k: {k}")
+    print(f"index build: {build_ms:.1f} ms, incremental sync (20 changes): {resync_ms:.1f} ms")
+    print(f"{'instruction':<60}{'old tokens':>12}{'new tokens':>12}{'lookup ms':>11}")
+    for instruction in INSTRUCTIONS:
+        start = time.perf_counter()
+        rows = index.top_k(instruction, k)
+        lookup_ms = (time.perf_counter() - start) * 1000
+        print(f"{instruction:<60}{full_tokens:>12}{estimate_tokens(prompt_rows(rows)):>12}{lookup_ms:>11.2f}")
+
+
+if __name__ == "__main__":
+    main()
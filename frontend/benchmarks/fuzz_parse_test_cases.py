@@ -0,0 +1,78 @@
+"""
+Fuzzer for parse_test_cases.
+
+Takes the samples in benchmarks/corpus, mutates them at random (truncation,
+duplication, dropped / shuffled lines, stray markdown) and checks that the
+parser never raises, always returns well-shaped records and stays within a
+linear time budget.
+
+    python benchmarks/fuzz_parse_test_cases.py [iterations] [seed]
+"""
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from testcase_parser import FIELDS, parse_test_cases  # noqa: E402
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+NOISE = ["**", "__", "- ", "* ", ":", "\n", "\n\n", "Priority:", "Test Case ID:", "Steps**:", "1. ", "#"]
+# Generous per-byte budget; the old regex needed seconds for a few hundred KB
+MAX_SECONDS_PER_MB = 2.0
+MAX_INPUT_BYTES = 4_000_000
+
+
+def mutate(rng, text):
+    lines = text.splitlines()
+    op = rng.randrange(6)
+    if op == 0 and lines:
+        lines = lines[: rng.randrange(len(lines))]
+    elif op == 1 and len(text) * 200 <= MAX_INPUT_BYTES:
+        lines = lines * rng.randint(2, 200)
+    elif op == 2 and lines:
+        del lines[rng.randrange(len(lines))]
+    elif op == 3:
+        rng.shuffle(lines)
+    elif op == 4 and lines:
+        i = rng.randrange(len(lines))
+        pos = rng.randrange(len(lines[i]) + 1)
+        lines[i] = lines[i][:pos] + rng.choice(NOISE) + lines[i][pos:]
+    else:
+        lines = ["\n".join(lines)[: rng.randrange(len(text) + 1)]]
+    return "\n".join(lines)
+
+
+def check(text):
+    start = time.perf_counter()
+    records = parse_test_cases(text)
+    elapsed = time.perf_counter() - start
+    assert isinstance(records, list)
+    for r in records:
+        assert list(r.keys()) == FIELDS, r
+        assert all(isinstance(v, str) for v in r.values()), r
+        assert any(r.values()), r
+    budget = max(0.05, MAX_SECONDS_PER_MB * len(text) / 1e6)
+    assert elapsed <= budget, f"{len(text)} bytes took {elapsed:.3f}s"
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 0
+    rng = random.Random(seed)
+    corpus = [open(p, encoding="utf-8").read() for p in sorted(glob.glob(os.path.join(CORPUS_DIR, "*.txt")))]
+
+    for text in corpus:
+        check(text)
+    for _ in range(iterations):
+        text = rng.choice(corpus)
+        for _ in range(rng.randint(1, 4)):
+            text = mutate(rng, text)
+        check(text)
+    print(f"✅ {iterations} fuzz cases passed (seed={seed}, corpus={len(corpus)} files)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+
+import requests
+
+import api_client as api
+from config import API_URL
+
+# ---------- Test Case Change Feed ----------
+# One background thread per (project, token) keeps a local copy of the
+# project's test cases: a full snapshot once, then small create / update /
+# delete diffs from GET /projects/{id}/events (Server-Sent Events), resuming
+# with Last-Event-ID after reconnects. Reruns read the local copy instead of
+# downloading the whole list again.
+
+IDLE_TIMEOUT = 300      # stop following a project nobody has looked at for this long
+OWN_WRITE_WAIT = 0.5    # how long snapshot() waits for the event of our own write
+RECONNECT_DELAY = 2
+
+
+class ProjectFeed:
+    def __init__(self, project_id, headers):
+        self.project_id = project_id
+        self.headers = {"Authorization": headers.get("Authorization", "")}
+        self.testcases = {}
+        self.last_event_id = None
+        self.ready = False
+        self.stopped = False
+        self.last_access = time.monotonic()
+        self.last_event_at = 0.0
+        self.expect_event_after = 0.0
+        self.cond = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name=f"feed-{project_id}", daemon=True)
+        self.thread.start()
+
+    # --- used by the app ---
+    def snapshot(self):
+        """
+        Current test cases (API shape, oldest first), or None if the feed
+        isn't ready yet and the caller should fetch the list itself.
+        """
+        with self.cond:
+            self.last_access = time.monotonic()
+            if self.expect_event_after > self.last_event_at:
+                self.cond.wait_for(lambda: self.last_event_at >= self.expect_event_after, OWN_WRITE_WAIT)
+                self.expect_event_after = 0.0
+            if not self.ready:
+                return None
+            return [{**tc, "test_case": dict(tc.get("test_case") or {})}
+                    for _, tc in sorted(self.testcases.items())]
+
+    def expect_own_write(self):
+        with self.cond:
+            self.expect_event_after = time.monotonic()
+
+    # --- background thread ---
+    def _load_snapshot(self):
+        r = api.get(f"/projects/{self.project_id}/testcases", headers=self.headers, ttl=0)
+        if r.status_code in (401, 403):
+            self.stopped = True
+            return
+        r.raise_for_status()
+        with self.cond:
+            self.testcases = {tc["id"]: tc for tc in r.json()}
+            self.last_event_id = r.headers.get("X-Event-ID", "0")
+            self.ready = True
+            self.last_event_at = time.monotonic()
+            self.cond.notify_all()
+
+    def _apply(self, event_type, event_id, data):
+        with self.cond:
+            if event_type == "reset":
+                self.ready = False
+            elif event_type in ("create", "update"):
+                self.testcases[data["id"]] = data
+            elif event_type == "delete":
+                self.testcases.pop(data["id"], None)
+            if event_id:
+                self.last_event_id = event_id
+            self.last_event_at = time.monotonic()
+            self.cond.notify_all()
+
+    def _idle(self):
+        return time.monotonic() - self.last_access > IDLE_TIMEOUT
+
+    def _follow(self):
+        url = f"{API_URL}/projects/{self.project_id}/events"
+        headers = {**self.headers, "Last-Event-ID": self.last_event_id or "0"}
+        with requests.get(url, headers=headers, stream=True, timeout=(5, 60)) as resp:
+            if resp.status_code in (401, 403):
+                self.stopped = True
+                return
+            resp.raise_for_status()
+            event_type, event_id, data = None, None, []
+            for line in resp.iter_lines(decode_unicode=True):
+                if self._idle():
+                    return
+                if line.startswith(":"):
+                    continue
+                if not line:
+                    if event_type:
+                        self._apply(event_type, event_id, json.loads("\n".join(data) or "{}"))
+                        if event_type == "reset":
+                            return
+                    event_type, event_id, data = None, None, []
+                    continue
+                field, _, value = line.partition(":")
+                value = value[1:] if value.startswith(" ") else value
+                if field == "event":
+                    event_type = value
+                elif field == "id":
+                    event_id = value
+                elif field == "data":
+                    data.append(value)
+
+    def _run(self):
+        while not self.stopped and not self._idle():
+            try:
+                if not self.ready:
+                    self._load_snapshot()
+                    continue
+                self._follow()
+            except Exception as e:
+                print(f"Warning: change feed for project {self.project_id} interrupted: {e}")
+                time.sleep(RECONNECT_DELAY)
+        self.stopped = True
+
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+
+
+def get_project_feed(project_id, headers):
+    """Return the running feed for this project and token, starting one if needed."""
+    key = (project_id, headers.get("Authorization", ""))
+    with _feeds_lock:
+        feed = _feeds.get(key)
+        if feed is None or feed.stopped:
+            feed = _feeds[key] = ProjectFeed(project_id, headers)
+        return feed
+
+
+def _on_mutation(path):
+    # Called just before our own write to a project's test cases: the next
+    # snapshot() waits briefly for the matching event so the rerun shows it
+    parts = path.strip("/").split("/")
+    if len(parts) >= 3 and parts[0] == "projects" and parts[2] == "testcases":
+        with _feeds_lock:
+            feeds = [f for (pid, _), f in _feeds.items() if str(pid) == parts[1]]
+        for feed in feeds:
+            feed.expect_own_write()
+
+
+api.add_mutation_listener(_on_mutation)
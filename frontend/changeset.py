@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# ---------- Data Editor Change Set ----------
+# Vectorized diff between the grid we showed and what st.data_editor returned.
+# Produces the payload for POST /projects/{id}/testcases/batch with only the
+# fields that actually changed.
+
+
+def _clean(value):
+    # NaN / NA can't be sent as JSON
+    return None if pd.isna(value) else value
+
+
+def compute_changes(original_df, edited_df, fields, id_col="id"):
+    """
+    Return {"delete_ids": [...], "updates": [{"id", "fields"}], "creates": [{...}]}.
+
+    Rows are matched on id_col; rows without an id in edited_df are new.
+    A cell counts as changed unless both sides are equal or both are empty.
+    """
+    orig = original_df[original_df[id_col].notna()]
+    edit = edited_df[edited_df[id_col].notna()]
+    orig = orig.set_index(orig[id_col].astype(np.int64))[fields]
+    edit = edit.set_index(edit[id_col].astype(np.int64))[fields]
+
+    delete_ids = orig.index.difference(edit.index).tolist()
+
+    common = orig.index.intersection(edit.index)
+    a = orig.loc[common].astype(object).to_numpy()
+    b = edit.loc[common].astype(object).to_numpy()
+    a_na = pd.isna(a)
+    b_na = pd.isna(b)
+    changed = (a != b) & ~(a_na & b_na)
+    changed |= a_na ^ b_na
+
+    updates = []
+    rows, cols = np.nonzero(changed)
+    if len(rows):
+        ids = common.to_numpy()
+        # np.nonzero walks row by row, so each row's changed columns are contiguous
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        ends = np.r_[starts[1:], len(rows)]
+        for s, e in zip(starts, ends):
+            r = rows[s]
+            updates.append({
+                "id": int(ids[r]),
+                "fields": {fields[c]: _clean(b[r, c]) for c in cols[s:e]},
+            })
+
+    new_rows = edited_df[edited_df[id_col].isna()][fields]
+    creates = [
+        {k: _clean(v) for k, v in row.items()}
+        for row in new_rows.to_dict("records")
+    ]
+    creates = [c for c in creates if any(v is not None and v != "" for v in c.values())]
+
+    return {"delete_ids": [int(i) for i in delete_ids], "updates": updates, "creates": creates}
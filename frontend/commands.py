@@ -0,0 +1,123 @@
+import re
+
+from testcase_parser import FIELDS, id_number
+
+# ---------- Local Command Interpreter ----------
+# Deterministic grammar for the simple chat commands, so they don't need an
+# LLM round trip just to be turned into DELETE / MODIFY instructions:
+#
+#   delete 42            delete 10-25          remove 3, 5 and 7
+#   delete test case #42 modify 17 Priority to High
+#   set 10-12 priority = Low                  change tc 8 Description: New text
+#
+# The numbers are the ones users see in the "Test Case ID" column (delete 5
+# means TC_005), not database ids, which the data editor hides. A number that
+# matches no loaded row, or more than one, sends the message to the LLM.
+
+MAX_IDS = 5000  # refuse absurd ranges like "delete 1-99999999"
+
+_FIELD_ALT = "|".join(re.escape(f) for f in sorted(FIELDS, key=len, reverse=True))
+_TARGET = r"(?:test\s*cases?|tcs?|ids?)?[\s_]*"
+
+_DELETE_RE = re.compile(rf"^(?:delete|remove|del)\s+{_TARGET}(?P<ids>[#\d][#\d,\s\-–]*(?:\s+and\s+[#\d][#\d,\s\-–]*)*)$", re.I)
+_MODIFY_RE = re.compile(
+    rf"^(?:modify|change|update|set|edit)\s+{_TARGET}(?P<ids>[#\d][#\d,\s\-–]*?)\s+"
+    rf"(?P<field>{_FIELD_ALT})\s*(?:to|=|:)\s*(?P<value>.+)$",
+    re.I | re.S,
+)
+_RANGE_RE = re.compile(r"\s*[-–]\s*")
+_FIELD_NAMES = {f.lower(): f for f in FIELDS}
+
+
+def parse_ids(text):
+    """Expand "10-12, 15 and 20" into [10, 11, 12, 15, 20]. Returns None if anything is off."""
+    text = _RANGE_RE.sub("-", re.sub(r"\band\b", ",", text, flags=re.I))
+    ids = []
+    for token in re.split(r"[,\s]+", text.strip()):
+        if not token:
+            continue
+        start, _, end = token.replace("#", "").partition("-")
+        if not start.isdigit() or (end and not end.isdigit()):
+            return None
+        lo, hi = int(start), int(end or start)
+        if hi < lo or len(ids) + hi - lo + 1 > MAX_IDS:
+            return None
+        ids.extend(range(lo, hi + 1))
+    return list(dict.fromkeys(ids)) or None
+
+
+def resolve_ids(numbers, testcases):
+    """
+    Map Test Case ID numbers to database ids using the loaded rows
+    (dicts with "id" and "Test Case ID"). Returns None if a number matches
+    no row or several, or if numbers is None.
+    """
+    if not numbers:
+        return None
+    by_number = {}
+    for tc in testcases:
+        number = id_number(tc.get("Test Case ID"))
+        if number is not None and tc.get("id") is not None:
+            by_number.setdefault(number, []).append(tc["id"])
+    ids = []
+    for number in numbers:
+        matches = by_number.get(number, [])
+        if len(matches) != 1:
+            return None
+        ids.append(matches[0])
+    return list(dict.fromkeys(ids))
+
+
+def parse_command(message, testcases):
+    """
+    Match a chat message against the local grammar, resolving the numbers it
+    names against the "Test Case ID" of the project's loaded test cases.
+
+    Returns the payload for POST /projects/{id}/testcases/batch, i.e.
+    {"delete_ids": [...], "updates": [{"id": ..., "fields": {...}}]},
+    or None if the message isn't a simple command, or names a test case that
+    can't be resolved unambiguously, and should go to the LLM.
+    """
+    message = (message or "").strip().rstrip(".!")
+
+    m = _DELETE_RE.match(message)
+    if m:
+        ids = resolve_ids(parse_ids(m.group("ids")), testcases)
+        if ids:
+            return {"delete_ids": ids, "updates": []}
+        return None
+
+    m = _MODIFY_RE.match(message)
+    if m:
+        ids = resolve_ids(parse_ids(m.group("ids")), testcases)
+        value = m.group("value").strip().strip("\"'")
+        if ids and value:
+            field = _FIELD_NAMES[m.group("field").lower()]
+            return {"delete_ids": [], "updates": [{"id": i, "fields": {field: value}} for i in ids]}
+    return None
+
+
+def _format_ids(ids, labels):
+    names = [str(labels.get(i) or i) for i in ids]
+    if len(names) <= 10:
+        return ", ".join(names)
+    return f"{', '.join(names[:10])} and {len(names) - 10} more"
+
+
+def describe_result(command, result, testcases=()):
+    """
+    Chat message summarising a batch result returned by the backend. Test
+    cases are named by their "Test Case ID" where the loaded rows have one.
+    """
+    labels = {tc.get("id"): tc.get("Test Case ID") for tc in testcases}
+    parts = []
+    if result.get("created"):
+        parts.append(f"I have added test case(s) {_format_ids(result['created'], labels)}.")
+    if result.get("deleted"):
+        parts.append(f"I have successfully deleted test case(s) {_format_ids(result['deleted'], labels)}.")
+    if result.get("updated"):
+        fields = sorted({f for u in command["updates"] for f in u["fields"]})
+        parts.append(f"I've updated the '{', '.join(fields)}' for test case(s) {_format_ids(result['updated'], labels)}.")
+    if result.get("not_found"):
+        parts.append(f"I couldn't find test case(s) {_format_ids(result['not_found'], labels)} in this project.")
+    return " ".join(parts) or "Nothing to change."
@@ -1,5 +1,27 @@
 import os
 
+# Backend API
+API_URL = os.getenv("API_URL", "http://localhost:8000")
+API_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", "5")), float(os.getenv("API_READ_TIMEOUT", "60")))
+API_GET_TTL = float(os.getenv("API_GET_TTL", "10"))  # seconds a GET response is reused, 0 disables
+
 GENAI_PROJECT = os.getenv("GOOGLE_CLOUD_PROJECT")
 GENAI_LOCATION = os.getenv("VERTEX_LOCATION")
 GENAI_API_KEY = os.getenv("GOOGLE_API_KEY")  # from Google Cloud credentials
+
+# Max tokens of document context sent with a "generate test cases" prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "5000"))
+
+# Max test cases sent as context with a chat command
+CHAT_CONTEXT_TOP_K = int(os.getenv("CHAT_CONTEXT_TOP_K", "50"))
+
+# Shared LLM gateway
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-2.5-pro")
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_BURST = int(os.getenv("LLM_BURST", "5"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_PROJECT_TOKEN_BUDGET = int(os.getenv("LLM_PROJECT_TOKEN_BUDGET", "0"))  # 0 = unlimited
+LLM_BUDGET_WINDOW_SECONDS = int(os.getenv("LLM_BUDGET_WINDOW_SECONDS", "3600"))
+
+# Keep test case lists up to date from the backend's SSE change feed
+CHANGE_FEED_ENABLED = os.getenv("CHANGE_FEED_ENABLED", "1") == "1"
@@ -0,0 +1,20 @@
+# ---------- Document Text Extraction ----------
+# Plain text of an uploaded requirements document. The parsers are imported
+# lazily so modules that only need one format don't pay for the others.
+
+SUPPORTED_TYPES = ("pdf", "docx", "md")
+
+
+def extract_text(file, ftype):
+    """Text of a file-like object of type "pdf", "docx" or "md" ("" for anything else)."""
+    if ftype == "pdf":
+        import fitz  # PyMuPDF
+        doc = fitz.open(stream=file.read(), filetype="pdf")
+        return "".join([page.get_text("text") for page in doc])
+    elif ftype == "docx":
+        import docx  # python-docx
+        doc = docx.Document(file)
+        return "\n".join([p.text for p in doc.paragraphs])
+    elif ftype == "md":
+        return file.read().decode("utf-8")
+    return ""
@@ -0,0 +1,258 @@
+import hashlib
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from retrieval import estimate_tokens
+
+# ---------- LLM Gateway ----------
+# One process-wide gateway that every LLM call goes through, shared by all
+# Streamlit sessions. It provides:
+#   - a token-bucket rate limit on upstream calls
+#   - a per-project token budget
+#   - coalescing of identical in-flight prompts into one upstream call
+#   - priority queues (interactive chat before bulk generation)
+#   - queue / latency metrics
+
+INTERACTIVE = 0
+BULK = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BULK: "bulk"}
+
+
+class LLMGatewayError(Exception):
+    """Raised when the gateway refuses a request (budget, queue full, timeout)."""
+
+
+class TokenBudgetExceeded(LLMGatewayError):
+    pass
+
+
+class GatewayBusy(LLMGatewayError):
+    pass
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available, return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def release(self):
+        """Give back a token that was acquired but not used."""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class ProjectBudget:
+    """Token allowance per project over a fixed window (e.g. per hour)."""
+
+    def __init__(self, tokens_per_window, window_seconds):
+        self.limit = tokens_per_window
+        self.window = window_seconds
+        self.usage = {}
+        self.lock = threading.Lock()
+
+    def _current(self, project_id):
+        start, used = self.usage.get(project_id, (0.0, 0))
+        now = time.monotonic()
+        if now - start >= self.window:
+            start, used = now, 0
+            self.usage[project_id] = (start, used)
+        return start, used
+
+    def check(self, project_id, tokens):
+        if not self.limit or project_id is None:
+            return
+        with self.lock:
+            _, used = self._current(project_id)
+            if used + tokens > self.limit:
+                raise TokenBudgetExceeded(
+                    f"Project token budget exhausted ({used}/{self.limit} tokens used), please try again later."
+                )
+
+    def charge(self, project_id, tokens):
+        if project_id is None:
+            return
+        with self.lock:
+            start, used = self._current(project_id)
+            self.usage[project_id] = (start, used + tokens)
+
+    def used(self, project_id):
+        with self.lock:
+            return self._current(project_id)[1]
+
+
+def gemini_provider(api_key):
+    """Provider that calls Google Gemini. genai.configure runs once per process."""
+    import google.generativeai as genai
+
+    genai.configure(api_key=api_key)
+    models = {}
+
+    def call(model_name, prompt, safety_settings):
+        model = models.get(model_name)
+        if model is None:
+            model = models[model_name] = genai.GenerativeModel(model_name)
+        response = model.generate_content(prompt, safety_settings=safety_settings)
+        return response.text  # ValueError if the response was blocked
+
+    return call
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+class LLMGateway:
+    """
+    provider(model_name, prompt, safety_settings) -> str does the actual call.
+    Callers use generate(), which blocks until the (possibly shared) result is ready.
+    """
+
+    def __init__(self, provider, model="gemini-2.5-pro", requests_per_minute=30, burst=5,
+                 max_concurrency=4, project_token_budget=0, budget_window_seconds=3600, max_queue=100):
+        self.provider = provider
+        self.model = model
+        self.bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.budget = ProjectBudget(project_token_budget, budget_window_seconds)
+        self.max_queue = max_queue
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        self._queued = {p: 0 for p in PRIORITY_NAMES}
+        self._running = 0
+        self._counters = {"requests": 0, "upstream_calls": 0, "coalesced": 0, "rejected": 0, "errors": 0}
+        self._latency = deque(maxlen=500)
+        self._queue_wait = {p: deque(maxlen=500) for p in PRIORITY_NAMES}
+
+        for i in range(max_concurrency):
+            threading.Thread(target=self._worker, name=f"llm-gateway-{i}", daemon=True).start()
+
+    def generate(self, prompt, project_id=None, priority=INTERACTIVE, safety_settings=None, model=None, timeout=300):
+        model = model or self.model
+        settings = json.dumps(safety_settings, sort_keys=True, default=str)
+        key = hashlib.sha256(f"{model}\0{settings}\0{prompt}".encode("utf-8")).hexdigest()
+
+        with self._lock:
+            self._counters["requests"] += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._counters["coalesced"] += 1
+            else:
+                try:
+                    self.budget.check(project_id, estimate_tokens(prompt))
+                    if sum(self._queued.values()) >= self.max_queue:
+                        raise GatewayBusy("The AI service is busy right now, please try again in a moment.")
+                except LLMGatewayError:
+                    self._counters["rejected"] += 1
+                    raise
+                future = Future()
+                self._inflight[key] = future
+                self._queued[priority] += 1
+                self._queue.put((priority, next(self._seq), time.monotonic(),
+                                 key, model, prompt, safety_settings, project_id, future))
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            raise GatewayBusy("The AI service took too long to respond, please try again.")
+
+    def _worker(self):
+        while True:
+            # Take the rate-limit token only once there is work, so idle workers
+            # don't sit on tokens while the bucket refills behind them
+            item = self._queue.get()
+            if self.bucket.acquire():
+                # We waited: pick again, something more urgent may have arrived
+                self._queue.put(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:     # another worker took it meanwhile
+                    self.bucket.release()
+                    continue
+            priority, _, enqueued, key, model, prompt, safety_settings, project_id, future = item
+            with self._lock:
+                self._queued[priority] -= 1
+                self._running += 1
+                self._counters["upstream_calls"] += 1
+                self._queue_wait[priority].append(time.monotonic() - enqueued)
+
+            start = time.monotonic()
+            try:
+                text = self.provider(model, prompt, safety_settings)
+                self.budget.charge(project_id, estimate_tokens(prompt) + estimate_tokens(text or ""))
+                future.set_result(text)
+            except Exception as e:
+                with self._lock:
+                    self._counters["errors"] += 1
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    self._latency.append(time.monotonic() - start)
+                    self._running -= 1
+                    self._inflight.pop(key, None)
+
+    def metrics(self):
+        with self._lock:
+            latency = list(self._latency)
+            return {
+                **self._counters,
+                "queued": {PRIORITY_NAMES[p]: n for p, n in self._queued.items()},
+                "running": self._running,
+                "inflight_prompts": len(self._inflight),
+                "latency_p50_s": _percentile(latency, 50),
+                "latency_p95_s": _percentile(latency, 95),
+                "queue_wait_p95_s": {PRIORITY_NAMES[p]: _percentile(list(w), 95) for p, w in self._queue_wait.items()},
+            }
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    """Return the process-wide gateway, creating it from config on first use."""
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                import config
+                _gateway = LLMGateway(
+                    gemini_provider(config.GENAI_API_KEY),
+                    model=config.LLM_MODEL,
+                    requests_per_minute=config.LLM_REQUESTS_PER_MINUTE,
+                    burst=config.LLM_BURST,
+                    max_concurrency=config.LLM_MAX_CONCURRENCY,
+                    project_token_budget=config.LLM_PROJECT_TOKEN_BUDGET,
+                    budget_window_seconds=config.LLM_BUDGET_WINDOW_SECONDS,
+                )
+    return _gateway
@@ -0,0 +1,286 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+from testcase_parser import id_number
+
+# ---------- Retrieval ----------
+# Small BM25 index used to pick the parts of a requirements document that are
+# relevant to the user's query, instead of sending the first N characters.
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into",
+    "is", "it", "of", "on", "or", "that", "the", "this", "to", "with", "will",
+    "shall", "should", "must", "can", "all", "any", "me", "my", "i", "we", "you",
+}
+
+# Words that only say "what to do", not "what about" — ignored in queries
+QUERY_STOPWORDS = STOPWORDS | {
+    "generate", "create", "make", "write", "give", "please", "test", "tests",
+    "testcase", "testcases", "case", "cases", "some", "more", "new", "file",
+    "document", "doc", "requirements", "based",
+}
+
+CHUNK_CHARS = 1500
+CHUNK_OVERLAP = 200
+CACHE_SIZE = 8
+
+
+def tokenize(text, stopwords=STOPWORDS):
+    return [t for t in _TOKEN_RE.findall((text or "").lower()) if t not in stopwords]
+
+
+def estimate_tokens(text):
+    """Rough token count (~4 characters per token) used for prompt budgets."""
+    return len(text) // 4 + 1
+
+
+class BM25Index:
+    """
+    Inverted-index BM25 that supports incremental add / remove,
+    so it can be kept in sync with data that changes over time.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.doc_len = {}
+        self.doc_terms = {}
+        self.postings = {}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def __contains__(self, doc_id):
+        return doc_id in self.doc_len
+
+    def add(self, doc_id, text):
+        if doc_id in self.doc_len:
+            self.remove(doc_id)
+        tf = Counter(tokenize(text))
+        self.doc_terms[doc_id] = tf
+        self.doc_len[doc_id] = sum(tf.values())
+        self.total_len += self.doc_len[doc_id]
+        for term, count in tf.items():
+            self.postings.setdefault(term, {})[doc_id] = count
+
+    def remove(self, doc_id):
+        tf = self.doc_terms.pop(doc_id, None)
+        if tf is None:
+            return
+        self.total_len -= self.doc_len.pop(doc_id)
+        for term in tf:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(doc_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query, k=10, stopwords=QUERY_STOPWORDS):
+        """Return up to k (doc_id, score) pairs, best first. Empty if nothing matches."""
+        n = len(self.doc_len)
+        if n == 0:
+            return []
+        avg_len = self.total_len / n or 1.0
+        scores = {}
+        for term in set(tokenize(query, stopwords)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n - len(posting) + 0.5) / (len(posting) + 0.5))
+            for doc_id, tf in posting.items():
+                norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / norm
+        ranked = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:k]
+
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS, overlap=CHUNK_OVERLAP):
+    """
+    Split text into chunks of about chunk_chars, preferring paragraph
+    boundaries and carrying a small overlap between chunks.
+    """
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text or "") if p.strip()]
+    chunks, current = [], ""
+    for para in paragraphs:
+        while len(para) > chunk_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(para[:chunk_chars])
+            para = para[chunk_chars - overlap:]
+        if current and len(current) + len(para) + 2 > chunk_chars:
+            chunks.append(current)
+            current = current[-overlap:] + "\n\n" + para if overlap else para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class DocumentIndex:
+    """Chunked BM25 index over one document."""
+
+    def __init__(self, text):
+        self.chunks = chunk_text(text)
+        self.index = BM25Index()
+        for i, chunk in enumerate(self.chunks):
+            self.index.add(i, chunk)
+
+    def select_context(self, query, token_budget):
+        """
+        Return the chunks most relevant to query that fit in token_budget,
+        in document order. If the query has no matching terms (e.g. just
+        "generate test cases"), fall back to the start of the document.
+        """
+        ranked = [i for i, _ in self.index.search(query, k=len(self.chunks))]
+        if not ranked:
+            ranked = range(len(self.chunks))
+
+        picked, used = [], 0
+        for i in ranked:
+            cost = estimate_tokens(self.chunks[i])
+            if used + cost > token_budget:
+                continue
+            picked.append(i)
+            used += cost
+        return "\n...\n".join(self.chunks[i] for i in sorted(picked))
+
+
+_DOC_CACHE = OrderedDict()
+_DOC_CACHE_LOCK = threading.Lock()     # Streamlit sessions run their scripts in separate threads
+
+
+def document_hash(text):
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def get_document_index(text):
+    """Return the DocumentIndex for text, cached per document hash."""
+    key = document_hash(text)
+    with _DOC_CACHE_LOCK:
+        index = _DOC_CACHE.get(key)
+        if index is not None:
+            _DOC_CACHE.move_to_end(key)
+            return index
+    # Built outside the lock; if another session built the same document meanwhile, keep theirs
+    built = DocumentIndex(text)
+    with _DOC_CACHE_LOCK:
+        index = _DOC_CACHE.setdefault(key, built)
+        _DOC_CACHE.move_to_end(key)
+        while len(_DOC_CACHE) > CACHE_SIZE:
+            _DOC_CACHE.popitem(last=False)
+    return index
+
+
+# ---------- Test Case Index ----------
+# Per-project index of test cases used to give the chat model only the
+# candidates relevant to an instruction instead of the whole project.
+
+TESTCASE_FIELDS = ["Test Case ID", "Description", "Steps", "Expected Result"]
+
+# Command words carry no information about which test case is meant
+COMMAND_STOPWORDS = QUERY_STOPWORDS | {
+    "delete", "remove", "modify", "change", "update", "set", "edit", "rename",
+    "id", "ids", "field", "value", "priority", "high", "medium", "low",
+}
+
+_NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def _testcase_text(tc):
+    return "\n".join(str(tc.get(f) or "") for f in TESTCASE_FIELDS)
+
+
+class TestCaseIndex:
+    """
+    BM25 index over one project's test cases, keyed by database id.
+    sync() only re-indexes rows that were added, changed or removed.
+    Shared between Streamlit sessions, so sync / top_k hold a lock.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = BM25Index()
+        self.rows = {}
+        self.signatures = {}
+        self.by_number = {}     # Test Case ID number (5 for TC_005) -> database ids
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, tc):
+        tc_id = tc.get("id")
+        if tc_id is None:
+            return
+        text = _testcase_text(tc)
+        sig = hash(text)
+        self._unnumber(tc_id)
+        self.rows[tc_id] = tc
+        number = id_number(tc.get("Test Case ID"))
+        if number is not None:
+            self.by_number.setdefault(number, []).append(tc_id)
+        if self.signatures.get(tc_id) != sig:
+            self.index.add(tc_id, text)
+            self.signatures[tc_id] = sig
+
+    def _unnumber(self, tc_id):
+        number = id_number(self.rows[tc_id].get("Test Case ID")) if tc_id in self.rows else None
+        ids = self.by_number.get(number, [])
+        if tc_id in ids:
+            ids.remove(tc_id)
+            if not ids:
+                del self.by_number[number]
+
+    def remove(self, tc_id):
+        self._unnumber(tc_id)
+        self.rows.pop(tc_id, None)
+        self.signatures.pop(tc_id, None)
+        self.index.remove(tc_id)
+
+    def sync(self, testcases):
+        """Bring the index in line with the given list of test case dicts."""
+        with self.lock:
+            seen = set()
+            for tc in testcases:
+                self.upsert(tc)
+                seen.add(tc.get("id"))
+            for tc_id in [i for i in self.rows if i not in seen]:
+                self.remove(tc_id)
+
+    def top_k(self, instruction, k):
+        """
+        Return up to k test cases for instruction: rows whose Test Case ID
+        number is mentioned first ("delete 5" pins TC_005; database ids are
+        hidden from users), then BM25 matches, then the most recent rows.
+        """
+        with self.lock:
+            picked = []
+            for token in _NUMBER_RE.findall(instruction or ""):
+                for tc_id in self.by_number.get(int(token), []):
+                    if tc_id not in picked:
+                        picked.append(tc_id)
+            for tc_id, _ in self.index.search(instruction, k=k, stopwords=COMMAND_STOPWORDS):
+                if tc_id not in picked:
+                    picked.append(tc_id)
+            if len(picked) < k:
+                for tc_id in sorted(self.rows, reverse=True):
+                    if len(picked) >= k:
+                        break
+                    if tc_id not in picked:
+                        picked.append(tc_id)
+            return [self.rows[i] for i in picked[:k]]
+
+
+_TESTCASE_INDEXES = {}
+
+
+def get_testcase_index(project_id):
+    """Return the (process-wide) TestCaseIndex for a project."""
+    return _TESTCASE_INDEXES.setdefault(project_id, TestCaseIndex())
@@ -0,0 +1,105 @@
+import re
+
+# ---------- Test Case Parser ----------
+# Single-pass, line-oriented state machine for the model's test case output.
+# Each line is looked at once, so parsing time grows linearly with the size
+# of the response no matter how malformed it is.
+
+FIELDS = ["Test Case ID", "Description", "Steps", "Expected Result", "Priority"]
+
+_LABELS = {f.lower(): f for f in FIELDS}
+_ORDER = {f: i for i, f in enumerate(FIELDS)}
+_LABEL_MAX_LEN = max(len(f) for f in FIELDS) + 8  # room for ** / __ markers
+_BULLET_CHARS = "-*+•>#"
+_NUMBERED = re.compile(r"\d{1,4}[.)]\s+")
+
+
+def _strip_bullet(line):
+    s = line.lstrip()
+    while s and s[0] in _BULLET_CHARS and not s.startswith("**"):
+        s = s[1:].lstrip()
+    m = _NUMBERED.match(s)
+    if m:
+        s = s[m.end():]
+    return s
+
+
+def _split_label(line):
+    """
+    Return (field, value) if the line starts with a known field label,
+    e.g. "Priority: High", "**Steps**: ...", "- **Description:** ...".
+    Otherwise return (None, None).
+    """
+    s = _strip_bullet(line)
+    idx = s.find(":", 0, _LABEL_MAX_LEN)
+    if idx < 0:
+        return None, None
+    label = s[:idx].replace("*", "").replace("_", "").strip().lower()
+    field = _LABELS.get(label)
+    if field is None:
+        return None, None
+    value = s[idx + 1:].lstrip("*_ \t")
+    return field, value
+
+
+def _finish(record):
+    out = {f: "\n".join(record.get(f, [])).strip() for f in FIELDS}
+    if any(out.values()):
+        return out
+    return None
+
+
+def parse_test_cases(response_text):
+    """
+    Parse the model output into a list of test case dicts keyed by FIELDS.
+
+    Tolerates markdown bold markers, bullets / numbering in front of labels,
+    missing fields (filled with "") and free text between test cases.
+    Returns an empty list if nothing could be parsed.
+    """
+    records = []
+    current = {}
+    field = None
+    last_order = -1
+
+    for line in (response_text or "").splitlines():
+        new_field, value = _split_label(line)
+
+        if new_field is not None:
+            # A new "Test Case ID", a repeated field or a field that goes back
+            # in the usual order starts a new record
+            order = _ORDER[new_field]
+            if new_field == "Test Case ID" or new_field in current or order < last_order:
+                done = _finish(current)
+                if done:
+                    records.append(done)
+                current = {}
+            current[new_field] = [value.strip()]
+            field = new_field
+            last_order = order
+            continue
+
+        if not line.strip():
+            # Priority is a one-liner: a blank line ends it, like the old regex did
+            if field == "Priority":
+                field = None
+            elif field is not None:
+                current[field].append("")
+            continue
+
+        if field is not None:
+            current[field].append(line.strip())
+
+    done = _finish(current)
+    if done:
+        records.append(done)
+    return records
+
+
+_ID_NUMBER_RE = re.compile(r"(\d+)\D*$")  # the number in "TC_005", "LOGIN-12", "Case 7a"
+
+
+def id_number(test_case_id):
+    """The number users refer to a test case by (5 for "TC_005"), or None."""
+    m = _ID_NUMBER_RE.search(str(test_case_id or ""))
+    return int(m.group(1)) if m else None
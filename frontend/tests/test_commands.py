@@ -0,0 +1,62 @@
+import pytest
+
+from commands import describe_result, parse_command
+
+TESTCASES = [
+    {"id": 101, "Test Case ID": "TC_001", "Description": "Login"},
+    {"id": 102, "Test Case ID": "TC_002", "Description": "Logout"},
+    {"id": 103, "Test Case ID": "TC_003", "Description": "Reset password"},
+    {"id": 205, "Test Case ID": "TC_005", "Description": "Profile"},
+    {"id": 307, "Test Case ID": "API-7", "Description": "Token refresh"},
+    {"id": 308, "Test Case ID": "UI-7", "Description": "Token expiry banner"},
+    {"id": 400, "Test Case ID": None, "Description": "No label yet"},
+]
+
+
+@pytest.mark.parametrize("message, delete_ids", [
+    ("delete 5", [205]),
+    ("delete tc 5", [205]),
+    ("delete TC_005", [205]),
+    ("Remove test case #5.", [205]),
+    ("delete 1-3", [101, 102, 103]),
+    ("remove 1, 3 and 5", [101, 103, 205]),
+    ("del 005", [205]),
+])
+def test_delete_resolves_test_case_ids(message, delete_ids):
+    assert parse_command(message, TESTCASES) == {"delete_ids": delete_ids, "updates": []}
+
+
+def test_modify_resolves_test_case_ids():
+    assert parse_command("set 1-2 priority = High", TESTCASES) == {
+        "delete_ids": [],
+        "updates": [{"id": 101, "fields": {"Priority": "High"}}, {"id": 102, "fields": {"Priority": "High"}}],
+    }
+    assert parse_command("change tc 5 Description: 'New text'", TESTCASES)["updates"] == [
+        {"id": 205, "fields": {"Description": "New text"}}
+    ]
+
+
+@pytest.mark.parametrize("message", [
+    "delete 4",                 # no TC_004 loaded
+    "delete 3-5",               # TC_004 missing from the range
+    "delete 7",                 # API-7 and UI-7
+    "modify 7 Priority to Low",
+    "delete 101",               # a database id, not a Test Case ID
+    "delete the login tests",   # not a simple command at all
+    "modify 5 Priority to",
+])
+def test_unresolved_or_free_form_goes_to_llm(message):
+    assert parse_command(message, TESTCASES) is None
+
+
+def test_nothing_loaded_goes_to_llm():
+    assert parse_command("delete 1", []) is None
+
+
+def test_describe_result_names_test_case_ids():
+    command = parse_command("set 1, 5 priority to Low", TESTCASES)
+    message = describe_result(command, {"updated": [101], "not_found": [205]}, TESTCASES)
+    assert message == ("I've updated the 'Priority' for test case(s) TC_001. "
+                       "I couldn't find test case(s) TC_005 in this project.")
+    assert describe_result({"updates": []}, {"deleted": [999]}, TESTCASES) == \
+        "I have successfully deleted test case(s) 999."
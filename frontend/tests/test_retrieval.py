@@ -0,0 +1,38 @@
+import retrieval
+from testcase_parser import id_number
+
+
+def make_index(rows):
+    index = retrieval.TestCaseIndex()
+    index.sync(rows)
+    return index
+
+
+ROWS = [
+    {"id": 5, "Test Case ID": "TC_012", "Description": "Export invoices"},
+    {"id": 12, "Test Case ID": "TC_005", "Description": "Cancel appointment"},
+    {"id": 40, "Test Case ID": "API-7", "Description": "Refresh token"},
+    {"id": 41, "Test Case ID": "UI-7", "Description": "Token expiry banner"},
+    {"id": 42, "Test Case ID": "", "Description": "Login lockout"},
+]
+
+
+def test_id_number():
+    assert [id_number(v) for v in ("TC_005", "LOGIN-12", "Case 7a", "", None, "TC")] == [5, 12, 7, None, None, None]
+
+
+def test_pins_by_test_case_id_not_database_id():
+    index = make_index(ROWS)
+    assert index.top_k("delete 5", 1)[0]["Test Case ID"] == "TC_005"
+    assert index.top_k("change 12 Priority to Low", 1)[0]["Test Case ID"] == "TC_012"
+
+
+def test_ambiguous_number_pins_every_match():
+    assert [tc["id"] for tc in make_index(ROWS).top_k("delete 7", 2)] == [40, 41]
+
+
+def test_relabelled_and_removed_rows_are_unpinned():
+    index = make_index(ROWS)
+    index.sync([{**ROWS[0], "Test Case ID": "TC_099"}] + ROWS[2:])
+    assert index.by_number == {99: [5], 7: [40, 41]}
+    assert index.top_k("delete 5", 1)[0]["id"] != 12
@@ -0,0 +1,74 @@
+import os
+
+import pytest
+
+from benchmarks.bench_parse_test_cases import legacy_parse
+from testcase_parser import FIELDS, parse_test_cases
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "..", "benchmarks", "corpus")
+
+
+def corpus(name):
+    with open(os.path.join(CORPUS_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def parsed(text):
+    return [tuple(r[f] for f in FIELDS) for r in parse_test_cases(text)]
+
+
+def legacy(text):
+    """The old regex parser's records, without the "**" and whitespace it left around values."""
+    def clean(value):
+        return "\n".join(line.strip() for line in value.strip(" \t\r\n*").splitlines())
+    return [tuple(clean(v) for v in record) for record in legacy_parse(text)]
+
+
+# Outputs in which every test case has all five fields: both parsers must agree
+@pytest.mark.parametrize("text", [
+    pytest.param(corpus("plain.txt"), id="plain"),
+    pytest.param(corpus("markdown_bold.txt"), id="markdown-bold"),
+    pytest.param(corpus("no_test_cases.txt"), id="no-test-cases"),
+    pytest.param("Test Case ID:    TC_1   \nDescription:   Login works  \nSteps:    Open page   \n"
+                 "Expected Result:  Logged in \nPriority:   High  \n", id="extra-whitespace"),
+    pytest.param("Test Case ID: TC_2\nDescription: Reset\nSteps:\n1. Open login\n2. Click forgot\n\n3. Enter email\n"
+                 "Expected Result: Mail sent\nPriority: Low\n\n"
+                 "Test Case ID: TC_3\nDescription: Logout\nSteps: Click logout\nExpected Result: Session ends\n"
+                 "Priority: Medium", id="multi-line-steps"),
+    pytest.param("  Test Case ID: TC_4\n  Description: Indented\n  Steps:\n    - Open\n    - Close\n"
+                 "  Expected Result: ok\n  Priority: High\n", id="indented-bullets"),
+    pytest.param("**Test Case ID**: TC_5\n**Description**: Bold label\n**Steps**: Do it\n"
+                 "**Expected Result**: Done\n**Priority**: High\n", id="bold-labels"),
+    pytest.param("Here are your test cases:\n\nTest Case ID: TC_6\nDescription: After text\nSteps: a\n"
+                 "Expected Result: b\nPriority: Low\n\nLet me know if you need more.", id="surrounding-text"),
+    pytest.param("Test Case ID: TC_7\r\nDescription: Windows\r\nSteps: a\r\nExpected Result: b\r\n"
+                 "Priority: High\r\n", id="crlf"),
+    pytest.param("test case id: TC_8\ndescription: lower labels\nsteps: a\nexpected result: b\npriority: Low\n",
+                 id="lowercase-labels"),
+])
+def test_matches_legacy_parser(text):
+    assert parsed(text) == legacy(text)
+
+
+# Outputs the old parser dropped or merged; the new one keeps each test case
+@pytest.mark.parametrize("text, expected", [
+    pytest.param(corpus("missing_fields.txt"), [
+        ("TC_201", "Appointment reminder is sent 24h before", "", "", "Low"),
+        ("TC_202", "", "Schedule an appointment for tomorrow", "SMS reminder is queued", ""),
+        ("", "Record without an id", "", "Still parsed", ""),
+    ], id="missing-fields"),
+    pytest.param(corpus("numbered_truncated.txt"), [
+        ("TC_301", "Discharge summary is generated", "Discharge a patient", "Summary PDF is attached to the record",
+         "Medium"),
+        ("TC_302", "Lab results are visible to the physician",
+         "Upload a lab result and open the patient chart\nExpected Res", "", ""),
+    ], id="truncated"),
+    pytest.param("Test Case ID: TC_9\nDescription: No priority\nSteps: a\nExpected Result: b\n\n"
+                 "Test Case ID: TC_10\nDescription: Complete\nSteps: c\nExpected Result: d\nPriority: High\n", [
+        ("TC_9", "No priority", "a", "b", ""),
+        ("TC_10", "Complete", "c", "d", "High"),
+    ], id="missing-priority"),
+])
+def test_recovers_what_legacy_parser_lost(text, expected):
+    assert parsed(text) == expected
+    assert legacy(text) != expected